@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import Optional
 import uuid
 
-from core.db import get_session
-from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid
+from core.db import get_session, get_read_session
+from core.ownership import get_ownership_index
+from core.registry_events import commit_registry_changes, registry_change
+from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid, LIST_MAX_LIMIT, keyset_page, list_response, like_prefix
 from api.models import CustomerIn, CustomerOut
 
 router = APIRouter(prefix="/customers", tags=["customers"], dependencies=[Depends(bearer_auth)])
@@ -13,42 +15,53 @@ router = APIRouter(prefix="/customers", tags=["customers"], dependencies=[Depend
 
 @router.get("", response_model=list[CustomerOut])
 async def list_customers(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="Page size (default: all customers)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    name_prefix: Optional[str] = Query(None, description="Only customers whose name starts with this"),
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
-    List customers.
+    List customers, newest first.
 
     Behaviour:
     - Engineer/Admin (no X-Customer-ID): return all customers (current behaviour).
     - Customer (with X-Customer-ID): return only that customer.
 
+    Pagination: with `limit`, a full page carries X-Next-Cursor; pass it as
+    `cursor` for the next page (keyset on created_at, id).
+
     Tests:
     - Test 1: Customer A sees only own customer.
     - Test 3: Engineer sees all customers.
     """
-    # Engineer/Admin mode: no tenant filter
-    if tenant_id is None:
-        result = await session.execute(
-            text("SELECT id::text, name, metadata, created_at FROM customers ORDER BY created_at DESC")
-        )
-        rows = result.mappings().all()
-        return [CustomerOut(**row) for row in rows]
-
-    # Customer mode: tenant_id must exist
-    if not await verify_customer_exists(tenant_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Customer {tenant_id} not found",
-        )
-
-    # Filter by tenant_id
+    conditions, params = [], {}
+    if tenant_id is not None:
+        # Customer mode: tenant_id must exist
+        if not await verify_customer_exists(tenant_id, session):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Customer {tenant_id} not found",
+            )
+        conditions.append("c.id = :id")
+        params["id"] = str(tenant_id)
+
+    if name_prefix:
+        conditions.append("c.name LIKE :name_pattern")
+        params["name_pattern"] = like_prefix(name_prefix)
+
+    tail = keyset_page("c", cursor, limit, conditions, params)
     result = await session.execute(
-        text("SELECT id::text, name, metadata, created_at FROM customers WHERE id = :id ORDER BY created_at DESC"),
-        {"id": str(tenant_id)},
+        text(f"""
+            SELECT c.id::text, c.name, c.metadata, c.created_at
+            FROM customers c
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            {tail}
+        """),
+        params,
     )
-    rows = result.mappings().all()
-    return [CustomerOut(**row) for row in rows]
+    rows = [dict(row) for row in result.mappings().all()]
+    return list_response(rows, limit)
 
 
 @router.post("", response_model=CustomerOut)
@@ -79,16 +92,16 @@ async def create_customer(
         text("INSERT INTO customers(name, metadata) VALUES (:name, CAST(:metadata AS jsonb)) RETURNING id::text, name, metadata, created_at"),
         {"name": payload.name, "metadata": json.dumps(payload.metadata or {})},
     )
-    await session.commit()
     row = result.mappings().one()
-    return CustomerOut(**row)
+    await commit_registry_changes(session, registry_change("customer", "create", row["id"]))
+    return dict(row)
 
 
 @router.get("/{customer_id}", response_model=CustomerOut)
 async def get_customer(
     customer_id: str,
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     Get customer by ID.
@@ -122,7 +135,7 @@ async def get_customer(
     if tenant_id is not None:
         await verify_tenant_access(tenant_id, customer_id, session)
 
-    return CustomerOut(**row)
+    return dict(row)
 
 
 @router.put("/{customer_id}", response_model=CustomerOut)
@@ -156,11 +169,11 @@ async def update_customer(
         ),
         {"id": customer_id, "name": payload.name, "metadata": json.dumps(payload.metadata or {})},
     )
-    await session.commit()
     row = result.mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return CustomerOut(**row)
+    await commit_registry_changes(session, registry_change("customer", "update", row["id"]))
+    return dict(row)
 
 
 @router.delete("/{customer_id}")
@@ -186,9 +199,10 @@ async def delete_customer(
         await verify_tenant_access(tenant_id, customer_id, session)
     
     result = await session.execute(text("DELETE FROM customers WHERE id = :id"), {"id": customer_id})
-    await session.commit()
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Customer not found")
+    await commit_registry_changes(session, registry_change("customer", "delete", str(uuid.UUID(customer_id))))
+    get_ownership_index().invalidate("customer", customer_id)
     return {"status": "ok"}
 
 
@@ -1,10 +1,16 @@
 import os
-from fastapi import Header, HTTPException, status, Depends
+import base64
+import json
+from datetime import datetime
+from fastapi import Header, HTTPException, Request, Response, status, Depends
 from typing import Optional
 import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
+from core.ownership import PARENT_KIND, canonical_id, get_ownership_index
+from core.serialization import dumps_rows
+
 
 def get_bearer_token_from_env() -> str:
     return os.getenv("ADMIN_BEARER_TOKEN", "devtoken")
@@ -44,15 +50,78 @@ async def get_tenant_customer_id(
     return customer_id
 
 
+# Resolves the rest of the ownership chain from a resource of the given kind, in one query
+_OWNER_CHAIN_SQL = {
+    "device": """
+        SELECT d.site_id::text AS site, s.project_id::text AS project, p.customer_id::text AS customer
+        FROM devices d
+        JOIN sites s ON s.id = d.site_id
+        JOIN projects p ON p.id = s.project_id
+        WHERE d.id = :id
+    """,
+    "site": """
+        SELECT s.project_id::text AS project, p.customer_id::text AS customer
+        FROM sites s
+        JOIN projects p ON p.id = s.project_id
+        WHERE s.id = :id
+    """,
+    "project": "SELECT customer_id::text AS customer FROM projects WHERE id = :id",
+    "customer": "SELECT id::text AS customer FROM customers WHERE id = :id",
+}
+
+
+async def resolve_owner(kind: str, resource_id: str, session: AsyncSession) -> Optional[str]:
+    """
+    Return the customer_id owning a device, site, project or customer (None if it does not exist).
+
+    Walks the cached ownership chain (core/ownership.py) and queries only from
+    the first link that is not cached, populating the links it reads.
+    """
+    index = get_ownership_index()
+    try:
+        resource_id = canonical_id(resource_id)
+    except ValueError:
+        return None
+    while True:
+        parent = index.get(kind, resource_id)
+        if parent is None:
+            break
+        if kind == "customer":
+            return parent
+        kind, resource_id = PARENT_KIND[kind], parent
+
+    result = await session.execute(text(_OWNER_CHAIN_SQL[kind]), {"id": resource_id})
+    row = result.mappings().first()
+    if not row:
+        return None
+    while kind != "customer":
+        parent = row[PARENT_KIND[kind]]
+        index.put(kind, resource_id, parent)
+        kind, resource_id = PARENT_KIND[kind], parent
+    index.put("customer", resource_id, resource_id)
+    return row["customer"]
+
+
+async def get_parent_id(kind: str, resource_id: str, session: AsyncSession) -> Optional[str]:
+    """Current parent of a device, site or project (site_id, project_id, customer_id)"""
+    if await resolve_owner(kind, resource_id, session) is None:
+        return None
+    parent = get_ownership_index().get(kind, canonical_id(resource_id))
+    if parent is None:
+        # Not cached (e.g. the index is full or the key was just invalidated)
+        result = await session.execute(
+            text(f"SELECT {PARENT_KIND[kind]}_id::text FROM {kind}s WHERE id = :id"),
+            {"id": resource_id},
+        )
+        parent = result.scalar()
+    return parent
+
+
 async def verify_customer_exists(customer_id: uuid.UUID, session: AsyncSession) -> bool:
     """
-    Check if a customer exists in the database.
+    Check if a customer exists (cached in the ownership index).
     """
-    result = await session.execute(
-        text("SELECT 1 FROM customers WHERE id = :id"),
-        {"id": str(customer_id)},
-    )
-    return result.scalar() is not None
+    return await resolve_owner("customer", str(customer_id), session) is not None
 
 
 async def verify_tenant_access(
@@ -68,6 +137,10 @@ async def verify_tenant_access(
       - If resource belongs to a different customer -> 404
         (We deliberately use 404 to avoid tenant enumeration.)
     """
+    # The resource's customer exists (foreign key), so a match needs no lookup
+    if str(tenant_id) == resource_customer_id:
+        return
+
     # Customer must exist
     if not await verify_customer_exists(tenant_id, session):
         raise HTTPException(
@@ -76,11 +149,25 @@ async def verify_tenant_access(
         )
 
     # Resource must belong to this tenant
-    if str(tenant_id) != resource_customer_id:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Resource not found",
-        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Resource not found",
+    )
+
+
+async def read_limited_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Read the request body, failing with 413 as soon as it exceeds max_bytes.
+    """
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Request body exceeds {max_bytes} bytes; split the file",
+            )
+    return bytes(body)
 
 
 def validate_uuid(uuid_str: str, field_name: str = "ID") -> uuid.UUID:
@@ -110,15 +197,10 @@ async def verify_project_belongs_to_tenant(
     Raises:
         - HTTPException 404 if project does not exist or belongs to different tenant
     """
-    result = await session.execute(
-        text("SELECT customer_id::text FROM projects WHERE id = :id"),
-        {"id": project_id},
-    )
-    row = result.mappings().first()
-    if not row:
+    customer_id = await resolve_owner("project", project_id, session)
+    if customer_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    
-    customer_id = row["customer_id"]
+
     await verify_tenant_access(tenant_id, customer_id, session)
     return customer_id
 
@@ -134,20 +216,10 @@ async def verify_site_belongs_to_tenant(
     Raises:
         - HTTPException 404 if site does not exist or belongs to different tenant
     """
-    result = await session.execute(
-        text("""
-            SELECT p.customer_id::text AS customer_id
-            FROM sites s
-            JOIN projects p ON p.id = s.project_id
-            WHERE s.id = :id
-        """),
-        {"id": site_id},
-    )
-    row = result.mappings().first()
-    if not row:
+    customer_id = await resolve_owner("site", site_id, session)
+    if customer_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Site not found")
-    
-    customer_id = row["customer_id"]
+
     await verify_tenant_access(tenant_id, customer_id, session)
     return customer_id
 
@@ -163,22 +235,94 @@ async def verify_device_belongs_to_tenant(
     Raises:
         - HTTPException 404 if device does not exist or belongs to different tenant
     """
-    result = await session.execute(
-        text("""
-            SELECT p.customer_id::text AS customer_id
-            FROM devices d
-            JOIN sites s ON s.id = d.site_id
-            JOIN projects p ON p.id = s.project_id
-            WHERE d.id = :id
-        """),
-        {"id": device_id},
-    )
-    row = result.mappings().first()
-    if not row:
+    customer_id = await resolve_owner("device", device_id, session)
+    if customer_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Device not found")
-    
-    customer_id = row["customer_id"]
+
     await verify_tenant_access(tenant_id, customer_id, session)
     return customer_id
 
 
+# List endpoints: pages ordered by (created_at, id) descending, cursor passed back in X-Next-Cursor
+LIST_MAX_LIMIT = 1000
+
+
+def encode_list_cursor(created_at: datetime, resource_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), resource_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_list_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, resource_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), str(uuid.UUID(resource_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def like_prefix(prefix: str) -> str:
+    """LIKE pattern matching values that start with prefix literally"""
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def like_contains(value: str) -> str:
+    """LIKE pattern matching values that contain value literally"""
+    return "%" + like_prefix(value)
+
+
+def keyset_page(
+    alias: str,
+    cursor: Optional[str],
+    limit: Optional[int],
+    conditions: list[str],
+    params: dict,
+) -> str:
+    """
+    Add the keyset condition for cursor to conditions/params and return the
+    ORDER BY ... LIMIT tail; served by the (…, created_at DESC, id DESC) indexes of migration 240.
+    """
+    if cursor:
+        created_at, last_id = decode_list_cursor(cursor)
+        conditions.append(f"({alias}.created_at, {alias}.id) < (:cursor_created_at, CAST(:cursor_id AS uuid))")
+        params["cursor_created_at"] = created_at
+        params["cursor_id"] = last_id
+    tail = f"ORDER BY {alias}.created_at DESC, {alias}.id DESC"
+    if limit is not None:
+        tail += " LIMIT :limit"
+        params["limit"] = limit
+    return tail
+
+
+def set_next_cursor(response: Response, rows: list, limit: Optional[int]) -> None:
+    """A full page may have a successor; an absent header means the listing is complete"""
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_list_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+
+def list_response(rows: list, limit: Optional[int]) -> Response:
+    """
+    A list page serialized straight from its rows with orjson.
+
+    The route keeps its response_model for the OpenAPI schema; returning a
+    Response skips FastAPI's validation and serialization of every row.
+    """
+    response = Response(dumps_rows(rows), media_type="application/json")
+    set_next_cursor(response, rows, limit)
+    return response
+
+
+def project_template_match(project_id_sql: str) -> str:
+    """
+    SQL condition: parameter template pt belongs to the project whose id is project_id_sql.
+
+    A template belongs to a project when its key is project:<project_id>:... (import
+    scripts, seed) or its metadata.project_id names the project (templates created via
+    the API with other keys). Templates matching neither are global and belong to no
+    project. Both branches are indexed (migration 240 key pattern, migration 320).
+    """
+    prefix = f"('project:' || {project_id_sql}::text || ':')"
+    upper = f"('project:' || {project_id_sql}::text || ';')"
+    return (
+        f"((pt.key ~>=~ {prefix} AND pt.key ~<~ {upper})"
+        f" OR pt.metadata->>'project_id' = {project_id_sql}::text)"
+    )
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import Optional
 import uuid
 
-from core.db import get_session
-from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid, verify_site_belongs_to_tenant, verify_device_belongs_to_tenant
+from core.db import get_session, get_read_session
+from core.ownership import get_ownership_index
+from core.registry_events import commit_registry_changes, registry_change
+from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid, verify_site_belongs_to_tenant, verify_device_belongs_to_tenant, get_parent_id, LIST_MAX_LIMIT, keyset_page, list_response, like_prefix, like_contains
 from api.models import DeviceIn, DeviceOut
 
 router = APIRouter(prefix="/devices", tags=["devices"], dependencies=[Depends(bearer_auth)])
@@ -13,48 +15,132 @@ router = APIRouter(prefix="/devices", tags=["devices"], dependencies=[Depends(be
 
 @router.get("", response_model=list[DeviceOut])
 async def list_devices(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="Page size (default: all devices)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    site_id: Optional[str] = Query(None, description="Only devices of this site"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Only devices with this status"),
+    device_type: Optional[str] = Query(None, description="Only devices of this type"),
+    name_prefix: Optional[str] = Query(None, description="Only devices whose name starts with this"),
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
-    List devices.
+    List devices, newest first.
 
     Behaviour:
     - Engineer/Admin (no X-Customer-ID): return all devices (current behaviour).
     - Customer (with X-Customer-ID): return only that customer's devices (via sites → projects).
 
     Filtering: devices → sites → projects → customers
+
+    Pagination: with `limit`, a full page carries X-Next-Cursor; pass it as
+    `cursor` for the next page (keyset on created_at, id). Filters combine with AND.
     """
-    # Engineer/Admin mode: no tenant filter
-    if tenant_id is None:
-        result = await session.execute(
-            text(
-                "SELECT id::text, site_id::text AS site_id, name, device_type, external_id, status, created_at "
-                "FROM devices ORDER BY created_at DESC"
+    conditions, params, joins = [], {}, ""
+    if tenant_id is not None:
+        # Customer mode: tenant_id must exist
+        if not await verify_customer_exists(tenant_id, session):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Customer {tenant_id} not found",
             )
-        )
-        return [DeviceOut(**row) for row in result.mappings().all()]
+        joins = "JOIN sites s ON s.id = d.site_id JOIN projects p ON p.id = s.project_id"
+        conditions.append("p.customer_id = :customer_id")
+        params["customer_id"] = str(tenant_id)
+
+    if site_id is not None:
+        validate_uuid(site_id, field_name="site_id")
+        conditions.append("d.site_id = CAST(:site_id AS uuid)")
+        params["site_id"] = site_id
+    if status_filter is not None:
+        conditions.append("d.status = :status")
+        params["status"] = status_filter
+    if device_type is not None:
+        conditions.append("d.device_type = :device_type")
+        params["device_type"] = device_type
+    if name_prefix:
+        conditions.append("d.name LIKE :name_pattern")
+        params["name_pattern"] = like_prefix(name_prefix)
+
+    tail = keyset_page("d", cursor, limit, conditions, params)
+    result = await session.execute(
+        text(f"""
+            SELECT d.id::text, d.site_id::text AS site_id, d.name, d.device_type, d.external_id, d.status, d.created_at
+            FROM devices d
+            {joins}
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            {tail}
+        """),
+        params,
+    )
+    rows = [dict(row) for row in result.mappings().all()]
+    return list_response(rows, limit)
+
+
+# Shortest substring that yields a selective trigram (migration 270)
+SEARCH_MIN_SUBSTRING = 3
+
+
+# Before /{device_id}, which would otherwise match "search"
+@router.get("/search", response_model=list[DeviceOut])
+async def search_devices(
+    q: str = Query(..., min_length=1, max_length=200, description="Text to find in the device name or external_id"),
+    match: str = Query("substring", pattern="^(substring|prefix)$", description="substring (default) or prefix"),
+    limit: int = Query(100, ge=1, le=LIST_MAX_LIMIT, description="Page size"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Only devices with this status"),
+    device_type: Optional[str] = Query(None, description="Only devices of this type"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Find devices whose name or external_id contains (or starts with) `q`, case-insensitive.
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): searches all devices.
+    - Customer (with X-Customer-ID): searches only that customer's devices.
 
-    # Customer mode: tenant_id must exist
-    if not await verify_customer_exists(tenant_id, session):
+    Served by the trigram indexes of migration 270; substring search needs at
+    least 3 characters. Newest first, paginated like GET /devices.
+    """
+    if match == "substring" and len(q) < SEARCH_MIN_SUBSTRING:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Customer {tenant_id} not found",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Substring search needs at least {SEARCH_MIN_SUBSTRING} characters; use match=prefix",
         )
 
-    # Filter by tenant (devices → sites → projects → customers)
+    joins = ""
+    conditions = ["(d.name ILIKE :pattern OR d.external_id ILIKE :pattern)"]
+    params = {"pattern": like_prefix(q) if match == "prefix" else like_contains(q)}
+    if tenant_id is not None:
+        if not await verify_customer_exists(tenant_id, session):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Customer {tenant_id} not found",
+            )
+        joins = "JOIN sites s ON s.id = d.site_id JOIN projects p ON p.id = s.project_id"
+        conditions.append("p.customer_id = :customer_id")
+        params["customer_id"] = str(tenant_id)
+    if status_filter is not None:
+        conditions.append("d.status = :status")
+        params["status"] = status_filter
+    if device_type is not None:
+        conditions.append("d.device_type = :device_type")
+        params["device_type"] = device_type
+
+    tail = keyset_page("d", cursor, limit, conditions, params)
     result = await session.execute(
-        text("""
+        text(f"""
             SELECT d.id::text, d.site_id::text AS site_id, d.name, d.device_type, d.external_id, d.status, d.created_at
             FROM devices d
-            JOIN sites s ON s.id = d.site_id
-            JOIN projects p ON p.id = s.project_id
-            WHERE p.customer_id = :customer_id
-            ORDER BY d.created_at DESC
+            {joins}
+            WHERE {" AND ".join(conditions)}
+            {tail}
         """),
-        {"customer_id": str(tenant_id)},
+        params,
     )
-    return [DeviceOut(**row) for row in result.mappings().all()]
+    rows = [dict(row) for row in result.mappings().all()]
+    return list_response(rows, limit)
 
 
 @router.post("", response_model=DeviceOut)
@@ -91,15 +177,16 @@ async def create_device(
             "status": payload.status or "active",
         },
     )
-    await session.commit()
-    return DeviceOut(**result.mappings().one())
+    row = result.mappings().one()
+    await commit_registry_changes(session, registry_change("device", "create", row["id"]))
+    return dict(row)
 
 
 @router.get("/{device_id}", response_model=DeviceOut)
 async def get_device(
     device_id: str,
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     Get device by ID.
@@ -136,15 +223,7 @@ async def get_device(
         await verify_tenant_access(tenant_id, row["customer_id"], session)
 
     # Return device data (without customer_id in response)
-    return DeviceOut(
-        id=row["id"],
-        site_id=row["site_id"],
-        name=row["name"],
-        device_type=row["device_type"],
-        external_id=row["external_id"],
-        status=row["status"],
-        created_at=row["created_at"],
-    )
+    return {k: v for k, v in row.items() if k != "customer_id"}
 
 
 @router.put("/{device_id}", response_model=DeviceOut)
@@ -174,13 +253,9 @@ async def update_device(
         # First, verify the existing device belongs to tenant
         await verify_device_belongs_to_tenant(device_id, tenant_id, session)
         
-        # Verify new site_id (if changed) also belongs to tenant
-        result = await session.execute(
-            text("SELECT site_id::text FROM devices WHERE id = :id"),
-            {"id": device_id},
-        )
-        existing = result.mappings().first()
-        if existing and existing["site_id"] != payload.site_id:
+        # Verify new site_id (if changed) also belongs to tenant (current parent is cached)
+        existing_site_id = await get_parent_id("device", device_id, session)
+        if existing_site_id and existing_site_id != payload.site_id:
             await verify_site_belongs_to_tenant(payload.site_id, tenant_id, session)
     
     result = await session.execute(
@@ -199,11 +274,13 @@ async def update_device(
             "status": payload.status or "active",
         },
     )
-    await session.commit()
     row = result.mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Device not found")
-    return DeviceOut(**row)
+    await commit_registry_changes(session, registry_change("device", "update", row["id"]))
+    # The device may have moved to another site
+    get_ownership_index().invalidate("device", device_id)
+    return dict(row)
 
 
 @router.delete("/{device_id}")
@@ -229,9 +306,10 @@ async def delete_device(
         await verify_device_belongs_to_tenant(device_id, tenant_id, session)
     
     result = await session.execute(text("DELETE FROM devices WHERE id = :id"), {"id": device_id})
-    await session.commit()
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Device not found")
+    await commit_registry_changes(session, registry_change("device", "delete", str(uuid.UUID(device_id))))
+    get_ownership_index().invalidate("device", device_id)
     return {"status": "ok"}
 
 
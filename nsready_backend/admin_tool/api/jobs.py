@@ -0,0 +1,365 @@
+import os
+import asyncio
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from typing import AsyncIterator, Optional
+
+from core.db import get_session, get_sessionmaker
+from core.jobs import JOB_COLUMNS, TERMINAL_STATUSES, JobContext, job_handler, submit_job
+from core.registry_import import IMPORT_STEPS
+from core.serialization import dumps_rows
+from api.deps import (
+    bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_project_belongs_to_tenant, resolve_owner,
+    validate_uuid, read_limited_body, LIST_MAX_LIMIT, keyset_page, list_response,
+)
+from api.models import JobOut, JobPublishIn
+from api.registry_import import IMPORT_MAX_BYTES, decode_import_body, run_registry_import
+from api.parameter_templates import (
+    IMPORT_MAX_BYTES as TEMPLATE_IMPORT_MAX_BYTES, export_query, import_templates_csv, stream_templates_csv,
+)
+from api.registry_versions import publish_project
+
+router = APIRouter(prefix="/jobs", tags=["jobs"], dependencies=[Depends(bearer_auth)])
+
+# Server-sent events: how often the job row is checked, and a comment line after this long without change
+EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "1"))
+EVENTS_KEEPALIVE_SECONDS = 15.0
+
+
+# Handlers: the same code as the inline routes, run by core.jobs.JobRunner
+
+def _tenant(ctx: JobContext) -> Optional[uuid.UUID]:
+    return uuid.UUID(ctx.customer_id) if ctx.customer_id else None
+
+
+@job_handler("registry_import")
+async def _registry_import_job(ctx: JobContext) -> dict:
+    async def on_step(name: str) -> None:
+        await ctx.progress(IMPORT_STEPS.index(name) + 1, len(IMPORT_STEPS), name, force=True)
+
+    async with get_sessionmaker()() as session:
+        return await run_registry_import(
+            session, decode_import_body(ctx.input), ctx.params.get("content_type", ""), _tenant(ctx), on_step=on_step
+        )
+
+
+@job_handler("parameter_templates_import")
+async def _parameter_templates_import_job(ctx: JobContext) -> dict:
+    async with get_sessionmaker()() as session:
+        report = await import_templates_csv(session, ctx.input.decode("utf-8-sig"), _tenant(ctx))
+    return report.model_dump()
+
+
+@job_handler("parameter_templates_export")
+async def _parameter_templates_export_job(ctx: JobContext) -> dict:
+    query, params = export_query(ctx.params.get("customer_id"), ctx.params.get("project_id"), _tenant(ctx))
+    size = 0
+    async for chunk in stream_templates_csv(query, params):
+        await ctx.write_output(chunk, "text/csv")
+        size += len(chunk)
+        await ctx.progress(size, None, "bytes written")
+    return {"bytes": size, "filename": "parameter_templates.csv"}
+
+
+@job_handler("publish_version")
+async def _publish_version_job(ctx: JobContext) -> dict:
+    async with get_sessionmaker()() as session:
+        published = await publish_project(
+            session, ctx.params["project_id"], ctx.params["author"], ctx.params.get("diff_json") or {}
+        )
+    return published.model_dump()
+
+
+async def _check_tenant(tenant_id: Optional[uuid.UUID], session: AsyncSession) -> None:
+    if tenant_id is not None and not await verify_customer_exists(tenant_id, session):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Customer {tenant_id} not found",
+        )
+
+
+@router.post("/registry_import", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def submit_registry_import(
+    request: Request,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Queue a registry import (body and Content-Type as POST /admin/registry/import).
+
+    The job's result is the import report.
+    """
+    await _check_tenant(tenant_id, session)
+    body = await read_limited_body(request, IMPORT_MAX_BYTES)
+    # Reject a body that is not UTF-8 now rather than as a failed job
+    decode_import_body(body)
+    return await submit_job(
+        session, "registry_import", tenant_id, {"content_type": request.headers.get("content-type", "")}, body
+    )
+
+
+@router.post("/parameter_templates_import", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def submit_parameter_templates_import(
+    request: Request,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Queue a template CSV import (as POST /admin/parameter_templates/import).
+
+    The job's result is the batch report.
+    """
+    await _check_tenant(tenant_id, session)
+    body = await read_limited_body(request, TEMPLATE_IMPORT_MAX_BYTES)
+    try:
+        body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CSV body must be UTF-8")
+    return await submit_job(session, "parameter_templates_import", tenant_id, {}, body)
+
+
+@router.post("/parameter_templates_export", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def submit_parameter_templates_export(
+    customer_id: Optional[str] = Query(None, description="Only templates of this customer's projects"),
+    project_id: Optional[str] = Query(None, description="Only templates of this project"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Queue a template CSV export (as GET /admin/parameter_templates/export.csv).
+
+    The CSV is downloaded from GET /admin/jobs/{job_id}/output once the job succeeded.
+    """
+    await _check_tenant(tenant_id, session)
+    # Validates the filters now
+    export_query(customer_id, project_id, tenant_id)
+    return await submit_job(
+        session, "parameter_templates_export", tenant_id, {"customer_id": customer_id, "project_id": project_id}
+    )
+
+
+@router.post("/publish_version", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def submit_publish_version(
+    payload: JobPublishIn,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Queue a publish of the project's registry subtree (as POST
+    /admin/projects/{project_id}/versions/publish).
+
+    The job's result is the publish response (status, config_version, checksum).
+    """
+    project_id = str(validate_uuid(payload.project_id, field_name="project_id"))
+    if tenant_id is not None:
+        await verify_project_belongs_to_tenant(project_id, tenant_id, session)
+    elif await resolve_owner("project", project_id, session) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return await submit_job(
+        session,
+        "publish_version",
+        tenant_id,
+        {"project_id": project_id, "author": payload.author, "diff_json": payload.diff_json},
+    )
+
+
+# Job state changes by the second: reads go to the primary, not a lagging replica
+
+@router.get("", response_model=list[JobOut])
+async def list_jobs(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="Page size (default: all jobs)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    job_status: Optional[str] = Query(None, alias="status", description="Only jobs with this status"),
+    kind: Optional[str] = Query(None, description="Only jobs of this kind"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    List jobs, newest first.
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): return all jobs.
+    - Customer (with X-Customer-ID): return only jobs submitted with that customer.
+
+    Pagination: with `limit`, a full page carries X-Next-Cursor; pass it as
+    `cursor` for the next page (keyset on created_at, id).
+    """
+    conditions, params = [], {}
+    if tenant_id is not None:
+        await _check_tenant(tenant_id, session)
+        conditions.append("j.customer_id = :customer_id")
+        params["customer_id"] = str(tenant_id)
+    if job_status is not None:
+        conditions.append("j.status = :status")
+        params["status"] = job_status
+    if kind is not None:
+        conditions.append("j.kind = :kind")
+        params["kind"] = kind
+
+    tail = keyset_page("j", cursor, limit, conditions, params)
+    result = await session.execute(
+        text(f"""
+            SELECT {JOB_COLUMNS}
+            FROM admin_jobs j
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            {tail}
+        """),
+        params,
+    )
+    rows = [dict(row) for row in result.mappings().all()]
+    return list_response(rows, limit)
+
+
+async def _get_job(job_id: str, tenant_id: Optional[uuid.UUID], session: AsyncSession) -> dict:
+    """The job row; 404 when it does not exist or belongs to another tenant"""
+    validate_uuid(job_id, field_name="job_id")
+    result = await session.execute(
+        text(f"""
+            SELECT {JOB_COLUMNS}
+            FROM admin_jobs
+            WHERE id = CAST(:id AS uuid)
+              AND (CAST(:customer_id AS uuid) IS NULL OR customer_id = CAST(:customer_id AS uuid))
+        """),
+        {"id": job_id, "customer_id": str(tenant_id) if tenant_id else None},
+    )
+    row = result.mappings().first()
+    if not row:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return dict(row)
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(
+    job_id: str,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """Status, progress ({done, total, message}) and, once finished, result or error of a job"""
+    return await _get_job(job_id, tenant_id, session)
+
+
+async def _job_events(job_id: str, tenant_id: Optional[uuid.UUID]) -> AsyncIterator[bytes]:
+    """One `job` event per change of the row (updated_at), the last one at a terminal status"""
+    last_update, idle = None, 0.0
+    while True:
+        # A short session per check: no connection is held between polls
+        async with get_sessionmaker()() as session:
+            try:
+                job = await _get_job(job_id, tenant_id, session)
+            except HTTPException:
+                # Deleted meanwhile (retention, customer removed)
+                return
+        if job["updated_at"] != last_update:
+            last_update, idle = job["updated_at"], 0.0
+            yield b"event: job\ndata: " + dumps_rows(job) + b"\n\n"
+        elif idle >= EVENTS_KEEPALIVE_SECONDS:
+            idle = 0.0
+            yield b": keepalive\n\n"
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+        idle += EVENTS_POLL_SECONDS
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: str,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Stream the job as server-sent events (text/event-stream).
+
+    Each change is sent as an event `job` whose data is the JobOut JSON; the
+    stream ends after the job finished (status succeeded, failed or cancelled).
+    """
+    await _get_job(job_id, tenant_id, session)
+    return StreamingResponse(
+        _job_events(job_id, tenant_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Chunks in order; admin_jobs.output holds the whole file of jobs finished before migration 330
+_OUTPUT_SQL = """
+    SELECT data FROM (
+        SELECT seq, data FROM admin_job_output_chunks WHERE job_id = CAST(:id AS uuid)
+        UNION ALL
+        SELECT -1, output FROM admin_jobs WHERE id = CAST(:id AS uuid) AND output IS NOT NULL
+    ) o
+    ORDER BY seq
+"""
+
+
+async def _stream_output(job_id: str) -> AsyncIterator[bytes]:
+    """
+    Output chunks from a server-side cursor, a couple of rows at a time.
+
+    Runs in its own session: the request's session is closed by the time the
+    body is iterated.
+    """
+    async with get_sessionmaker()() as session:
+        result = await session.stream(text(_OUTPUT_SQL), {"id": job_id}, execution_options={"yield_per": 2})
+        async for row in result:
+            yield row[0]
+
+
+@router.get("/{job_id}/output")
+async def get_job_output(
+    job_id: str,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """File produced by a succeeded job (e.g. the CSV of parameter_templates_export)"""
+    job = await _get_job(job_id, tenant_id, session)
+    if not job["has_output"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job has no output")
+    output_type = await session.scalar(
+        text("SELECT output_type FROM admin_jobs WHERE id = CAST(:id AS uuid)"), {"id": job_id}
+    )
+    filename = (job["result"] or {}).get("filename", f"{job['kind']}-{job['id']}")
+    return StreamingResponse(
+        _stream_output(job_id),
+        media_type=output_type or "application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/{job_id}/cancel", response_model=JobOut)
+async def cancel_job(
+    job_id: str,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Cancel a job. A queued job is cancelled at once; a running one at its
+    worker's next heartbeat (JOB_HEARTBEAT_SECONDS). A finished job gives 409.
+    """
+    job = await _get_job(job_id, tenant_id, session)
+    if job["status"] in TERMINAL_STATUSES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job already {job['status']}")
+    # SET expressions see the row before the update: a job claimed meanwhile gets cancel_requested
+    result = await session.execute(
+        text(f"""
+            UPDATE admin_jobs
+            SET cancel_requested = (status = 'running'),
+                status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                error = CASE WHEN status = 'queued' THEN 'Cancelled' ELSE error END,
+                input = CASE WHEN status = 'queued' THEN NULL ELSE input END,
+                finished_at = CASE WHEN status = 'queued' THEN NOW() ELSE finished_at END,
+                updated_at = NOW()
+            WHERE id = CAST(:id AS uuid) AND status IN ('queued', 'running')
+            RETURNING {JOB_COLUMNS}
+        """),
+        {"id": job_id},
+    )
+    row = result.mappings().first()
+    await session.commit()
+    if not row:
+        # Finished between the two statements
+        return await _get_job(job_id, tenant_id, session)
+    return dict(row)
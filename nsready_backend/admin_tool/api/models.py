@@ -66,7 +66,51 @@ class PublishIn(BaseModel):
 
 
 class PublishOut(BaseModel):
-    status: str
+    status: str  # "ok", or "unchanged" when the snapshot equals the latest version
     config_version: str
+    checksum: Optional[str] = None  # sha256 of the snapshot
+
+
+class RowError(BaseModel):
+    line: int
+    error: str
+
+
+class RegistryImportOut(BaseModel):
+    rows: int
+    rows_imported: int
+    rows_failed: int
+    customers_created: int
+    projects_created: int
+    sites_created: int
+    devices_created: int
+    errors: list[RowError]
+
+
+class ParamTemplateBatchOut(BaseModel):
+    rows: int
+    created: int
+    updated: int
+    unchanged: int
+    errors: list[RowError] = Field(default_factory=list)
 
 
+class JobPublishIn(PublishIn):
+    project_id: str
+
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    customer_id: Optional[str] = None
+    status: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    progress: dict[str, Any] = Field(default_factory=dict)
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    has_output: bool
+    created_at: datetime
+    updated_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
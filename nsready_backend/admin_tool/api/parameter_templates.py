@@ -1,20 +1,300 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+import csv
+import io
+import json
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from typing import AsyncIterator, Optional
 
-from core.db import get_session
-from api.deps import bearer_auth
-from api.models import ParamTemplateIn, ParamTemplateOut
+from core.db import get_session, get_read_session, get_read_sessionmaker
+from core.registry_events import commit_registry_changes, registry_change
+from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, validate_uuid, LIST_MAX_LIMIT, keyset_page, list_response, like_prefix, project_template_match, read_limited_body
+from api.models import ParamTemplateIn, ParamTemplateOut, ParamTemplateBatchOut
 
 router = APIRouter(prefix="/parameter_templates", tags=["parameter_templates"], dependencies=[Depends(bearer_auth)])
 
+# Largest batch accepted by /batch and /import (rows); one statement upserts the whole batch
+BATCH_MAX_ROWS = int(os.getenv("PARAM_TEMPLATE_BATCH_MAX_ROWS", "20000"))
+
+# Largest CSV body accepted by /import (and the import job); read in chunks, 413 beyond it
+IMPORT_MAX_BYTES = int(os.getenv("PARAM_TEMPLATE_IMPORT_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# CSV format of import_parameter_templates.sh / export_parameter_template_csv.sh
+CSV_COLUMNS = (
+    "customer_name", "project_name", "parameter_name", "unit", "dtype",
+    "min_value", "max_value", "required", "description",
+)
+
+EXPORT_FETCH_ROWS = 1000
+
+# Changed rows only: re-sending an unchanged template does not rewrite it
+_UPSERT = """
+    INSERT INTO parameter_templates (key, name, unit, metadata)
+    SELECT key, name, unit, metadata FROM templates
+    ON CONFLICT (key) DO UPDATE
+    SET name = EXCLUDED.name, unit = EXCLUDED.unit, metadata = EXCLUDED.metadata
+    WHERE (parameter_templates.name, parameter_templates.unit, parameter_templates.metadata)
+          IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.unit, EXCLUDED.metadata)
+    RETURNING (xmax = 0) AS inserted
+"""
+
+_BATCH_SQL = f"""
+    WITH templates AS (
+        SELECT t.key, t.name, t.unit, COALESCE(t.metadata, '{{}}'::jsonb) AS metadata
+        FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS t(key text, name text, unit text, metadata jsonb)
+    ),
+    upserted AS ({_UPSERT})
+    SELECT count(*) FILTER (WHERE inserted) AS created, count(*) FILTER (WHERE NOT inserted) AS updated
+    FROM upserted
+"""
+
+# CSV rows → keys and metadata as built by import_parameter_templates.sh; the project is looked up
+# by customer and project name, restricted to the tenant customer when X-Customer-ID is sent
+_IMPORT_SQL = rf"""
+    WITH input AS (
+        SELECT *
+        FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+            line int, customer_name text, project_name text, parameter_name text, unit text,
+            dtype text, min_value text, max_value text, required text, description text)
+    ),
+    resolved AS (
+        SELECT i.*, p.id AS project_id
+        FROM input i
+        LEFT JOIN customers c
+          ON c.name = i.customer_name AND (CAST(:tenant_id AS uuid) IS NULL OR c.id = CAST(:tenant_id AS uuid))
+        LEFT JOIN projects p ON p.customer_id = c.id AND p.name = i.project_name
+    ),
+    templates AS (
+        SELECT DISTINCT ON (key) *
+        FROM (
+            SELECT line,
+                   format('project:%s:%s', project_id, lower(replace(parameter_name, ' ', '_'))) AS key,
+                   parameter_name AS name,
+                   NULLIF(unit, '') AS unit,
+                   jsonb_build_object(
+                       'project_id', project_id::text,
+                       'dtype', dtype,
+                       'min', CASE WHEN min_value ~ '^-?[0-9]+\.?[0-9]*$' THEN min_value::real END,
+                       'max', CASE WHEN max_value ~ '^-?[0-9]+\.?[0-9]*$' THEN max_value::real END,
+                       'required', lower(COALESCE(required, '')) IN ('true', 't', 'yes', 'y', '1')
+                   ) || CASE WHEN COALESCE(description, '') <> ''
+                             THEN jsonb_build_object('description', description) ELSE '{{}}'::jsonb END AS metadata
+            FROM resolved
+            WHERE project_id IS NOT NULL
+        ) t
+        ORDER BY key, line DESC
+    ),
+    upserted AS ({_UPSERT})
+    SELECT
+        (SELECT count(*) FROM templates) AS templates,
+        (SELECT count(*) FILTER (WHERE inserted) FROM upserted) AS created,
+        (SELECT count(*) FILTER (WHERE NOT inserted) FROM upserted) AS updated,
+        (SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                    'line', line,
+                    'error', format('project "%s" not found for customer "%s"', project_name, customer_name)
+                ) ORDER BY line), '[]'::jsonb)
+         FROM resolved WHERE project_id IS NULL) AS errors
+"""
+
 
 @router.get("", response_model=list[ParamTemplateOut])
-async def list_param_templates(session: AsyncSession = Depends(get_session)):
+async def list_param_templates(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="Page size (default: all templates)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    key_prefix: Optional[str] = Query(None, description="Only keys starting with this, e.g. project:<uuid>:"),
+    name_prefix: Optional[str] = Query(None, description="Only templates whose name starts with this"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    conditions, params = [], {}
+    if key_prefix:
+        conditions.append("pt.key LIKE :key_pattern")
+        params["key_pattern"] = like_prefix(key_prefix)
+    if name_prefix:
+        conditions.append("pt.name LIKE :name_pattern")
+        params["name_pattern"] = like_prefix(name_prefix)
+
+    tail = keyset_page("pt", cursor, limit, conditions, params)
+    result = await session.execute(
+        text(f"""
+            SELECT pt.id::text, pt.key, pt.name, pt.unit, pt.metadata, pt.created_at
+            FROM parameter_templates pt
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            {tail}
+        """),
+        params,
+    )
+    rows = [dict(row) for row in result.mappings().all()]
+    return list_response(rows, limit)
+
+
+@router.post("/batch", response_model=ParamTemplateBatchOut)
+async def batch_upsert_param_templates(
+    payload: list[ParamTemplateIn],
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Create or update many templates by key in one statement.
+
+    A repeated key within the batch keeps its last entry. Templates whose name,
+    unit and metadata are unchanged are not rewritten. The collector reloads its
+    parameter key cache once per batch (migration 250).
+    """
+    if len(payload) > BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BATCH_MAX_ROWS} templates per batch",
+        )
+    templates = {t.key: {"key": t.key, "name": t.name, "unit": t.unit, "metadata": t.metadata or {}} for t in payload}
+    result = await session.execute(text(_BATCH_SQL), {"rows": json.dumps(list(templates.values()))})
+    row = result.mappings().one()
+    changes = [registry_change("parameter_template", "bulk")] if row["created"] or row["updated"] else []
+    await commit_registry_changes(session, *changes)
+    return ParamTemplateBatchOut(
+        rows=len(payload),
+        created=row["created"],
+        updated=row["updated"],
+        unchanged=len(templates) - row["created"] - row["updated"],
+    )
+
+
+@router.post("/import", response_model=ParamTemplateBatchOut)
+async def import_param_templates_csv(
+    request: Request,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Create or update templates from the CSV of import_parameter_templates.sh.
+
+    Keys and metadata are derived as by the script (project:<project_id>:<name>).
+    With X-Customer-ID only that customer's projects are matched. Rows whose
+    project is not found are skipped and listed in `errors`; unlike the script,
+    existing templates are updated instead of skipped.
+    """
+    if tenant_id is not None and not await verify_customer_exists(tenant_id, session):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Customer {tenant_id} not found",
+        )
+    try:
+        data = (await read_limited_body(request, IMPORT_MAX_BYTES)).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CSV body must be UTF-8")
+
+    return await import_templates_csv(session, data, tenant_id)
+
+
+async def import_templates_csv(session: AsyncSession, data: str, tenant_id: Optional[uuid.UUID]) -> ParamTemplateBatchOut:
+    """Upsert templates from decoded CSV and commit; shared by POST /import and the import job"""
+    rows, errors = [], []
+    reader = csv.reader(io.StringIO(data))
+    next(reader, None)  # header
+    for values in reader:
+        if not values:
+            continue
+        if len(values) != len(CSV_COLUMNS):
+            errors.append({"line": reader.line_num, "error": f"expected {len(CSV_COLUMNS)} columns, got {len(values)}"})
+            continue
+        row = dict(zip(CSV_COLUMNS, values), line=reader.line_num)
+        missing = next((c for c in ("customer_name", "project_name", "parameter_name") if not row[c]), None)
+        if missing:
+            errors.append({"line": reader.line_num, "error": f"{missing} is required"})
+            continue
+        rows.append(row)
+    if len(rows) > BATCH_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BATCH_MAX_ROWS} templates per import",
+        )
+
     result = await session.execute(
-        text("SELECT id::text, key, name, unit, metadata, created_at FROM parameter_templates ORDER BY created_at DESC")
+        text(_IMPORT_SQL),
+        {"rows": json.dumps(rows), "tenant_id": str(tenant_id) if tenant_id else None},
+    )
+    report = result.mappings().one()
+    changes = [registry_change("parameter_template", "bulk")] if report["created"] or report["updated"] else []
+    await commit_registry_changes(session, *changes)
+    return ParamTemplateBatchOut(
+        rows=len(rows) + len(errors),
+        created=report["created"],
+        updated=report["updated"],
+        unchanged=report["templates"] - report["created"] - report["updated"],
+        errors=sorted(errors + list(report["errors"]), key=lambda e: e["line"]),
+    )
+
+
+async def stream_templates_csv(query: str, params: list) -> AsyncIterator[bytes]:
+    """CSV rows from a server-side cursor, EXPORT_FETCH_ROWS at a time (memory independent of size)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    async with get_read_sessionmaker()() as session:
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        async with driver.transaction(readonly=True):
+            cursor = await driver.cursor(query, *params)
+            while True:
+                records = await cursor.fetch(EXPORT_FETCH_ROWS)
+                writer.writerows(tuple(r) for r in records)
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                if len(records) < EXPORT_FETCH_ROWS:
+                    break
+
+
+def export_query(
+    customer_id: Optional[str], project_id: Optional[str], tenant_id: Optional[uuid.UUID]
+) -> tuple[str, list]:
+    """asyncpg query and arguments of the export; shared by GET /export.csv and the export job"""
+    conditions, params = [], []
+    for value, column, name in ((customer_id, "c.id", "customer_id"), (project_id, "p.id", "project_id")):
+        if value is not None:
+            validate_uuid(value, field_name=name)
+            params.append(value)
+            conditions.append(f"{column} = ${len(params)}::uuid")
+    if tenant_id is not None:
+        params.append(str(tenant_id))
+        conditions.append(f"c.id = ${len(params)}::uuid")
+
+    query = f"""
+        SELECT c.name, p.name, pt.name, COALESCE(pt.unit, ''),
+               COALESCE(pt.metadata->>'dtype', ''), COALESCE(pt.metadata->>'min', ''),
+               COALESCE(pt.metadata->>'max', ''),
+               CASE WHEN pt.metadata->>'required' = 'true' THEN 'true' ELSE 'false' END,
+               COALESCE(pt.metadata->>'description', '')
+        FROM parameter_templates pt
+        JOIN projects p ON {project_template_match("p.id")}
+        JOIN customers c ON c.id = p.customer_id
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY c.name, p.name, pt.name
+    """
+    return query, params
+
+
+@router.get("/export.csv")
+async def export_param_templates_csv(
+    customer_id: Optional[str] = Query(None, description="Only templates of this customer's projects"),
+    project_id: Optional[str] = Query(None, description="Only templates of this project"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+):
+    """
+    Stream templates as the CSV of export_parameter_template_csv.sh (re-importable via /import).
+
+    Only project templates (key prefix or metadata.project_id, as in registry
+    snapshots) are exported; global templates are not. With X-Customer-ID
+    the export is limited to that customer.
+    """
+    query, params = export_query(customer_id, project_id, tenant_id)
+    return StreamingResponse(
+        stream_templates_csv(query, params),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="parameter_templates.csv"'},
     )
-    return [ParamTemplateOut(**row) for row in result.mappings().all()]
 
 
 @router.post("", response_model=ParamTemplateOut)
@@ -28,12 +308,13 @@ async def create_param_template(payload: ParamTemplateIn, session: AsyncSession
         ),
         {"key": payload.key, "name": payload.name, "unit": payload.unit, "metadata": json.dumps(payload.metadata or {})},
     )
-    await session.commit()
-    return ParamTemplateOut(**result.mappings().one())
+    row = result.mappings().one()
+    await commit_registry_changes(session, registry_change("parameter_template", "create", row["id"], key=row["key"]))
+    return dict(row)
 
 
 @router.get("/{template_id}", response_model=ParamTemplateOut)
-async def get_param_template(template_id: str, session: AsyncSession = Depends(get_session)):
+async def get_param_template(template_id: str, session: AsyncSession = Depends(get_read_session)):
     result = await session.execute(
         text("SELECT id::text, key, name, unit, metadata, created_at FROM parameter_templates WHERE id = :id"),
         {"id": template_id},
@@ -41,7 +322,7 @@ async def get_param_template(template_id: str, session: AsyncSession = Depends(g
     row = result.mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Parameter template not found")
-    return ParamTemplateOut(**row)
+    return dict(row)
 
 
 @router.put("/{template_id}", response_model=ParamTemplateOut)
@@ -55,19 +336,23 @@ async def update_param_template(template_id: str, payload: ParamTemplateIn, sess
         ),
         {"id": template_id, "key": payload.key, "name": payload.name, "unit": payload.unit, "metadata": json.dumps(payload.metadata or {})},
     )
-    await session.commit()
     row = result.mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Parameter template not found")
-    return ParamTemplateOut(**row)
+    await commit_registry_changes(session, registry_change("parameter_template", "update", row["id"], key=row["key"]))
+    return dict(row)
 
 
 @router.delete("/{template_id}")
 async def delete_param_template(template_id: str, session: AsyncSession = Depends(get_session)):
-    result = await session.execute(text("DELETE FROM parameter_templates WHERE id = :id"), {"id": template_id})
-    await session.commit()
-    if result.rowcount == 0:
+    result = await session.execute(
+        text("DELETE FROM parameter_templates WHERE id = :id RETURNING id::text, key"),
+        {"id": template_id},
+    )
+    row = result.mappings().first()
+    if not row:
         raise HTTPException(status_code=404, detail="Parameter template not found")
+    await commit_registry_changes(session, registry_change("parameter_template", "delete", row["id"], key=row["key"]))
     return {"status": "ok"}
 
 
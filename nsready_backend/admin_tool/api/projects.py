@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import Optional
 import uuid
 
-from core.db import get_session
-from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid
+from core.db import get_session, get_read_session
+from core.ownership import get_ownership_index
+from core.registry_events import commit_registry_changes, registry_change
+from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid, verify_project_belongs_to_tenant, LIST_MAX_LIMIT, keyset_page, list_response, like_prefix
 from api.models import ProjectIn, ProjectOut
 
 router = APIRouter(prefix="/projects", tags=["projects"], dependencies=[Depends(bearer_auth)])
@@ -13,45 +15,58 @@ router = APIRouter(prefix="/projects", tags=["projects"], dependencies=[Depends(
 
 @router.get("", response_model=list[ProjectOut])
 async def list_projects(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="Page size (default: all projects)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    customer_id: Optional[str] = Query(None, description="Only projects of this customer (engineer mode)"),
+    name_prefix: Optional[str] = Query(None, description="Only projects whose name starts with this"),
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
-    List projects.
+    List projects, newest first.
 
     Behaviour:
     - Engineer/Admin (no X-Customer-ID): return all projects (current behaviour).
     - Customer (with X-Customer-ID): return only that customer's projects.
 
+    Pagination: with `limit`, a full page carries X-Next-Cursor; pass it as
+    `cursor` for the next page (keyset on created_at, id).
+
     Tests:
     - Test 10: Projects endpoint filters by tenant.
     """
-    # Engineer/Admin mode: no tenant filter
-    if tenant_id is None:
-        result = await session.execute(
-            text(
-                "SELECT id::text, customer_id::text AS customer_id, name, description, created_at "
-                "FROM projects ORDER BY created_at DESC"
+    conditions, params = [], {}
+    if tenant_id is not None:
+        # Customer mode: tenant_id must exist
+        if not await verify_customer_exists(tenant_id, session):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Customer {tenant_id} not found",
             )
-        )
-        return [ProjectOut(**row) for row in result.mappings().all()]
-
-    # Customer mode: tenant_id must exist
-    if not await verify_customer_exists(tenant_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Customer {tenant_id} not found",
-        )
-
-    # Filter by tenant_id
+        # Combined with AND, a customer_id filter cannot widen the tenant scope
+        conditions.append("p.customer_id = :tenant_id")
+        params["tenant_id"] = str(tenant_id)
+
+    if customer_id is not None:
+        validate_uuid(customer_id, field_name="customer_id")
+        conditions.append("p.customer_id = CAST(:customer_id AS uuid)")
+        params["customer_id"] = customer_id
+    if name_prefix:
+        conditions.append("p.name LIKE :name_pattern")
+        params["name_pattern"] = like_prefix(name_prefix)
+
+    tail = keyset_page("p", cursor, limit, conditions, params)
     result = await session.execute(
-        text(
-            "SELECT id::text, customer_id::text AS customer_id, name, description, created_at "
-            "FROM projects WHERE customer_id = :customer_id ORDER BY created_at DESC"
-        ),
-        {"customer_id": str(tenant_id)},
+        text(f"""
+            SELECT p.id::text, p.customer_id::text AS customer_id, p.name, p.description, p.created_at
+            FROM projects p
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            {tail}
+        """),
+        params,
     )
-    return [ProjectOut(**row) for row in result.mappings().all()]
+    rows = [dict(row) for row in result.mappings().all()]
+    return list_response(rows, limit)
 
 
 @router.post("", response_model=ProjectOut)
@@ -83,15 +98,16 @@ async def create_project(
         ),
         {"customer_id": payload.customer_id, "name": payload.name, "description": payload.description},
     )
-    await session.commit()
-    return ProjectOut(**result.mappings().one())
+    row = result.mappings().one()
+    await commit_registry_changes(session, registry_change("project", "create", row["id"]))
+    return dict(row)
 
 
 @router.get("/{project_id}", response_model=ProjectOut)
 async def get_project(
     project_id: str,
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     Get project by ID.
@@ -123,7 +139,7 @@ async def get_project(
     if tenant_id is not None:
         await verify_tenant_access(tenant_id, row["customer_id"], session)
 
-    return ProjectOut(**row)
+    return dict(row)
 
 
 @router.put("/{project_id}", response_model=ProjectOut)
@@ -151,19 +167,10 @@ async def update_project(
     # Phase 3: If tenant_id is present, verify access
     if tenant_id is not None:
         # First, verify the existing project belongs to tenant
-        result = await session.execute(
-            text("SELECT customer_id::text FROM projects WHERE id = :id"),
-            {"id": project_id},
-        )
-        existing = result.mappings().first()
-        if not existing:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        # Verify existing project belongs to tenant
-        await verify_tenant_access(tenant_id, existing["customer_id"], session)
+        existing_customer_id = await verify_project_belongs_to_tenant(project_id, tenant_id, session)
         
         # Verify new customer_id (if changed) also belongs to tenant
-        if existing["customer_id"] != payload.customer_id:
+        if existing_customer_id != payload.customer_id:
             await verify_tenant_access(tenant_id, payload.customer_id, session)
     
     result = await session.execute(
@@ -179,11 +186,13 @@ async def update_project(
             "description": payload.description,
         },
     )
-    await session.commit()
     row = result.mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Project not found")
-    return ProjectOut(**row)
+    await commit_registry_changes(session, registry_change("project", "update", row["id"]))
+    # The project may have moved to another customer
+    get_ownership_index().invalidate("project", project_id)
+    return dict(row)
 
 
 @router.delete("/{project_id}")
@@ -206,19 +215,13 @@ async def delete_project(
     
     # Phase 3: If tenant_id is present, verify project belongs to tenant
     if tenant_id is not None:
-        result = await session.execute(
-            text("SELECT customer_id::text FROM projects WHERE id = :id"),
-            {"id": project_id},
-        )
-        row = result.mappings().first()
-        if not row:
-            raise HTTPException(status_code=404, detail="Project not found")
-        await verify_tenant_access(tenant_id, row["customer_id"], session)
+        await verify_project_belongs_to_tenant(project_id, tenant_id, session)
     
     result = await session.execute(text("DELETE FROM projects WHERE id = :id"), {"id": project_id})
-    await session.commit()
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Project not found")
+    await commit_registry_changes(session, registry_change("project", "delete", str(uuid.UUID(project_id))))
+    get_ownership_index().invalidate("project", project_id)
     return {"status": "ok"}
 
 
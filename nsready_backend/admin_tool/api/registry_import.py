@@ -0,0 +1,96 @@
+import os
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Awaitable, Callable, Optional
+import uuid
+
+from core.db import get_session
+from core.registry_import import import_registry, parse_csv, parse_ndjson
+from core.registry_events import commit_registry_changes, registry_change
+from api.deps import bearer_auth, get_tenant_customer_id, read_limited_body, verify_customer_exists
+from api.models import RegistryImportOut
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/registry", tags=["registry_import"], dependencies=[Depends(bearer_auth)])
+
+IMPORT_MAX_BYTES = int(os.getenv("REGISTRY_IMPORT_MAX_BYTES", str(64 * 1024 * 1024)))
+IMPORT_MAX_ERRORS = int(os.getenv("REGISTRY_IMPORT_MAX_ERRORS", "1000"))
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+
+@router.post("/import", response_model=RegistryImportOut)
+async def import_registry_file(
+    request: Request,
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Import customers, projects, sites and devices from a CSV or NDJSON body.
+
+    CSV (Content-Type: text/csv, default) has the columns of
+    shared/scripts/registry_template.csv with a header row; NDJSON
+    (Content-Type: application/x-ndjson) has one object per line with the same keys.
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): customers are created as needed.
+    - Customer (with X-Customer-ID): every row must name that customer; rows for
+      other customers, or claiming device codes of other customers, are rejected.
+
+    The file is imported in one transaction. Invalid rows are skipped and listed in
+    `errors` (line number and reason); the other rows are imported. Large files
+    are better submitted as a job (POST /admin/jobs/registry_import).
+    """
+    if tenant_id is not None and not await verify_customer_exists(tenant_id, session):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Customer {tenant_id} not found",
+        )
+
+    data = decode_import_body(await read_limited_body(request, IMPORT_MAX_BYTES))
+    return await run_registry_import(session, data, request.headers.get("content-type", ""), tenant_id)
+
+
+def decode_import_body(body: bytes) -> str:
+    try:
+        # utf-8-sig: spreadsheet exports often start with a byte order mark
+        return body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Import body must be UTF-8")
+
+
+async def run_registry_import(
+    session: AsyncSession,
+    data: str,
+    content_type: str,
+    tenant_id: Optional[uuid.UUID],
+    on_step: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> dict:
+    """Import a decoded body and commit; shared by POST /import and the registry_import job"""
+    content_type = content_type.split(";")[0].strip().lower()
+    records = parse_ndjson(data) if content_type in NDJSON_CONTENT_TYPES else parse_csv(data)
+
+    # COPY needs the asyncpg connection under the session
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    async with driver.transaction():
+        report = await import_registry(
+            driver, records, tenant_id=tenant_id, max_errors=IMPORT_MAX_ERRORS, on_step=on_step
+        )
+    # Existing rows are never updated, so only levels with new rows changed
+    changes = [
+        registry_change(entity, "bulk")
+        for entity in ("customer", "project", "site", "device")
+        if report[f"{entity}s_created"]
+    ]
+    await commit_registry_changes(session, *changes)
+
+    logger.info(
+        f"Registry import: {report['rows']} rows, {report['rows_failed']} failed, "
+        f"created {report['customers_created']} customers, {report['projects_created']} projects, "
+        f"{report['sites_created']} sites, {report['devices_created']} devices"
+    )
+    return report
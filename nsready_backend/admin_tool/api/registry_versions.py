@@ -1,75 +1,276 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import uuid
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from typing import Optional
 
-from core.db import get_session
-from api.deps import bearer_auth
+from core.db import get_session, get_read_session
+from core.config_cache import ConfigBody, etag_for, etag_matches, get_config_cache
+from core.metrics import config_cache_counter
+from api.deps import bearer_auth, validate_uuid, project_template_match
 from api.models import PublishIn, PublishOut
 
 router = APIRouter(prefix="/projects", tags=["registry_versions"], dependencies=[Depends(bearer_auth)])
 
+# Latest may change with the next publish: clients revalidate (If-None-Match) on every poll
+LATEST_CACHE_CONTROL = "no-cache"
+# A diff between two published versions never changes
+DIFF_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+# The project's subtree as one jsonb document, built in Postgres. Arrays are ordered by id (templates
+# by key) and jsonb orders object keys, so equal registry content always gives an equal text form.
+# Template ownership is project_template_match, as in the template export; global templates
+# (no project key prefix or metadata.project_id) are not part of any project's snapshot.
+_SNAPSHOT_SQL = f"""
+    SELECT jsonb_build_object(
+        'customers', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object('id', c.id::text, 'name', c.name, 'metadata', c.metadata)), '[]'::jsonb)
+            FROM customers c WHERE c.id = p.customer_id
+        ),
+        'projects', jsonb_build_array(jsonb_build_object(
+            'id', p.id::text, 'customer_id', p.customer_id::text, 'name', p.name, 'description', p.description
+        )),
+        'sites', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                       'id', s.id::text, 'project_id', s.project_id::text, 'name', s.name, 'location', s.location
+                   ) ORDER BY s.id), '[]'::jsonb)
+            FROM sites s WHERE s.project_id = p.id
+        ),
+        'devices', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                       'id', d.id::text, 'site_id', d.site_id::text, 'name', d.name, 'device_type', d.device_type,
+                       'external_id', d.external_id, 'status', d.status
+                   ) ORDER BY d.id), '[]'::jsonb)
+            FROM devices d JOIN sites s ON s.id = d.site_id
+            WHERE s.project_id = p.id
+        ),
+        'parameter_templates', (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                       'id', pt.id::text, 'key', pt.key, 'name', pt.name, 'unit', pt.unit, 'metadata', pt.metadata
+                   ) ORDER BY pt.key), '[]'::jsonb)
+            FROM parameter_templates pt
+            WHERE {project_template_match("p.id")}
+        )
+    ) AS config
+    FROM projects p
+    WHERE p.id = CAST(:pid AS uuid)
+"""
+
+# Snapshot, hash and insert in one statement; nothing is inserted when the checksum equals the latest version's
+_PUBLISH_SQL = f"""
+    WITH snapshot AS ({_SNAPSHOT_SQL}),
+    hashed AS (
+        SELECT config, encode(sha256(convert_to(config::text, 'UTF8')), 'hex') AS checksum FROM snapshot
+    ),
+    latest AS (
+        SELECT version, checksum FROM registry_versions
+        WHERE project_id = CAST(:pid AS uuid) AND version IS NOT NULL
+        ORDER BY version DESC LIMIT 1
+    ),
+    inserted AS (
+        INSERT INTO registry_versions(project_id, version, diff_json, author, full_config, checksum, description)
+        SELECT CAST(:pid AS uuid), COALESCE((SELECT version FROM latest), 0) + 1, CAST(:diff AS jsonb), :author,
+               h.config, h.checksum, :description
+        FROM hashed h
+        WHERE h.checksum IS DISTINCT FROM (SELECT checksum FROM latest)
+        RETURNING version, checksum
+    )
+    SELECT (SELECT version FROM inserted) AS new_version,
+           (SELECT version FROM latest) AS latest_version,
+           (SELECT checksum FROM hashed) AS checksum
+"""
+
 
 @router.post("/{project_id}/versions/publish", response_model=PublishOut)
 async def publish_version(project_id: str, payload: PublishIn, session: AsyncSession = Depends(get_session)):
-    # Ensure project exists
-    proj = await session.execute(text("SELECT id FROM projects WHERE id = :id"), {"id": project_id})
+    """
+    Publish the project's registry subtree as the next version.
+
+    The snapshot (customer, project, its sites, devices and parameter templates)
+    is built and hashed (sha256) in Postgres. If the content is unchanged since the
+    latest version, no version is created and status is "unchanged". For large
+    projects submit a job instead (POST /admin/jobs/publish_version).
+    """
+    validate_uuid(project_id, field_name="project_id")
+    return await publish_project(session, project_id, payload.author, payload.diff_json)
+
+
+async def publish_project(session: AsyncSession, project_id: str, author: str, diff_json: dict) -> PublishOut:
+    """Publish and commit; shared by the route and the publish_version job"""
+    # Ensure project exists; the row lock serializes concurrent publishes of the project
+    proj = await session.execute(text("SELECT id FROM projects WHERE id = :id FOR UPDATE"), {"id": project_id})
     if not proj.first():
         raise HTTPException(status_code=404, detail="Project not found")
 
-    # Compute next version
-    res = await session.execute(
-        text("SELECT COALESCE(MAX(version), 0) AS maxv FROM registry_versions WHERE project_id = :pid"),
-        {"pid": project_id},
-    )
-    maxv = res.scalar_one()
-    next_version = int(maxv) + 1
-
-    # Build full config snapshot (customers/projects/sites/devices/param templates minimal form)
-    cfg_customers = (await session.execute(text("SELECT id::text, name, metadata FROM customers"))).mappings().all()
-    cfg_projects = (await session.execute(text("SELECT id::text, customer_id::text AS customer_id, name, description FROM projects"))).mappings().all()
-    cfg_sites = (await session.execute(text("SELECT id::text, project_id::text AS project_id, name, location FROM sites"))).mappings().all()
-    cfg_devices = (await session.execute(text("SELECT id::text, site_id::text AS site_id, name, device_type, external_id, status FROM devices"))).mappings().all()
-    cfg_params = (await session.execute(text("SELECT id::text, key, name, unit, metadata FROM parameter_templates"))).mappings().all()
-    full_config = {
-        "customers": cfg_customers,
-        "projects": cfg_projects,
-        "sites": cfg_sites,
-        "devices": cfg_devices,
-        "parameter_templates": cfg_params,
-    }
-
-    # Insert version row
-    await session.execute(
-        text(
-            "INSERT INTO registry_versions(project_id, version, diff_json, author, full_config, checksum, description) "
-            "VALUES (:pid, :ver, :diff, :author, :full_config, :checksum, :description)"
-        ),
+    result = await session.execute(
+        text(_PUBLISH_SQL),
         {
             "pid": project_id,
-            "ver": next_version,
-            "diff": payload.diff_json,
-            "author": payload.author,
-            "full_config": full_config,
-            "checksum": f"v{next_version}",  # placeholder checksum
-            "description": f"Published by {payload.author}",
+            "diff": json.dumps(diff_json),
+            "author": author,
+            "description": f"Published by {author}",
         },
     )
+    row = result.mappings().one()
     await session.commit()
-    return PublishOut(status="ok", config_version=f"v{next_version}")
+    # Pollers of this instance see the new version at once (others after CONFIG_LATEST_TTL_SECONDS)
+    get_config_cache().set_latest(
+        str(uuid.UUID(project_id)), row["new_version"] or row["latest_version"], row["checksum"]
+    )
+    if row["new_version"] is None:
+        return PublishOut(status="unchanged", config_version=f"v{row['latest_version']}", checksum=row["checksum"])
+    return PublishOut(status="ok", config_version=f"v{row['new_version']}", checksum=row["checksum"])
+
+
+def _encoded_response(request: Request, body: ConfigBody, cache_control: str) -> Response:
+    """Cached body in the encoding the client accepts"""
+    headers = {"ETag": body.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=body.compressed, media_type="application/json", headers=headers)
+    return Response(content=body.plain, media_type="application/json", headers=headers)
+
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def _config_diff(old: dict, new: dict) -> dict:
+    """Per entity list: records added or updated in `new` (by id) and ids removed"""
+    changes = {}
+    for entity in sorted(set(old) | set(new)):
+        before = {item.get("id", item.get("key")): item for item in old.get(entity) or []}
+        after = {item.get("id", item.get("key")): item for item in new.get(entity) or []}
+        added = [item for item_id, item in after.items() if item_id not in before]
+        updated = [item for item_id, item in after.items() if item_id in before and before[item_id] != item]
+        removed = [item_id for item_id in before if item_id not in after]
+        if added or updated or removed:
+            changes[entity] = {"added": added, "updated": updated, "removed": removed}
+    return changes
 
 
 @router.get("/{project_id}/versions/latest")
-async def latest_version(project_id: str, session: AsyncSession = Depends(get_session)):
-    row = await session.execute(
+async def latest_version(
+    project_id: str,
+    request: Request,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Latest published config of the project.
+
+    The ETag is the version checksum. A poll sending it back in If-None-Match gets
+    304; within CONFIG_LATEST_TTL_SECONDS of the last lookup this is answered
+    from memory without a database query. Serialized and gzip-compressed bodies
+    are cached per (project, version), so a changed config is read from Postgres
+    once per instance.
+    """
+    project_id = str(validate_uuid(project_id, field_name="project_id"))
+    cache = get_config_cache()
+
+    latest = cache.get_latest(project_id)
+    if latest is not None and etag_matches(if_none_match, etag_for(latest[1])):
+        config_cache_counter.labels(endpoint="latest", result="not_modified").inc()
+        return _not_modified(etag_for(latest[1]), LATEST_CACHE_CONTROL)
+
+    if latest is None:
+        # Version and checksum only (index lookup); full_config is read below if not cached
+        row = await session.execute(
+            text(
+                "SELECT version, checksum FROM registry_versions "
+                "WHERE project_id = :pid AND version IS NOT NULL ORDER BY version DESC LIMIT 1"
+            ),
+            {"pid": project_id},
+        )
+        found = row.mappings().first()
+        if not found:
+            raise HTTPException(status_code=404, detail="No versions")
+        latest = (found["version"], found["checksum"])
+        cache.set_latest(project_id, *latest)
+        if etag_matches(if_none_match, etag_for(latest[1])):
+            config_cache_counter.labels(endpoint="latest", result="not_modified").inc()
+            return _not_modified(etag_for(latest[1]), LATEST_CACHE_CONTROL)
+
+    version, checksum = latest
+    body = cache.get_body((project_id, version))
+    if body is not None:
+        config_cache_counter.labels(endpoint="latest", result="hit").inc()
+    else:
+        config_cache_counter.labels(endpoint="latest", result="miss").inc()
+        row = await session.execute(
+            text("SELECT full_config::text FROM registry_versions WHERE project_id = :pid AND version = :ver"),
+            {"pid": project_id, "ver": version},
+        )
+        config_text = row.scalar_one_or_none()
+        if config_text is None:
+            raise HTTPException(status_code=404, detail="No versions")
+        # The stored JSON text is embedded as is, without parsing and re-serializing it
+        plain = (
+            f'{{"config_version":"v{version}","checksum":{json.dumps(checksum)},"config":'.encode()
+            + config_text.encode()
+            + b"}"
+        )
+        body = ConfigBody(plain, etag_for(checksum))
+        cache.put_body((project_id, version), body)
+    return _encoded_response(request, body, LATEST_CACHE_CONTROL)
+
+
+@router.get("/{project_id}/versions/{version}/diff")
+async def version_diff(
+    project_id: str,
+    version: int,
+    request: Request,
+    since: int = Query(..., ge=0, description="Version the client has (0: none, the diff then adds everything)"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Changes from version `since` to `version`: per entity list (customers,
+    projects, sites, devices, parameter_templates) the records added or updated
+    and the ids removed.
+
+    Published versions never change, so a diff is computed once per instance,
+    cached (plain and gzip) and served with an immutable Cache-Control.
+    """
+    project_id = str(validate_uuid(project_id, field_name="project_id"))
+    if since > version:
+        raise HTTPException(status_code=400, detail="since must not be greater than version")
+    cache = get_config_cache()
+    key = (project_id, version, since)
+
+    body = cache.get_body(key)
+    if body is not None:
+        if etag_matches(if_none_match, body.etag):
+            config_cache_counter.labels(endpoint="diff", result="not_modified").inc()
+            return _not_modified(body.etag, DIFF_CACHE_CONTROL)
+        config_cache_counter.labels(endpoint="diff", result="hit").inc()
+        return _encoded_response(request, body, DIFF_CACHE_CONTROL)
+
+    config_cache_counter.labels(endpoint="diff", result="miss").inc()
+    result = await session.execute(
         text(
-            "SELECT version, full_config FROM registry_versions "
-            "WHERE project_id = :pid ORDER BY version DESC LIMIT 1"
+            "SELECT version, checksum, full_config FROM registry_versions "
+            "WHERE project_id = :pid AND version IN (:ver, :since)"
         ),
-        {"pid": project_id},
+        {"pid": project_id, "ver": version, "since": since},
     )
-    latest = row.mappings().first()
-    if not latest:
-        raise HTTPException(status_code=404, detail="No versions")
-    return {"config_version": f"v{latest['version']}", "config": latest["full_config"]}
-
+    rows = {row["version"]: row for row in result.mappings().all()}
+    if version not in rows or (since != 0 and since not in rows):
+        raise HTTPException(status_code=404, detail="Version not found")
 
+    old = rows[since]["full_config"] if since != 0 else {}
+    new = rows[version]["full_config"]
+    checksum = rows[version]["checksum"]
+    payload = {
+        "config_version": f"v{version}",
+        "since_version": f"v{since}",
+        "checksum": checksum,
+        "changes": _config_diff(old or {}, new or {}),
+    }
+    body = ConfigBody(json.dumps(payload, separators=(",", ":")).encode(), etag_for(checksum, f"-since-{since}"))
+    cache.put_body(key, body)
+    if etag_matches(if_none_match, body.etag):
+        return _not_modified(body.etag, DIFF_CACHE_CONTROL)
+    return _encoded_response(request, body, DIFF_CACHE_CONTROL)
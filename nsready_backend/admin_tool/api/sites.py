@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import Optional
 import uuid
 
-from core.db import get_session
-from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid, verify_project_belongs_to_tenant, verify_site_belongs_to_tenant
+from core.db import get_session, get_read_session
+from core.ownership import get_ownership_index
+from core.registry_events import commit_registry_changes, registry_change
+from api.deps import bearer_auth, get_tenant_customer_id, verify_customer_exists, verify_tenant_access, validate_uuid, verify_project_belongs_to_tenant, verify_site_belongs_to_tenant, get_parent_id, LIST_MAX_LIMIT, keyset_page, list_response, like_prefix
 from api.models import SiteIn, SiteOut
 
 router = APIRouter(prefix="/sites", tags=["sites"], dependencies=[Depends(bearer_auth)])
@@ -13,47 +15,58 @@ router = APIRouter(prefix="/sites", tags=["sites"], dependencies=[Depends(bearer
 
 @router.get("", response_model=list[SiteOut])
 async def list_sites(
+    limit: Optional[int] = Query(None, ge=1, le=LIST_MAX_LIMIT, description="Page size (default: all sites)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    project_id: Optional[str] = Query(None, description="Only sites of this project"),
+    name_prefix: Optional[str] = Query(None, description="Only sites whose name starts with this"),
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
-    List sites.
+    List sites, newest first.
 
     Behaviour:
     - Engineer/Admin (no X-Customer-ID): return all sites (current behaviour).
     - Customer (with X-Customer-ID): return only that customer's sites (via projects).
 
     Filtering: sites → projects → customers
+
+    Pagination: with `limit`, a full page carries X-Next-Cursor; pass it as
+    `cursor` for the next page (keyset on created_at, id).
     """
-    # Engineer/Admin mode: no tenant filter
-    if tenant_id is None:
-        result = await session.execute(
-            text(
-                "SELECT id::text, project_id::text AS project_id, name, location, created_at "
-                "FROM sites ORDER BY created_at DESC"
+    conditions, params, joins = [], {}, ""
+    if tenant_id is not None:
+        # Customer mode: tenant_id must exist
+        if not await verify_customer_exists(tenant_id, session):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Customer {tenant_id} not found",
             )
-        )
-        return [SiteOut(**row) for row in result.mappings().all()]
-
-    # Customer mode: tenant_id must exist
-    if not await verify_customer_exists(tenant_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Customer {tenant_id} not found",
-        )
-
-    # Filter by tenant (sites → projects → customers)
+        joins = "JOIN projects p ON p.id = s.project_id"
+        conditions.append("p.customer_id = :customer_id")
+        params["customer_id"] = str(tenant_id)
+
+    if project_id is not None:
+        validate_uuid(project_id, field_name="project_id")
+        conditions.append("s.project_id = CAST(:project_id AS uuid)")
+        params["project_id"] = project_id
+    if name_prefix:
+        conditions.append("s.name LIKE :name_pattern")
+        params["name_pattern"] = like_prefix(name_prefix)
+
+    tail = keyset_page("s", cursor, limit, conditions, params)
     result = await session.execute(
-        text("""
+        text(f"""
             SELECT s.id::text, s.project_id::text AS project_id, s.name, s.location, s.created_at
             FROM sites s
-            JOIN projects p ON p.id = s.project_id
-            WHERE p.customer_id = :customer_id
-            ORDER BY s.created_at DESC
+            {joins}
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            {tail}
         """),
-        {"customer_id": str(tenant_id)},
+        params,
     )
-    return [SiteOut(**row) for row in result.mappings().all()]
+    rows = [dict(row) for row in result.mappings().all()]
+    return list_response(rows, limit)
 
 
 @router.post("", response_model=SiteOut)
@@ -85,15 +98,16 @@ async def create_site(
         ),
         {"project_id": payload.project_id, "name": payload.name, "location": json.dumps(payload.location or {})},
     )
-    await session.commit()
-    return SiteOut(**result.mappings().one())
+    row = result.mappings().one()
+    await commit_registry_changes(session, registry_change("site", "create", row["id"]))
+    return dict(row)
 
 
 @router.get("/{site_id}", response_model=SiteOut)
 async def get_site(
     site_id: str,
     tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """
     Get site by ID.
@@ -129,13 +143,7 @@ async def get_site(
         await verify_tenant_access(tenant_id, row["customer_id"], session)
 
     # Return site data (without customer_id in response)
-    return SiteOut(
-        id=row["id"],
-        project_id=row["project_id"],
-        name=row["name"],
-        location=row["location"],
-        created_at=row["created_at"],
-    )
+    return {k: v for k, v in row.items() if k != "customer_id"}
 
 
 @router.put("/{site_id}", response_model=SiteOut)
@@ -165,13 +173,9 @@ async def update_site(
         # First, verify the existing site belongs to tenant
         await verify_site_belongs_to_tenant(site_id, tenant_id, session)
         
-        # Verify new project_id (if changed) also belongs to tenant
-        result = await session.execute(
-            text("SELECT project_id::text FROM sites WHERE id = :id"),
-            {"id": site_id},
-        )
-        existing = result.mappings().first()
-        if existing and existing["project_id"] != payload.project_id:
+        # Verify new project_id (if changed) also belongs to tenant (current parent is cached)
+        existing_project_id = await get_parent_id("site", site_id, session)
+        if existing_project_id and existing_project_id != payload.project_id:
             await verify_project_belongs_to_tenant(payload.project_id, tenant_id, session)
     
     import json
@@ -183,11 +187,13 @@ async def update_site(
         ),
         {"id": site_id, "project_id": payload.project_id, "name": payload.name, "location": json.dumps(payload.location or {})},
     )
-    await session.commit()
     row = result.mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Site not found")
-    return SiteOut(**row)
+    await commit_registry_changes(session, registry_change("site", "update", row["id"]))
+    # The site may have moved to another project
+    get_ownership_index().invalidate("site", site_id)
+    return dict(row)
 
 
 @router.delete("/{site_id}")
@@ -213,9 +219,10 @@ async def delete_site(
         await verify_site_belongs_to_tenant(site_id, tenant_id, session)
     
     result = await session.execute(text("DELETE FROM sites WHERE id = :id"), {"id": site_id})
-    await session.commit()
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Site not found")
+    await commit_registry_changes(session, registry_change("site", "delete", str(uuid.UUID(site_id))))
+    get_ownership_index().invalidate("site", site_id)
     return {"status": "ok"}
 
 
@@ -1,20 +1,53 @@
+import os
 import contextlib
 from fastapi import FastAPI
-from core.db import create_engine, create_sessionmaker, healthcheck
+from core.db import create_engine, create_sessionmaker, set_sessionmaker, init_read_router, healthcheck
+from core.ownership import OwnershipListener, get_ownership_index
+from core.registry_events import init_registry_events
+from core.jobs import init_job_runner
+from core.metrics import get_metrics_response
 from api.customers import router as customers_router
 from api.projects import router as projects_router
 from api.sites import router as sites_router
 from api.devices import router as devices_router
 from api.parameter_templates import router as param_templates_router
 from api.registry_versions import router as registry_versions_router
+from api.registry_import import router as registry_import_router
+from api.jobs import router as jobs_router
 
 engine = create_engine()
 SessionLocal = create_sessionmaker(engine)
+set_sessionmaker(SessionLocal)
 
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI):
     await healthcheck(engine)
+    # List/get handlers read from replicas within the lag limit (DATABASE_REPLICA_URLS)
+    read_router = init_read_router()
+    await read_router.start()
+    # Invalidate cached tenant ownership on registry changes made elsewhere (migration 230)
+    ownership_listener = None
+    if os.getenv("OWNERSHIP_LISTEN_ENABLED", "true").lower() == "true":
+        ownership_listener = OwnershipListener(engine, get_ownership_index())
+        await ownership_listener.start()
+    # Publish registry.changes.<entity> events on NATS after each committed change (migration 260)
+    registry_events = None
+    if os.getenv("REGISTRY_EVENTS_ENABLED", "true").lower() == "true":
+        registry_events = init_registry_events()
+        await registry_events.start()
+    # Run queued admin jobs (migration 280); handlers are registered by api.jobs
+    job_runner = None
+    if os.getenv("JOBS_ENABLED", "true").lower() == "true":
+        job_runner = init_job_runner(SessionLocal)
+        await job_runner.start()
     yield
+    if job_runner:
+        await job_runner.stop()
+    if registry_events:
+        await registry_events.stop()
+    if ownership_listener:
+        await ownership_listener.stop()
+    await read_router.stop()
     await engine.dispose()
 
 app = FastAPI(title="NTPPL NS-Ready Admin Tool", lifespan=lifespan)
@@ -25,9 +58,17 @@ app.include_router(sites_router, prefix="/admin")
 app.include_router(devices_router, prefix="/admin")
 app.include_router(param_templates_router, prefix="/admin")
 app.include_router(registry_versions_router, prefix="/admin")
+app.include_router(registry_import_router, prefix="/admin")
+app.include_router(jobs_router, prefix="/admin")
 
 @app.get("/health")
 def health():
     return {"service": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return get_metrics_response()
+
+
@@ -0,0 +1,98 @@
+import os
+import time
+import gzip
+from collections import OrderedDict
+from typing import Optional
+from core.metrics import config_cache_bytes_gauge
+
+
+class ConfigBody:
+    """A serialized response held in the cache: JSON bytes, its gzip form and ETag"""
+
+    __slots__ = ("plain", "compressed", "etag")
+
+    def __init__(self, plain: bytes, etag: str):
+        self.plain = plain
+        self.compressed = gzip.compress(plain, compresslevel=6)
+        self.etag = etag
+
+    @property
+    def size(self) -> int:
+        return len(self.plain) + len(self.compressed)
+
+
+class ConfigCache:
+    """
+    In-process cache of published registry configs for gateway/collector polling.
+
+    Two parts:
+    - latest: project → (version, checksum), kept CONFIG_LATEST_TTL_SECONDS.
+      A poll whose If-None-Match equals the latest checksum is answered 304
+      from this alone. Publishing through this instance updates it at once;
+      versions published by other instances are seen after the TTL.
+    - bodies: serialized responses (plain and gzip) keyed by (project, version)
+      or (project, version, since) for diffs. Published versions never change,
+      so entries are only evicted for size (CONFIG_CACHE_MAX_BYTES, least
+      recently used first).
+    """
+
+    def __init__(self):
+        self.latest_ttl = float(os.getenv("CONFIG_LATEST_TTL_SECONDS", "5"))
+        self.max_bytes = int(os.getenv("CONFIG_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self._latest: dict[str, tuple[int, str, float]] = {}
+        self._bodies: "OrderedDict[tuple, ConfigBody]" = OrderedDict()
+        self._bytes = 0
+
+    def get_latest(self, project_id: str) -> Optional[tuple[int, str]]:
+        entry = self._latest.get(project_id)
+        if entry is None or entry[2] < time.monotonic():
+            return None
+        return entry[0], entry[1]
+
+    def set_latest(self, project_id: str, version: int, checksum: str) -> None:
+        current = self._latest.get(project_id)
+        # A slower request must not move the pointer back to an older version
+        if current is not None and current[0] > version and current[2] >= time.monotonic():
+            return
+        self._latest[project_id] = (version, checksum, time.monotonic() + self.latest_ttl)
+
+    def get_body(self, key: tuple) -> Optional[ConfigBody]:
+        body = self._bodies.get(key)
+        if body is not None:
+            self._bodies.move_to_end(key)
+        return body
+
+    def put_body(self, key: tuple, body: ConfigBody) -> None:
+        if body.size > self.max_bytes:
+            return
+        old = self._bodies.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._bodies[key] = body
+        self._bytes += body.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._bodies.popitem(last=False)
+            self._bytes -= evicted.size
+        config_cache_bytes_gauge.set(self._bytes)
+
+
+def etag_for(checksum: str, suffix: str = "") -> str:
+    """Weak ETag: the same for the plain and gzip encoding of a response"""
+    return f'W/"{checksum}{suffix}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+_cache = ConfigCache()
+
+
+def get_config_cache() -> ConfigCache:
+    return _cache
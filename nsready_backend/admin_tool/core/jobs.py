@@ -0,0 +1,385 @@
+"""
+Background jobs for heavy admin operations (migration 280).
+
+Submitting inserts a queued admin_jobs row (parameters and uploaded body
+included) and returns at once. JobRunner workers of every admin instance
+claim queued jobs, oldest first, in a transaction holding a global advisory
+lock, so at most JOB_TENANT_CONCURRENCY jobs of one tenant run at a time
+across instances. A running job reports progress and a heartbeat to its row
+and ends with its result (JSON, and optionally a file) or error. A file is
+written as it is produced, in chunks of at most JOB_OUTPUT_CHUNK_BYTES
+(admin_job_output_chunks, migration 330), so it is never held in memory whole.
+
+Handlers are registered per kind with @job_handler by the routers that own the
+operation. A job whose worker stops heartbeating (crash, restart) is queued
+again after JOB_STALE_SECONDS, up to JOB_MAX_ATTEMPTS. Shutting down requeues
+running jobs at once.
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from core.metrics import jobs_counter, jobs_running_gauge
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Columns of a job as returned by the API (JobOut)
+JOB_COLUMNS = """
+    id::text, kind, customer_id::text AS customer_id, status, params, progress, result, error, attempts,
+    output_type IS NOT NULL AS has_output, created_at, updated_at, started_at, finished_at
+"""
+
+_SUBMIT = f"""
+    INSERT INTO admin_jobs (kind, customer_id, params, input)
+    VALUES (:kind, CAST(:customer_id AS uuid), CAST(:params AS jsonb), :input)
+    RETURNING {JOB_COLUMNS}
+"""
+
+# Oldest queued job of a tenant below its concurrency limit; callers hold _CLAIM_LOCK
+_CLAIM = """
+    WITH running AS (
+        SELECT customer_id, count(*) AS n FROM admin_jobs WHERE status = 'running' GROUP BY customer_id
+    ),
+    next AS (
+        SELECT j.id FROM admin_jobs j
+        LEFT JOIN running r ON r.customer_id IS NOT DISTINCT FROM j.customer_id
+        WHERE j.status = 'queued' AND COALESCE(r.n, 0) < :tenant_limit
+        ORDER BY j.created_at
+        LIMIT 1
+        FOR UPDATE OF j SKIP LOCKED
+    )
+    UPDATE admin_jobs j
+    SET status = 'running', attempts = j.attempts + 1, worker = :worker,
+        started_at = NOW(), heartbeat_at = NOW(), updated_at = NOW()
+    FROM next
+    WHERE j.id = next.id
+    RETURNING j.id::text, j.kind, j.customer_id::text AS customer_id, j.params, j.input
+"""
+
+_CLAIM_LOCK = "SELECT pg_advisory_xact_lock(hashtext('admin_jobs_claim'))"
+
+_HEARTBEAT = """
+    UPDATE admin_jobs SET heartbeat_at = NOW()
+    WHERE id = CAST(:id AS uuid) AND worker = :worker AND status = 'running'
+    RETURNING cancel_requested
+"""
+
+_PROGRESS = """
+    UPDATE admin_jobs SET progress = CAST(:progress AS jsonb), updated_at = NOW()
+    WHERE id = CAST(:id AS uuid) AND worker = :worker AND status = 'running'
+"""
+
+_FINISH = """
+    UPDATE admin_jobs
+    SET status = :status, result = CAST(:result AS jsonb), output_type = :output_type,
+        error = :error, input = NULL, finished_at = NOW(), updated_at = NOW()
+    WHERE id = CAST(:id AS uuid) AND worker = :worker AND status = 'running'
+"""
+
+# Chunks left by an earlier, interrupted attempt
+_CLEAR_OUTPUT = "DELETE FROM admin_job_output_chunks WHERE job_id = CAST(:id AS uuid)"
+
+# Only while this worker still owns the job (not taken over after a stale heartbeat)
+_OUTPUT_CHUNK = """
+    INSERT INTO admin_job_output_chunks (job_id, seq, data)
+    SELECT id, :seq, :data FROM admin_jobs
+    WHERE id = CAST(:id AS uuid) AND worker = :worker AND status = 'running'
+"""
+
+# Interrupted by shutdown: not counted as an attempt
+_REQUEUE = """
+    UPDATE admin_jobs
+    SET status = 'queued', worker = NULL, attempts = attempts - 1, updated_at = NOW()
+    WHERE id = CAST(:id AS uuid) AND worker = :worker AND status = 'running'
+"""
+
+_RECOVER_STALE = """
+    UPDATE admin_jobs
+    SET status = CASE WHEN attempts < :max_attempts THEN 'queued' ELSE 'failed' END,
+        error = CASE WHEN attempts < :max_attempts THEN error ELSE 'Worker lost (no heartbeat)' END,
+        finished_at = CASE WHEN attempts < :max_attempts THEN NULL ELSE NOW() END,
+        input = CASE WHEN attempts < :max_attempts THEN input END,
+        worker = NULL, updated_at = NOW()
+    WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => :stale_seconds)
+    RETURNING status
+"""
+
+_PURGE = "DELETE FROM admin_jobs WHERE finished_at < NOW() - make_interval(days => :days)"
+
+
+class JobContext:
+    """What a handler gets: the job's parameters and input, and progress reporting"""
+
+    def __init__(self, runner: "JobRunner", job: dict):
+        self.id: str = job["id"]
+        self.kind: str = job["kind"]
+        self.customer_id: Optional[str] = job["customer_id"]
+        self.params: dict = job["params"] or {}
+        self.input: Optional[bytes] = job["input"]
+        self.output_type: Optional[str] = None
+        self._output = bytearray()
+        self._output_seq = 0
+        self.cancel_requested = False
+        self._runner = runner
+        self._last_progress = float("-inf")
+
+    async def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None,
+                       force: bool = False) -> None:
+        """Record progress; written at most every JOB_PROGRESS_INTERVAL_SECONDS unless forced"""
+        now = time.monotonic()
+        if not force and now - self._last_progress < self._runner.progress_interval:
+            return
+        self._last_progress = now
+        await self._runner._execute_sql(
+            _PROGRESS,
+            {"id": self.id, "worker": self._runner.worker_id,
+             "progress": json.dumps({"done": done, "total": total, "message": message})},
+        )
+
+    async def write_output(self, data: bytes, media_type: str) -> None:
+        """Append to the file result, downloadable from GET /admin/jobs/{id}/output"""
+        self.output_type = media_type
+        self._output += data
+        if len(self._output) >= self._runner.output_chunk_bytes:
+            await self.flush_output()
+
+    async def flush_output(self) -> None:
+        """Store the buffered part of the file result as the next chunk"""
+        if not self._output:
+            return
+        await self._runner._execute_sql(
+            _OUTPUT_CHUNK,
+            {"id": self.id, "worker": self._runner.worker_id, "seq": self._output_seq, "data": bytes(self._output)},
+        )
+        self._output_seq += 1
+        self._output = bytearray()
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[dict]]]
+
+_handlers: dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the handler of a job kind; it returns the job's JSON result"""
+    def register(fn: JobHandler) -> JobHandler:
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+class JobRunner:
+    """
+    Bounded pool of JOB_WORKERS workers claiming jobs from admin_jobs.
+
+    Workers wait for a wake-up (a job submitted or finished in this instance)
+    or JOB_POLL_SECONDS. Each running job has a heartbeat task, which also
+    cancels the job when cancellation is requested. A maintenance task requeues
+    jobs with a stale heartbeat and deletes finished jobs after
+    JOB_RETENTION_DAYS.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]):
+        self.session_factory = session_factory
+        self.workers = int(os.getenv("JOB_WORKERS", "4"))
+        self.tenant_limit = int(os.getenv("JOB_TENANT_CONCURRENCY", "1"))
+        self.poll_interval = float(os.getenv("JOB_POLL_SECONDS", "2"))
+        self.heartbeat_interval = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+        self.stale_after = float(os.getenv("JOB_STALE_SECONDS", "60"))
+        self.max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.timeout = float(os.getenv("JOB_TIMEOUT_SECONDS", "3600"))
+        self.retention_days = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+        self.progress_interval = float(os.getenv("JOB_PROGRESS_INTERVAL_SECONDS", "1"))
+        self.output_chunk_bytes = int(os.getenv("JOB_OUTPUT_CHUNK_BYTES", str(1024 * 1024)))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self.running = False
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+        logger.info(f"Job runner started ({self.workers} workers, {self.tenant_limit} per tenant)")
+
+    async def stop(self) -> None:
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        # Workers requeue their running jobs while cancelling
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job runner stopped")
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _execute_sql(self, sql: str, params: dict):
+        async with self.session_factory() as session:
+            result = await session.execute(text(sql), params)
+            await session.commit()
+            return result
+
+    async def _claim(self) -> Optional[dict]:
+        async with self.session_factory() as session:
+            await session.execute(text(_CLAIM_LOCK))
+            result = await session.execute(
+                text(_CLAIM), {"tenant_limit": self.tenant_limit, "worker": self.worker_id}
+            )
+            row = result.mappings().first()
+            await session.commit()
+            return dict(row) if row else None
+
+    async def _work(self) -> None:
+        while self.running:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            await self._run(job)
+            # A tenant slot is free again
+            self.wake()
+
+    async def _run(self, job: dict) -> None:
+        ctx = JobContext(self, job)
+        handler = _handlers.get(ctx.kind)
+        if handler is None:
+            await self._finish(ctx, "failed", error=f"Unknown job kind {ctx.kind}")
+            return
+        logger.info(f"Job {ctx.id} ({ctx.kind}) started")
+        jobs_running_gauge.inc()
+        task = asyncio.create_task(asyncio.wait_for(self._handle(handler, ctx), timeout=self.timeout))
+        heartbeat = asyncio.create_task(self._heartbeat(ctx, task))
+        try:
+            result = await task
+            await self._finish(ctx, "succeeded", result=result)
+        except asyncio.CancelledError:
+            if not ctx.cancel_requested:
+                # Shutdown: another worker picks the job up again
+                task.cancel()
+                await self._execute_sql(_REQUEUE, {"id": ctx.id, "worker": self.worker_id})
+                logger.info(f"Job {ctx.id} ({ctx.kind}) interrupted, requeued")
+                raise
+            await self._finish(ctx, "cancelled", error="Cancelled")
+        except asyncio.TimeoutError:
+            await self._finish(ctx, "failed", error=f"Timed out after {self.timeout:g}s")
+        except Exception as e:
+            # HTTPException from shared route code carries its message in detail
+            error = getattr(e, "detail", None) or str(e) or type(e).__name__
+            logger.warning(f"Job {ctx.id} ({ctx.kind}) failed: {error}")
+            await self._finish(ctx, "failed", error=str(error))
+        finally:
+            heartbeat.cancel()
+            jobs_running_gauge.dec()
+
+    async def _handle(self, handler: JobHandler, ctx: JobContext) -> Optional[dict]:
+        await self._execute_sql(_CLEAR_OUTPUT, {"id": ctx.id})
+        result = await handler(ctx)
+        await ctx.flush_output()
+        return result
+
+    async def _heartbeat(self, ctx: JobContext, task: asyncio.Task) -> None:
+        while not task.done():
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                result = await self._execute_sql(_HEARTBEAT, {"id": ctx.id, "worker": self.worker_id})
+                row = result.first()
+            except Exception as e:
+                logger.warning(f"Job {ctx.id} heartbeat failed: {e}")
+                continue
+            # No row: the job was deleted (customer removed) or taken over after a stale heartbeat
+            if row is None or row[0]:
+                ctx.cancel_requested = True
+                task.cancel()
+                return
+
+    async def _finish(self, ctx: JobContext, status: str, result: Optional[dict] = None,
+                      error: Optional[str] = None) -> None:
+        await self._execute_sql(
+            _FINISH,
+            {
+                "id": ctx.id,
+                "worker": self.worker_id,
+                "status": status,
+                "result": json.dumps(result, default=str) if result is not None else None,
+                "output_type": ctx.output_type if status == "succeeded" else None,
+                "error": error,
+            },
+        )
+        jobs_counter.labels(kind=ctx.kind, status=status).inc()
+        logger.info(f"Job {ctx.id} ({ctx.kind}) {status}")
+
+    async def _maintain(self) -> None:
+        while self.running:
+            try:
+                result = await self._execute_sql(
+                    _RECOVER_STALE, {"max_attempts": self.max_attempts, "stale_seconds": self.stale_after}
+                )
+                statuses = [row[0] for row in result]
+                if statuses:
+                    logger.warning(f"Recovered {len(statuses)} job(s) with a stale heartbeat")
+                    self.wake()
+                await self._execute_sql(_PURGE, {"days": self.retention_days})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job maintenance failed: {e}")
+            await asyncio.sleep(self.stale_after / 2)
+
+
+_runner: Optional[JobRunner] = None
+
+
+def init_job_runner(session_factory: async_sessionmaker[AsyncSession]) -> JobRunner:
+    global _runner
+    _runner = JobRunner(session_factory)
+    return _runner
+
+
+def get_job_runner() -> Optional[JobRunner]:
+    """None when JOBS_ENABLED is off in this instance (jobs then wait for another instance)"""
+    return _runner
+
+
+async def submit_job(
+    session: AsyncSession,
+    kind: str,
+    customer_id: Optional[Any],
+    params: Optional[dict] = None,
+    input: Optional[bytes] = None,
+) -> dict:
+    """Queue a job and return its row (JOB_COLUMNS)"""
+    result = await session.execute(
+        text(_SUBMIT),
+        {
+            "kind": kind,
+            "customer_id": str(customer_id) if customer_id is not None else None,
+            "params": json.dumps(params or {}),
+            "input": input,
+        },
+    )
+    row = dict(result.mappings().one())
+    await session.commit()
+    runner = get_job_runner()
+    if runner is not None:
+        runner.wake()
+    return row
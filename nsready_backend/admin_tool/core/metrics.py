@@ -0,0 +1,57 @@
+from prometheus_client import Counter, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from fastapi import Response
+
+# Metrics
+db_routing_counter = Counter(
+    'db_session_routes_total',
+    'Database sessions handed out, by kind (read: get_read_session, primary: get_session) and target (primary, replica, primary_fallback)',
+    ['kind', 'target']
+)
+
+replica_lag_gauge = Gauge(
+    'db_replica_lag_seconds',
+    'Replay lag of each read replica at the last check (-1 when the check failed)',
+    ['replica']
+)
+
+ownership_cache_counter = Counter(
+    'admin_ownership_cache_lookups_total',
+    'Tenant ownership index lookups per chain link (hit, miss)',
+    ['result']
+)
+
+config_cache_counter = Counter(
+    'admin_config_cache_requests_total',
+    'Registry config requests by outcome (not_modified, hit, miss)',
+    ['endpoint', 'result']
+)
+
+config_cache_bytes_gauge = Gauge(
+    'admin_config_cache_bytes',
+    'Bytes of serialized (plain and gzip) registry configs and diffs held in memory'
+)
+
+
+registry_events_counter = Counter(
+    'admin_registry_events_total',
+    'Registry change events after commit, by entity and result (published, dropped)',
+    ['entity', 'result']
+)
+
+jobs_counter = Counter(
+    'admin_jobs_total',
+    'Admin background jobs finished by this instance, by kind and status (succeeded, failed, cancelled)',
+    ['kind', 'status']
+)
+
+jobs_running_gauge = Gauge(
+    'admin_jobs_running',
+    'Admin background jobs running in this instance'
+)
+
+def get_metrics_response() -> Response:
+    """Generate Prometheus metrics response"""
+    return Response(
+        content=generate_latest(),
+        media_type=CONTENT_TYPE_LATEST
+    )
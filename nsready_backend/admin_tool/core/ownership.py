@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncEngine
+from core.metrics import ownership_cache_counter
+
+logger = logging.getLogger(__name__)
+
+# Ownership chain of registry resources: each kind maps to the id of the next kind up
+PARENT_KIND = {"device": "site", "site": "project", "project": "customer"}
+
+# pg_notify channel of migration 230; payload "<kind>:<id>" for moved or deleted resources
+NOTIFY_CHANNEL = "registry_changes"
+
+
+def canonical_id(resource_id: str) -> str:
+    return str(uuid.UUID(str(resource_id)))
+
+
+class OwnershipIndex:
+    """
+    In-process map of registry resource → parent (device → site → project → customer).
+
+    Tenant checks walk the chain in memory and only query the database for the
+    first missing link, so a repeated check costs no round trip. Each link is
+    cached separately: moving a site to another project only invalidates that
+    site, and its devices resolve through the new project on the next lookup.
+    Customer entries record existence (the value is the customer's own id).
+
+    Entries expire after OWNERSHIP_CACHE_TTL_SECONDS; at most
+    OWNERSHIP_CACHE_MAX_ENTRIES are kept (least recently used evicted first).
+    Admin routers invalidate what they change, and the LISTEN/NOTIFY listener
+    invalidates changes made by other instances or directly in the database.
+    Absence is never cached, so a new resource is visible immediately.
+    """
+
+    def __init__(self):
+        self.max_entries = int(os.getenv("OWNERSHIP_CACHE_MAX_ENTRIES", "100000"))
+        self.ttl = float(os.getenv("OWNERSHIP_CACHE_TTL_SECONDS", "300"))
+        # A load that started before an invalidation (or read a lagging replica) must not
+        # put the old parent back; puts are ignored this long after a key was invalidated
+        replicas = bool(os.getenv("DATABASE_REPLICA_URLS", "").strip())
+        self.settle = max(1.0, float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10")) if replicas else 1.0)
+        self._entries: "OrderedDict[tuple[str, str], tuple[str, float]]" = OrderedDict()
+        self._invalidated: dict[tuple[str, str], float] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, kind: str, resource_id: str) -> Optional[str]:
+        key = (kind, resource_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            ownership_cache_counter.labels(result="miss").inc()
+            return None
+        parent, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            ownership_cache_counter.labels(result="miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        ownership_cache_counter.labels(result="hit").inc()
+        return parent
+
+    def put(self, kind: str, resource_id: str, parent: str) -> None:
+        key = (kind, resource_id)
+        now = time.monotonic()
+        invalidated_at = self._invalidated.get(key)
+        if invalidated_at is not None:
+            if now - invalidated_at < self.settle:
+                return
+            del self._invalidated[key]
+        self._entries[key] = (parent, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, kind: str, resource_id: str) -> None:
+        try:
+            key = (kind, canonical_id(resource_id))
+        except ValueError:
+            return
+        self._entries.pop(key, None)
+        now = time.monotonic()
+        self._invalidated[key] = now
+        if len(self._invalidated) > 1000:
+            self._invalidated = {k: t for k, t in self._invalidated.items() if now - t < self.settle}
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class OwnershipListener:
+    """
+    Invalidates the ownership index from registry_changes notifications.
+
+    Holds one connection of the primary engine with LISTEN registry_changes.
+    Notifications sent while it is disconnected are lost, so the index is
+    cleared whenever the listener (re)connects.
+    """
+
+    def __init__(self, engine: AsyncEngine, index: OwnershipIndex):
+        self.engine = engine
+        self.index = index
+        self.retry_interval = 5.0
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Ownership listener stopped")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        kind, _, resource_id = payload.partition(":")
+        self.index.invalidate(kind, resource_id)
+
+    async def _run(self) -> None:
+        while self.running:
+            try:
+                async with self.engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    await driver.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                    self.index.clear()
+                    logger.info(f"Listening on {NOTIFY_CHANNEL} for registry changes")
+                    try:
+                        while self.running and not driver.is_closed():
+                            await asyncio.sleep(self.retry_interval)
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(NOTIFY_CHANNEL, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ownership listener failed: {e}")
+            if self.running:
+                # Changes may have been missed while disconnected
+                self.index.clear()
+                await asyncio.sleep(self.retry_interval)
+
+
+_index = OwnershipIndex()
+
+
+def get_ownership_index() -> OwnershipIndex:
+    return _index
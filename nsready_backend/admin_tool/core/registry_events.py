@@ -0,0 +1,143 @@
+"""
+Registry change events on NATS.
+
+After an admin transaction that changes the registry commits, one compact JSON
+message per changed entity is published on `registry.changes.<entity>`
+(customer, project, site, device, parameter_template):
+
+    {"entity": "device", "id": "<uuid>", "op": "delete", "version": 42, "ts": 1700000000.0}
+
+`op` is create, update, delete, or bulk for imports and batches (id is null;
+subscribers drop everything they cache for that entity). `version` is the
+registry change version of migration 260, incremented once per transaction, so
+a subscriber that sees it jump knows events were missed. Parameter template
+events also carry the template `key`.
+
+Publishing is best effort: the change is already committed, so a NATS outage
+is logged and counted but never fails the request. Subscribers fall back to
+their TTL reloads for anything they miss.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from nats.aio.client import Client as NATS
+from core.metrics import registry_events_counter
+
+logger = logging.getLogger(__name__)
+
+_BUMP_VERSION = "UPDATE registry_change_version SET version = version + 1 WHERE id RETURNING version"
+
+
+def registry_change(entity: str, op: str, entity_id: Optional[str] = None, **fields) -> dict:
+    """An event without version and timestamp (added at commit)"""
+    return {"entity": entity, "id": entity_id, "op": op, **fields}
+
+
+class RegistryEventPublisher:
+    """
+    NATS connection for registry change events.
+
+    Connects in the background (the admin tool starts without NATS) and keeps
+    reconnecting; events committed while disconnected are dropped.
+    """
+
+    def __init__(self):
+        self.host = os.getenv("NATS_HOST", "nats")
+        self.port = int(os.getenv("NATS_PORT", "4222"))
+        self.subject_prefix = os.getenv("REGISTRY_EVENTS_SUBJECT_PREFIX", "registry.changes")
+        self.retry_interval = 5.0
+        self.nc: Optional[NATS] = None
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self.nc is not None and self.nc.is_connected
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._connect())
+
+    async def stop(self) -> None:
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.nc is not None and not self.nc.is_closed:
+            # Flushes events still buffered in the client
+            await self.nc.drain()
+        self.nc = None
+        logger.info("Registry event publisher stopped")
+
+    async def _connect(self) -> None:
+        while self.running:
+            nc = NATS()
+            try:
+                await nc.connect(
+                    f"nats://{self.host}:{self.port}",
+                    max_reconnect_attempts=-1,
+                    reconnect_time_wait=2,
+                )
+                self.nc = nc
+                logger.info(f"Publishing registry changes to NATS at {self.host}:{self.port}")
+                return
+            except Exception as e:
+                logger.warning(f"Registry event publisher could not connect to NATS: {e}")
+                await asyncio.sleep(self.retry_interval)
+
+    async def publish(self, events: list[dict]) -> None:
+        for event in events:
+            entity = event["entity"]
+            if not self.is_connected:
+                registry_events_counter.labels(entity=entity, result="dropped").inc()
+                continue
+            try:
+                payload = json.dumps(event, separators=(",", ":")).encode()
+                await self.nc.publish(f"{self.subject_prefix}.{entity}", payload)
+                registry_events_counter.labels(entity=entity, result="published").inc()
+            except Exception as e:
+                logger.warning(f"Could not publish registry change {entity}/{event['op']}: {e}")
+                registry_events_counter.labels(entity=entity, result="dropped").inc()
+
+
+_publisher: Optional[RegistryEventPublisher] = None
+
+
+def init_registry_events() -> RegistryEventPublisher:
+    global _publisher
+    _publisher = RegistryEventPublisher()
+    return _publisher
+
+
+def get_registry_events() -> Optional[RegistryEventPublisher]:
+    """None when REGISTRY_EVENTS_ENABLED is off"""
+    return _publisher
+
+
+async def commit_registry_changes(session: AsyncSession, *events: dict) -> None:
+    """
+    Commit the session's registry changes, then publish their events.
+
+    The change version is incremented in the same transaction, just before the
+    commit, so the row lock is held only for the commit itself. Without events
+    (or with publishing disabled) this is a plain commit.
+    """
+    publisher = get_registry_events()
+    if publisher is None or not events:
+        await session.commit()
+        return
+    version = (await session.execute(text(_BUMP_VERSION))).scalar_one()
+    await session.commit()
+    ts = time.time()
+    await publisher.publish([{**event, "version": version, "ts": ts} for event in events])
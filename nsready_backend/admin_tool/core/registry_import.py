@@ -0,0 +1,307 @@
+"""
+Bulk registry import: customers → projects → sites → devices from one CSV or NDJSON file.
+
+Rows are parsed into records and streamed with COPY into a temp table. The hierarchy
+is then resolved level by level with set-based INSERT ... ON CONFLICT DO NOTHING
+statements followed by an UPDATE that looks up the ids. The number of statements is
+the same for ten rows or a hundred thousand. Rows that fail validation keep an
+`error` and are skipped by every later step; they make up the row-level report.
+
+Matching follows shared/scripts/import_registry.sh: existing customers, projects
+(customer, name) and sites (project, name) are reused and never updated. A device
+is matched by device_code (external_id) first, then by (site, name). It is only
+created if neither matches.
+
+Only asyncpg is used here, so the benchmark in tests/benchmarks can run the same code.
+"""
+import csv
+import io
+import json
+import uuid
+from typing import Awaitable, Callable, Iterable, Iterator, Optional
+
+import asyncpg
+
+# Column order of the CSV (shared/scripts/registry_template.csv) and keys of an NDJSON object
+IMPORT_COLUMNS = (
+    "customer_name",
+    "project_name",
+    "project_description",
+    "site_name",
+    "site_location",
+    "device_name",
+    "device_type",
+    "device_code",
+    "device_status",
+)
+
+_REQUIRED = ("customer_name", "project_name", "site_name")
+
+# Reported to import_registry's on_step, in order
+IMPORT_STEPS = ("loaded", "customers", "projects", "sites", "devices")
+
+_CREATE_TABLE = """
+    CREATE TEMP TABLE registry_import (
+        line_no INTEGER NOT NULL,
+        customer_name TEXT,
+        project_name TEXT,
+        project_description TEXT,
+        site_name TEXT,
+        site_location TEXT,
+        device_name TEXT,
+        device_type TEXT,
+        device_code TEXT,
+        device_status TEXT,
+        error TEXT,
+        customer_id UUID,
+        project_id UUID,
+        site_id UUID,
+        device_id UUID
+    ) ON COMMIT DROP
+"""
+
+# Tenant mode ($1 = tenant customer id): rows must name the tenant and cannot claim device codes
+# registered to other customers; customers are never created
+_TENANT_CHECKS = (
+    """
+    UPDATE registry_import i
+    SET error = format('customer_name "%s" does not match the tenant customer "%s"', i.customer_name, c.name)
+    FROM customers c
+    WHERE c.id = $1 AND i.error IS NULL AND i.customer_name <> c.name
+    """,
+    """
+    UPDATE registry_import i
+    SET error = format('device_code "%s" belongs to another customer', i.device_code)
+    FROM devices d
+    JOIN sites s ON s.id = d.site_id
+    JOIN projects p ON p.id = s.project_id
+    WHERE i.error IS NULL AND i.device_name IS NOT NULL
+      AND d.external_id = i.device_code AND p.customer_id <> $1
+    """,
+    "UPDATE registry_import SET customer_id = $1 WHERE error IS NULL",
+)
+
+_CREATE_CUSTOMERS = """
+    WITH created AS (
+        INSERT INTO customers (name, metadata)
+        SELECT DISTINCT customer_name, '{}'::jsonb FROM registry_import WHERE error IS NULL
+        ON CONFLICT (name) DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*) FROM created
+"""
+
+_RESOLVE_CUSTOMERS = """
+    UPDATE registry_import i SET customer_id = c.id
+    FROM customers c
+    WHERE i.error IS NULL AND c.name = i.customer_name
+"""
+
+_CREATE_PROJECTS = """
+    WITH created AS (
+        INSERT INTO projects (customer_id, name, description)
+        SELECT DISTINCT ON (customer_id, project_name) customer_id, project_name, project_description
+        FROM registry_import
+        WHERE error IS NULL
+        ORDER BY customer_id, project_name, line_no
+        ON CONFLICT (customer_id, name) DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*) FROM created
+"""
+
+_RESOLVE_PROJECTS = """
+    UPDATE registry_import i SET project_id = p.id
+    FROM projects p
+    WHERE i.error IS NULL AND p.customer_id = i.customer_id AND p.name = i.project_name
+"""
+
+_CREATE_SITES = """
+    WITH created AS (
+        INSERT INTO sites (project_id, name, location)
+        SELECT DISTINCT ON (project_id, site_name) project_id, site_name, COALESCE(site_location::jsonb, '{}'::jsonb)
+        FROM registry_import
+        WHERE error IS NULL
+        ORDER BY project_id, site_name, line_no
+        ON CONFLICT (project_id, name) DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*) FROM created
+"""
+
+_RESOLVE_SITES = """
+    UPDATE registry_import i SET site_id = s.id
+    FROM sites s
+    WHERE i.error IS NULL AND s.project_id = i.project_id AND s.name = i.site_name
+"""
+
+# Device code first, then name within the site (same order as import_registry.sh)
+_RESOLVE_DEVICES = (
+    """
+    UPDATE registry_import i SET device_id = d.id
+    FROM devices d
+    WHERE i.error IS NULL AND i.device_name IS NOT NULL AND i.device_id IS NULL
+      AND d.external_id = i.device_code
+    """,
+    """
+    UPDATE registry_import i SET device_id = d.id
+    FROM devices d
+    WHERE i.error IS NULL AND i.device_name IS NOT NULL AND i.device_id IS NULL
+      AND d.site_id = i.site_id AND d.name = i.device_name
+    """,
+)
+
+# DO NOTHING without a target skips conflicts on both external_id and (site_id, name)
+_CREATE_DEVICES = """
+    WITH created AS (
+        INSERT INTO devices (site_id, name, device_type, external_id, status)
+        SELECT DISTINCT ON (site_id, device_name)
+               site_id, device_name, COALESCE(device_type, 'sensor'), device_code, COALESCE(device_status, 'active')
+        FROM registry_import
+        WHERE error IS NULL AND device_name IS NOT NULL AND device_id IS NULL
+        ORDER BY site_id, device_name, line_no
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*) FROM created
+"""
+
+_UNRESOLVED_DEVICES = """
+    UPDATE registry_import
+    SET error = 'device could not be created (device_code or name taken concurrently)'
+    WHERE error IS NULL AND device_name IS NOT NULL AND device_id IS NULL
+"""
+
+_REPORT = """
+    SELECT count(*) AS rows, count(*) FILTER (WHERE error IS NOT NULL) AS rows_failed
+    FROM registry_import
+"""
+
+_ERRORS = "SELECT line_no, error FROM registry_import WHERE error IS NOT NULL ORDER BY line_no LIMIT $1"
+
+
+def _record(line_no: int, values: dict, error: Optional[str] = None) -> tuple:
+    """Temp table record; empty values become NULL, syntax problems become the row error"""
+    fields = []
+    for column in IMPORT_COLUMNS:
+        value = values.get(column)
+        if value is not None and not isinstance(value, str):
+            value = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+        fields.append(value or None)
+    if error is None:
+        missing = [c for c, v in zip(IMPORT_COLUMNS, fields) if c in _REQUIRED and v is None]
+        if missing:
+            error = f"{missing[0]} is required"
+    location = fields[IMPORT_COLUMNS.index("site_location")]
+    if error is None and location is not None:
+        try:
+            json.loads(location)
+        except ValueError:
+            error = "site_location is not valid JSON"
+    return (line_no, *fields, error)
+
+
+def parse_csv(data: str) -> Iterator[tuple]:
+    """Records from CSV in the column order of IMPORT_COLUMNS, header row first"""
+    lines = data.splitlines()
+    reader = csv.reader(io.StringIO(data))
+    header = next(reader, None)
+    if header is None:
+        return
+    last_line = reader.line_num
+    for row in reader:
+        single_line, last_line = reader.line_num == last_line + 1, reader.line_num
+        if not row:
+            continue
+        if len(row) > len(IMPORT_COLUMNS) and single_line:
+            # Unquoted site_location JSON (as in example_registry.csv) is split at its commas and
+            # loses its quotes; take it verbatim from between the 4th and the 4th-to-last comma
+            location = lines[reader.line_num - 1].split(",", 4)[4].rsplit(",", 4)[0]
+            row = [*row[:4], location, *row[len(row) - 4:]]
+        if len(row) != len(IMPORT_COLUMNS):
+            yield _record(reader.line_num, {}, f"expected {len(IMPORT_COLUMNS)} columns, got {len(row)}")
+            continue
+        yield _record(reader.line_num, dict(zip(IMPORT_COLUMNS, row)))
+
+
+def parse_ndjson(data: str) -> Iterator[tuple]:
+    """Records from newline-delimited JSON objects keyed by IMPORT_COLUMNS"""
+    for line_no, line in enumerate(data.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            yield _record(line_no, {}, "invalid JSON")
+            continue
+        if not isinstance(obj, dict):
+            yield _record(line_no, {}, "expected a JSON object")
+            continue
+        yield _record(line_no, obj)
+
+
+async def import_registry(
+    conn: asyncpg.Connection,
+    records: Iterable[tuple],
+    tenant_id: Optional[uuid.UUID] = None,
+    max_errors: int = 1000,
+    on_step: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> dict:
+    """
+    Import parsed records (parse_csv / parse_ndjson) in the caller's transaction.
+
+    With tenant_id every row must belong to that customer (checked in SQL) and no
+    customers are created. Returns the counts and up to max_errors row errors
+    ({"line": n, "error": "..."}). on_step is awaited with each name of
+    IMPORT_STEPS once that step is done (job progress).
+    """
+    async def step(name: str) -> None:
+        if on_step is not None:
+            await on_step(name)
+
+    await conn.execute(_CREATE_TABLE)
+    await conn.copy_records_to_table(
+        "registry_import",
+        records=records,
+        columns=["line_no", *IMPORT_COLUMNS, "error"],
+    )
+    await conn.execute("ANALYZE registry_import")
+    await step("loaded")
+
+    customers_created = 0
+    if tenant_id is not None:
+        for sql in _TENANT_CHECKS:
+            await conn.execute(sql, tenant_id)
+    else:
+        customers_created = await conn.fetchval(_CREATE_CUSTOMERS)
+        await conn.execute(_RESOLVE_CUSTOMERS)
+    await step("customers")
+
+    projects_created = await conn.fetchval(_CREATE_PROJECTS)
+    await conn.execute(_RESOLVE_PROJECTS)
+    await step("projects")
+    sites_created = await conn.fetchval(_CREATE_SITES)
+    await conn.execute(_RESOLVE_SITES)
+    await step("sites")
+
+    for sql in _RESOLVE_DEVICES:
+        await conn.execute(sql)
+    devices_created = await conn.fetchval(_CREATE_DEVICES)
+    # Rows whose device was just created by this import (or skipped as a conflict)
+    for sql in _RESOLVE_DEVICES:
+        await conn.execute(sql)
+    await conn.execute(_UNRESOLVED_DEVICES)
+    await step("devices")
+
+    report = await conn.fetchrow(_REPORT)
+    errors = await conn.fetch(_ERRORS, max_errors)
+    return {
+        "rows": report["rows"],
+        "rows_imported": report["rows"] - report["rows_failed"],
+        "rows_failed": report["rows_failed"],
+        "customers_created": customers_created,
+        "projects_created": projects_created,
+        "sites_created": sites_created,
+        "devices_created": devices_created,
+        "errors": [{"line": r["line_no"], "error": r["error"]} for r in errors],
+    }
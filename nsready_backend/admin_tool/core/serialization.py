@@ -0,0 +1,17 @@
+from typing import Any
+
+import orjson
+
+# Matches pydantic's JSON for registry rows: UTC datetimes end in "Z", microseconds only when set
+JSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dumps_rows(rows: Any) -> bytes:
+    """
+    JSON bytes for rows taken straight from result mappings.
+
+    Only for queries that select exactly the fields of the route's
+    response_model, with values pydantic would pass through unchanged (text
+    ids, timestamptz, JSONB dicts): nothing is validated on this path.
+    """
+    return orjson.dumps(rows, option=JSON_OPTIONS)
@@ -0,0 +1,130 @@
+import os
+import base64
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import get_session
+from core.change_feed import SequenceHorizon, get_sequence_horizon
+from api.deps import bearer_auth, get_tenant_customer_id, resolve_scope_devices, list_tenant_devices
+from api.models import ChangePage
+
+router = APIRouter(prefix="/v1/telemetry", tags=["telemetry"], dependencies=[Depends(bearer_auth)])
+
+# Compact rows older than this at write time go to ingest_events_late (same setting as the worker)
+LATE_HORIZON = timedelta(hours=float(os.getenv("LATE_ARRIVAL_HORIZON_HOURS", "168")))
+
+# Late rows stay in ingest_events_late at least this long (same setting as the late merger);
+# a cursor older than this may have missed rows that were since merged into compressed chunks
+MAX_CURSOR_AGE = timedelta(hours=float(os.getenv("LATE_MERGE_MIN_AGE_HOURS", "6")))
+
+# Uncompressed rows of the compact table, plus the late side table, each read in ingest_seq order
+_CHANGES_BRANCH = """
+    (SELECT ingest_seq, time, device_id, parameter_id, value, quality, source
+     FROM {table}
+     WHERE ingest_seq > :after AND ingest_seq <= :horizon {conditions}
+     ORDER BY ingest_seq
+     LIMIT :limit)
+"""
+
+
+def encode_change_cursor(seq: int, issued_at: float) -> str:
+    raw = json.dumps({"seq": seq, "issued_at": issued_at})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_change_cursor(cursor: str) -> tuple[int, float]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(data["seq"]), float(data["issued_at"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+@router.get("/changes", response_model=ChangePage)
+async def get_changes(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; omit to start"),
+    limit: int = Query(1000, ge=1, le=10000, description="Maximum rows per page"),
+    device_id: Optional[list[str]] = Query(None, description="Device scope; repeatable"),
+    site_id: Optional[list[str]] = Query(None, description="Site scope (all its devices); repeatable"),
+    project_id: Optional[list[str]] = Query(None, description="Project scope (all its devices); repeatable"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    # Primary: a replica's view of ingest_events_seq runs ahead of its replayed rows
+    session: AsyncSession = Depends(get_session),
+    horizon_source: SequenceHorizon = Depends(get_sequence_horizon),
+):
+    """
+    Telemetry rows inserted or updated since the cursor, in ingest_seq order.
+
+    Each insert and each value update takes the next ingest_seq (migration 210),
+    so a consumer that keeps passing next_cursor sees every change exactly
+    once, as the row's latest version. Without a cursor the feed starts with
+    the rows written within the late-arrival horizon; load older history with
+    /v1/telemetry/export. Cursors expire after LATE_MERGE_MIN_AGE_HOURS (410).
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): all devices unless a scope is given.
+    - Customer (with X-Customer-ID): only that customer's devices; other scopes return 404.
+    """
+    now = time.time()
+    if cursor:
+        after, issued_at = decode_change_cursor(cursor)
+        if now - issued_at > MAX_CURSOR_AGE.total_seconds():
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Cursor expired; resynchronize with /v1/telemetry/export and restart the feed",
+            )
+    else:
+        after, issued_at = 0, now
+
+    if device_id or site_id or project_id:
+        devices = await resolve_scope_devices(device_id or [], site_id or [], project_id or [], tenant_id, session)
+    elif tenant_id is not None:
+        devices = await list_tenant_devices(tenant_id, session)
+    else:
+        devices = None
+
+    # Every row up to the horizon is committed; rows above it were written after sampled_at
+    horizon, sampled_at = await horizon_source.get(session)
+    if devices == [] or horizon <= after:
+        return {
+            "rows": [],
+            "next_cursor": encode_change_cursor(max(after, horizon), max(issued_at, sampled_at)),
+            "has_more": False,
+        }
+
+    # Any row with ingest_seq > after was written after the cursor was issued, so unless it
+    # went to the late table its time is within LATE_HORIZON of that moment (uncompressed chunks)
+    window_start = datetime.fromtimestamp(issued_at, tz=timezone.utc) - LATE_HORIZON - timedelta(minutes=5)
+    params = {"after": after, "horizon": horizon, "limit": limit, "window_start": window_start}
+    device_condition = ""
+    if devices is not None:
+        device_condition = "AND device_id = ANY(CAST(:device_ids AS uuid[]))"
+        params["device_ids"] = devices
+
+    branches = [
+        _CHANGES_BRANCH.format(table="ingest_events_compact", conditions=f"AND time >= :window_start {device_condition}"),
+        _CHANGES_BRANCH.format(table="ingest_events_late", conditions=device_condition),
+    ]
+    result = await session.execute(
+        text(f"""
+            SELECT e.ingest_seq AS seq, e.time, e.device_id::text AS device_id, pt.key AS parameter_key,
+                   e.value, e.quality, e.source
+            FROM ({" UNION ALL ".join(branches)}) e
+            JOIN parameter_templates pt ON pt.param_id = e.parameter_id
+            ORDER BY e.ingest_seq
+            LIMIT :limit
+        """),
+        params,
+    )
+    rows = [dict(row) for row in result.mappings().all()]
+
+    if len(rows) == limit:
+        # More may follow below the horizon; keep the original issue time for the window
+        return {"rows": rows, "next_cursor": encode_change_cursor(rows[-1]["seq"], issued_at), "has_more": True}
+    return {"rows": rows, "next_cursor": encode_change_cursor(horizon, sampled_at), "has_more": False}
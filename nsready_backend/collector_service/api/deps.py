@@ -0,0 +1,177 @@
+import os
+from fastapi import Header, HTTPException, status
+from typing import Optional
+import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+
+
+# Same bearer token and X-Customer-ID tenant header as the admin tool (admin_tool/api/deps.py)
+def get_bearer_token_from_env() -> str:
+    return os.getenv("ADMIN_BEARER_TOKEN", "devtoken")
+
+
+async def bearer_auth(authorization: str | None = Header(default=None)) -> None:
+    expected = f"Bearer {get_bearer_token_from_env()}"
+    if authorization != expected:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+
+async def get_tenant_customer_id(
+    x_customer_id: Optional[str] = Header(None, alias="X-Customer-ID")
+) -> Optional[uuid.UUID]:
+    """
+    Extract and validate X-Customer-ID header.
+
+    Returns:
+        - uuid.UUID if header is provided and valid
+        - None if header is not provided (engineer/admin mode)
+
+    Raises:
+        - HTTPException 400 if header is invalid UUID format
+    """
+    if x_customer_id is None:
+        return None
+
+    try:
+        return uuid.UUID(x_customer_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid UUID format for X-Customer-ID: {x_customer_id}",
+        )
+
+
+def validate_uuid(uuid_str: str, field_name: str = "ID") -> uuid.UUID:
+    """
+    Validate UUID format and return UUID object.
+
+    Raises:
+        - HTTPException 400 if UUID format is invalid
+    """
+    try:
+        return uuid.UUID(uuid_str)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid UUID format for {field_name}: {uuid_str}",
+        )
+
+
+async def verify_devices_belong_to_tenant(
+    device_ids: list[str],
+    tenant_id: Optional[uuid.UUID],
+    session: AsyncSession,
+) -> None:
+    """
+    Verify that every device exists and, in customer mode, belongs to the tenant
+    (devices → sites → projects → customer_id), in one query.
+
+    Raises:
+        - HTTPException 400 if a device ID is not a valid UUID
+        - HTTPException 404 if a device does not exist or belongs to a different tenant
+          (404 rather than 403 to avoid tenant enumeration, as in the admin tool)
+    """
+    for device_id in device_ids:
+        validate_uuid(device_id, field_name="device_id")
+
+    result = await session.execute(
+        text("""
+            SELECT d.id::text AS id, p.customer_id::text AS customer_id
+            FROM devices d
+            JOIN sites s ON s.id = d.site_id
+            JOIN projects p ON p.id = s.project_id
+            WHERE d.id = ANY(CAST(:ids AS uuid[]))
+        """),
+        {"ids": device_ids},
+    )
+    owners = {row["id"]: row["customer_id"] for row in result.mappings().all()}
+
+    for device_id in device_ids:
+        owner = owners.get(str(uuid.UUID(device_id)))
+        if owner is None or (tenant_id is not None and owner != str(tenant_id)):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Device not found")
+
+
+async def resolve_scope_devices(
+    device_ids: list[str],
+    site_ids: list[str],
+    project_ids: list[str],
+    tenant_id: Optional[uuid.UUID],
+    session: AsyncSession,
+) -> list[str]:
+    """
+    Expand a device/site/project scope into the sorted list of device IDs it covers.
+
+    Explicit devices are checked with verify_devices_belong_to_tenant(); sites and
+    projects must exist and, in customer mode, belong to the tenant (else 404).
+    """
+    devices = set()
+    if device_ids:
+        await verify_devices_belong_to_tenant(device_ids, tenant_id, session)
+        devices.update(str(uuid.UUID(d)) for d in device_ids)
+
+    for field, ids, sql in (
+        ("site_id", site_ids, """
+            SELECT s.id::text AS id, p.customer_id::text AS customer_id
+            FROM sites s JOIN projects p ON p.id = s.project_id
+            WHERE s.id = ANY(CAST(:ids AS uuid[]))
+        """),
+        ("project_id", project_ids, """
+            SELECT p.id::text AS id, p.customer_id::text AS customer_id
+            FROM projects p
+            WHERE p.id = ANY(CAST(:ids AS uuid[]))
+        """),
+    ):
+        if not ids:
+            continue
+        ids = [str(validate_uuid(i, field_name=field)) for i in ids]
+        result = await session.execute(text(sql), {"ids": ids})
+        owners = {row["id"]: row["customer_id"] for row in result.mappings().all()}
+        for i in ids:
+            owner = owners.get(i)
+            if owner is None or (tenant_id is not None and owner != str(tenant_id)):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resource not found")
+
+    if site_ids or project_ids:
+        result = await session.execute(
+            text("""
+                SELECT d.id::text
+                FROM devices d
+                JOIN sites s ON s.id = d.site_id
+                WHERE s.id = ANY(CAST(:site_ids AS uuid[]))
+                   OR s.project_id = ANY(CAST(:project_ids AS uuid[]))
+            """),
+            {
+                "site_ids": [str(uuid.UUID(i)) for i in site_ids],
+                "project_ids": [str(uuid.UUID(i)) for i in project_ids],
+            },
+        )
+        devices.update(row[0] for row in result)
+
+    return sorted(devices)
+
+
+async def list_tenant_devices(tenant_id: uuid.UUID, session: AsyncSession) -> list[str]:
+    """
+    All device IDs of a customer (devices → sites → projects → customer_id).
+
+    Raises:
+        - HTTPException 404 if the customer does not exist
+    """
+    result = await session.execute(text("SELECT 1 FROM customers WHERE id = :id"), {"id": str(tenant_id)})
+    if result.scalar() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Customer {tenant_id} not found")
+
+    result = await session.execute(
+        text("""
+            SELECT d.id::text
+            FROM devices d
+            JOIN sites s ON s.id = d.site_id
+            JOIN projects p ON p.id = s.project_id
+            WHERE p.customer_id = :customer_id
+            ORDER BY d.id
+        """),
+        {"customer_id": str(tenant_id)},
+    )
+    return [row[0] for row in result]
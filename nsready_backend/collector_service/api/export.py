@@ -0,0 +1,305 @@
+import os
+import asyncio
+import logging
+import uuid
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Literal, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import get_read_session, get_read_sessionmaker
+from core.archiver import ARCHIVE_SCHEMA
+from core.metrics import export_bytes_counter, error_counter
+from api.deps import bearer_auth, get_tenant_customer_id, resolve_scope_devices
+from api.telemetry import validate_time_range
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/v1/telemetry", tags=["telemetry"], dependencies=[Depends(bearer_auth)])
+
+# COPY output chunks buffered between the database and the client; bounds memory per export
+EXPORT_QUEUE_CHUNKS = 16
+
+# Columnar exports: width of the time slice fetched per task, and slices fetched concurrently
+EXPORT_SLICE_HOURS = float(os.getenv("EXPORT_SLICE_HOURS", "24"))
+EXPORT_PARALLELISM = int(os.getenv("EXPORT_PARALLELISM", "4"))
+EXPORT_BATCH_ROWS = 65536
+
+# Typed columns; device_id, parameter_key and source are dictionary-encoded (as in the Parquet archive)
+EXPORT_SCHEMA = pa.schema([
+    ARCHIVE_SCHEMA.field(name)
+    for name in ("time", "device_id", "parameter_key", "value", "quality", "source")
+])
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+FILE_EXTENSIONS = {"csv": "csv", "arrow": "arrows", "parquet": "parquet"}
+
+_HISTORY_COLUMNS = "v.time, v.device_id::text AS device_id, v.parameter_key, v.value, v.quality, v.source"
+
+# Same columns as shared/scripts/export_scada_data_readable.sh
+_NAMED_COLUMNS = """
+    c.name AS customer_name, p.name AS project_name, s.name AS site_name,
+    d.name AS device_name, d.external_id AS device_code,
+    pt.name AS parameter_name, v.parameter_key, pt.unit AS parameter_unit,
+    v.time AS timestamp, v.value, v.quality, v.source
+"""
+
+_NAMED_JOINS = """
+    JOIN devices d ON d.id = v.device_id
+    JOIN parameter_templates pt ON pt.key = v.parameter_key
+    JOIN sites s ON s.id = d.site_id
+    JOIN projects p ON p.id = s.project_id
+    JOIN customers c ON c.id = p.customer_id
+"""
+
+
+def build_export_query(names: bool, with_parameter_keys: bool) -> str:
+    """COPY source query over v_scada_history; $1 devices, $2 start, $3 end, $4 parameter keys"""
+    conditions = ["v.device_id = ANY($1::uuid[])", "v.time >= $2", "v.time < $3"]
+    if with_parameter_keys:
+        conditions.append("v.parameter_key = ANY($4::text[])")
+    return f"""
+        SELECT {_NAMED_COLUMNS if names else _HISTORY_COLUMNS}
+        FROM v_scada_history v
+        {_NAMED_JOINS if names else ""}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY v.time, v.device_id, v.parameter_key
+    """
+
+
+async def stream_copy_csv(query: str, args: list, gzip: bool) -> AsyncIterator[bytes]:
+    """
+    Stream COPY (query) TO STDOUT WITH CSV HEADER straight to the client.
+
+    asyncpg writes COPY data to a callback in chunks; a bounded queue hands them
+    to the response body, so the database pauses when the client reads slowly
+    and memory stays constant regardless of export size.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_QUEUE_CHUNKS)
+    done = object()
+
+    async def produce() -> None:
+        async with get_read_sessionmaker()() as session:
+            conn = await session.connection()
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_from_query(
+                query, *args, output=queue.put, format="csv", header=True
+            )
+
+    def wake_consumer(_task) -> None:
+        # If the queue is full the consumer drains it and then sees producer.done()
+        if not queue.full():
+            queue.put_nowait(done)
+
+    producer = asyncio.create_task(produce())
+    producer.add_done_callback(wake_consumer)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is done:
+                break
+            data = compressor.compress(chunk) if compressor else chunk
+            if data:
+                export_bytes_counter.labels(format="csv").inc(len(data))
+                yield data
+            if producer.done() and queue.empty():
+                break
+        # Surfaces COPY errors (the response is already started, so the stream is cut short)
+        await producer
+        if compressor:
+            tail = compressor.flush()
+            export_bytes_counter.labels(format="csv").inc(len(tail))
+            yield tail
+    except Exception as e:
+        logger.error(f"CSV export failed: {e}", exc_info=True)
+        error_counter.labels(error_type="export").inc()
+        raise
+    finally:
+        if not producer.done():
+            producer.cancel()
+
+
+class _ChunkSink:
+    """Write-only file object collecting writer output until the response takes it"""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def time_slices(start: datetime, end: datetime, width: timedelta) -> list[tuple[datetime, datetime]]:
+    slices = []
+    while start < end:
+        slices.append((start, min(start + width, end)))
+        start += width
+    return slices
+
+
+def records_to_table(records) -> pa.Table:
+    if not records:
+        return EXPORT_SCHEMA.empty_table()
+    time, device_id, parameter_key, value, quality, source = zip(*records)
+    return pa.table(
+        {
+            "time": pa.array(time, type=pa.timestamp("us", tz="UTC")),
+            "device_id": pa.array(device_id, type=pa.string()).dictionary_encode(),
+            "parameter_key": pa.array(parameter_key, type=pa.string()).dictionary_encode(),
+            "value": pa.array(value, type=pa.float64()),
+            "quality": pa.array(quality, type=pa.int16()),
+            "source": pa.array(source, type=pa.string()).dictionary_encode(),
+        },
+        schema=EXPORT_SCHEMA,
+    )
+
+
+async def fetch_slice(query: str, args: list, start: datetime, end: datetime) -> pa.Table:
+    """Fetch one time slice on its own connection and convert it to an Arrow table"""
+    async with get_read_sessionmaker()() as session:
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        records = await raw.driver_connection.fetch(query, args[0], start, end, *args[3:])
+    return records_to_table(records)
+
+
+async def stream_columnar(format: str, query: str, args: list) -> AsyncIterator[bytes]:
+    """
+    Stream an Arrow IPC stream or a Parquet file built from parallel time-slice fetches.
+
+    Up to EXPORT_PARALLELISM slices are fetched concurrently, each on its own
+    connection; they are written strictly in slice order, so the output is
+    ordered by time and at most EXPORT_PARALLELISM slices are held in memory.
+    """
+    slices = time_slices(args[1], args[2], timedelta(hours=EXPORT_SLICE_HOURS))
+    sink = _ChunkSink()
+    if format == "arrow":
+        writer = pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+    else:
+        writer = pq.ParquetWriter(
+            sink, EXPORT_SCHEMA, compression="zstd",
+            use_dictionary=["device_id", "parameter_key", "source"], write_statistics=True,
+        )
+
+    pending: deque[asyncio.Task] = deque()
+    remaining = iter(slices)
+
+    def schedule() -> None:
+        next_slice = next(remaining, None)
+        if next_slice is not None:
+            pending.append(asyncio.create_task(fetch_slice(query, args, *next_slice)))
+
+    for _ in range(EXPORT_PARALLELISM):
+        schedule()
+
+    try:
+        while pending:
+            table = await pending.popleft()
+            schedule()
+            if table.num_rows:
+                if format == "arrow":
+                    for batch in table.to_batches(max_chunksize=EXPORT_BATCH_ROWS):
+                        writer.write_batch(batch)
+                else:
+                    writer.write_table(table, row_group_size=EXPORT_BATCH_ROWS)
+            data = sink.take()
+            if data:
+                export_bytes_counter.labels(format=format).inc(len(data))
+                yield data
+        writer.close()
+        tail = sink.take()
+        export_bytes_counter.labels(format=format).inc(len(tail))
+        yield tail
+    except Exception as e:
+        logger.error(f"{format} export failed: {e}", exc_info=True)
+        error_counter.labels(error_type="export").inc()
+        raise
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+@router.get("/export")
+async def export_history(
+    start: datetime = Query(..., description="Inclusive range start (ISO 8601)"),
+    end: datetime = Query(..., description="Exclusive range end (ISO 8601)"),
+    format: Literal["csv", "arrow", "parquet"] = Query("csv", description="Export format"),
+    device_id: Optional[list[str]] = Query(None, description="Device scope; repeatable"),
+    site_id: Optional[list[str]] = Query(None, description="Site scope (all its devices); repeatable"),
+    project_id: Optional[list[str]] = Query(None, description="Project scope (all its devices); repeatable"),
+    parameter_key: Optional[list[str]] = Query(None, description="Parameter key; repeatable"),
+    names: bool = Query(False, description="Add customer, project, site, device and parameter names (csv only)"),
+    gzip: bool = Query(False, description="gzip-compress the file (csv only)"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Export telemetry history (v_scada_history) as a file download.
+
+    - csv: COPY ... TO STDOUT WITH CSV HEADER streamed through asyncpg, optionally
+      gzip-compressed; replaces shared/scripts/export_scada_data*.sh for HTTP clients.
+    - arrow / parquet: typed columns (timestamp, float64 value, int16 quality) with
+      dictionary-encoded device_id, parameter_key and source, written in record
+      batches from time slices fetched in parallel. Loads into pandas without parsing
+      (pyarrow.ipc.open_stream(...).read_pandas() / pandas.read_parquet).
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): any existing device, site or project.
+    - Customer (with X-Customer-ID): only that customer's resources; others return 404.
+    """
+    validate_time_range(start, end)
+    if format != "csv" and (names or gzip):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="names and gzip are only supported for format=csv",
+        )
+    if not (device_id or site_id or project_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one of device_id, site_id or project_id is required",
+        )
+    devices = await resolve_scope_devices(device_id or [], site_id or [], project_id or [], tenant_id, session)
+
+    args = [devices, start, end]
+    if parameter_key:
+        args.append(parameter_key)
+    query = build_export_query(names, bool(parameter_key))
+
+    filename = f"telemetry_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.{FILE_EXTENSIONS[format]}"
+    if format == "csv":
+        body = stream_copy_csv(query, args, gzip)
+        media_type = "application/gzip" if gzip else MEDIA_TYPES["csv"]
+        filename += ".gz" if gzip else ""
+    else:
+        body = stream_columnar(format, query, args)
+        media_type = MEDIA_TYPES[format]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -57,3 +57,46 @@ class HealthResponse(BaseModel):
     queue_depth: int
     db: str
 
+
+
+class AggregateBucket(BaseModel):
+    """One time bucket of the aggregate endpoint; grouping and aggregate fields not requested are omitted"""
+    bucket: datetime
+    device_id: Optional[str] = None
+    parameter_key: Optional[str] = None
+    site_id: Optional[str] = None
+    project_id: Optional[str] = None
+    avg: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: Optional[int] = None
+    last: Optional[float] = None
+
+
+class GroupRollupBucket(BaseModel):
+    """One bucket of a customer-group rollup; customer_id only when split by customer"""
+    bucket: datetime
+    parameter_name: str
+    customer_id: Optional[str] = None
+    avg: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+
+class ChangeRow(BaseModel):
+    """Telemetry row reported by the change feed"""
+    seq: int
+    time: datetime
+    device_id: str
+    parameter_key: str
+    value: Optional[float] = None
+    quality: int
+    source: Optional[str] = None
+
+
+class ChangePage(BaseModel):
+    """One page of the change feed"""
+    rows: List[ChangeRow]
+    next_cursor: str
+    has_more: bool
@@ -0,0 +1,114 @@
+import uuid
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import get_read_session
+from api.deps import bearer_auth, get_tenant_customer_id, validate_uuid
+from api.models import GroupRollupBucket
+from api.telemetry import AGGREGATE_BUCKETS, BUCKET_ORIGIN, as_utc, floor_bucket, ceil_bucket, validate_time_range
+
+router = APIRouter(prefix="/v1/telemetry", tags=["telemetry"], dependencies=[Depends(bearer_auth)])
+
+
+async def resolve_group_scope(
+    group_id: uuid.UUID,
+    tenant_id: Optional[uuid.UUID],
+    session: AsyncSession,
+) -> Optional[str]:
+    """
+    Check access to a customer group and return the customer the rows are limited to.
+
+    - Engineer/Admin (no X-Customer-ID): any group, all its customers (None).
+    - The group's own customer (the parent): all its customers (None).
+    - A child customer of the group: only its own rows.
+    - Any other customer: 404, same as a group that does not exist.
+    """
+    result = await session.execute(
+        text("SELECT id, parent_customer_id FROM customers WHERE id = :id"),
+        {"id": str(group_id)},
+    )
+    group = result.mappings().first()
+    # Only customers without a parent head a group (COALESCE(parent_customer_id, id))
+    if not group or group["parent_customer_id"] is not None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer group not found")
+    if tenant_id is None or tenant_id == group_id:
+        return None
+
+    result = await session.execute(
+        text("SELECT 1 FROM customers WHERE id = :tenant_id AND parent_customer_id = :group_id"),
+        {"tenant_id": str(tenant_id), "group_id": str(group_id)},
+    )
+    if result.first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer group not found")
+    return str(tenant_id)
+
+
+@router.get(
+    "/groups/{group_id}/rollups",
+    response_model=list[GroupRollupBucket],
+    response_model_exclude_none=True,
+)
+async def get_group_rollups(
+    group_id: str,
+    start: datetime = Query(..., description="Range start (ISO 8601); widened down to a bucket boundary"),
+    end: datetime = Query(..., description="Range end (ISO 8601); widened up to a bucket boundary"),
+    bucket: Literal["1h", "6h", "1d"] = Query("1h", description="Bucket width"),
+    parameter_name: Optional[list[str]] = Query(None, description="Parameter name (e.g. Voltage); repeatable"),
+    by_customer: bool = Query(False, description="One row per customer of the group instead of group totals"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Telemetry rollups for a customer group (a parent customer and its child companies).
+
+    Served from customer_group_rollups (migration 220), rebuilt from the device
+    rollups every ROLLUP_GROUP_REFRESH_SECONDS (migration 290), so a group-wide
+    report does not scan raw telemetry of every device in the group; the newest
+    samples appear after the next refresh. Parameters are matched by template
+    name since parameter keys are project-specific. avg is weighted by sample count.
+    """
+    group_uuid = validate_uuid(group_id, "group_id")
+    validate_time_range(start, end)
+    customer_filter = await resolve_group_scope(group_uuid, tenant_id, session)
+
+    width = AGGREGATE_BUCKETS[bucket]
+    conditions = [
+        "r.group_customer_id = :group_id",
+        "r.agg_interval = '1h'",
+        "r.time >= :start",
+        "r.time < :end",
+    ]
+    params = {
+        "group_id": str(group_uuid),
+        "start": floor_bucket(as_utc(start), width),
+        "end": ceil_bucket(as_utc(end), width),
+        "width": width,
+        "origin": BUCKET_ORIGIN,
+    }
+    if parameter_name:
+        conditions.append("r.parameter_name = ANY(CAST(:parameter_names AS text[]))")
+        params["parameter_names"] = parameter_name
+    if customer_filter:
+        conditions.append("r.customer_id = :customer_id")
+        params["customer_id"] = customer_filter
+
+    positions = "1, 2, 3" if by_customer else "1, 2"
+    result = await session.execute(
+        text(f"""
+            SELECT time_bucket(CAST(:width AS interval), r.time, CAST(:origin AS timestamptz)) AS bucket,
+                   r.parameter_name,
+                   {"r.customer_id::text AS customer_id," if by_customer else ""}
+                   sum(r.value_sum) / NULLIF(sum(r.value_count), 0) AS avg,
+                   min(r.value_min) AS min, max(r.value_max) AS max,
+                   sum(r.value_count)::bigint AS count
+            FROM customer_group_rollups r
+            WHERE {" AND ".join(conditions)}
+            GROUP BY {positions}
+            ORDER BY {positions}
+        """),
+        params,
+    )
+    return [dict(row) for row in result.mappings().all()]
@@ -0,0 +1,640 @@
+import base64
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from itertools import groupby
+from typing import AsyncIterator, Literal, Optional
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import get_session, get_read_session, get_read_sessionmaker
+from core.downsample import lttb
+from core.aggregate_cache import AggregateCache, get_aggregate_cache
+from core.hot_window import HotWindowStore, get_hot_window, epoch_to_datetime
+from api.deps import bearer_auth, get_tenant_customer_id, verify_devices_belong_to_tenant, resolve_scope_devices
+from api.models import AggregateBucket
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/v1/telemetry", tags=["telemetry"], dependencies=[Depends(bearer_auth)])
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched from the server-side cursor per round trip (and written per response chunk)
+STREAM_BATCH_SIZE = 1000
+
+
+def encode_cursor(row) -> str:
+    """Opaque keyset cursor for the last row of a page: (time, device_id, parameter_id)"""
+    raw = json.dumps([row["time"].isoformat(), row["device_id"], row["parameter_id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str, int]:
+    try:
+        time_str, device_id, parameter_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(time_str), str(uuid.UUID(device_id)), int(parameter_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def row_to_json(row) -> str:
+    return json.dumps({
+        "time": row["time"].isoformat(),
+        "device_id": row["device_id"],
+        "parameter_key": row["parameter_key"],
+        "value": row["value"],
+        "quality": row["quality"],
+        "source": row["source"],
+    })
+
+
+def validate_time_range(start: datetime, end: datetime) -> None:
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+
+
+async def stream_history_page(sql: str, params: dict, limit: int) -> AsyncIterator[str]:
+    """
+    Stream one page as NDJSON from a server-side cursor.
+
+    Runs in its own session: the request's session dependency is already closed
+    by the time a StreamingResponse body is iterated. When the page is full a
+    final {"next_cursor": ...} line is written; no trailer means the range is exhausted.
+    """
+    count = 0
+    last = None
+    async with get_read_sessionmaker()() as session:
+        result = await session.stream(text(sql), params)
+        async for rows in result.mappings().partitions(STREAM_BATCH_SIZE):
+            yield "".join(row_to_json(row) + "\n" for row in rows)
+            count += len(rows)
+            last = rows[-1]
+
+    if count == limit and last is not None:
+        yield json.dumps({"next_cursor": encode_cursor(last)}) + "\n"
+
+
+def point_to_json(device_id: str, parameter_key: str, time: datetime, value: float) -> str:
+    return json.dumps({
+        "time": time.isoformat(),
+        "device_id": device_id,
+        "parameter_key": parameter_key,
+        "value": value,
+    })
+
+
+async def stream_minmax(sql: str, params: dict) -> AsyncIterator[str]:
+    """Stream the min and max point of every bucket, in time order within each series"""
+    async with get_read_sessionmaker()() as session:
+        result = await session.stream(text(sql), params)
+        async for rows in result.mappings().partitions(STREAM_BATCH_SIZE):
+            lines = []
+            for row in rows:
+                points = sorted({
+                    (row["min_time"], row["min_value"]),
+                    (row["max_time"], row["max_value"]),
+                })
+                for time, value in points:
+                    lines.append(point_to_json(row["device_id"], row["parameter_key"], time, value) + "\n")
+            yield "".join(lines)
+
+
+async def stream_lttb(sql: str, params: dict, max_points: int) -> AsyncIterator[str]:
+    """
+    Stream LTTB-downsampled series.
+
+    Raw points arrive ordered by series then time and are collected per series as
+    NumPy array chunks, so only one series is held in memory at a time.
+    """
+    def emit(series, chunks) -> str:
+        if not chunks:
+            return ""
+        data = np.concatenate(chunks)
+        x, y = lttb(data[:, 0], data[:, 1], max_points)
+        device_id, parameter_key = series
+        return "".join(
+            point_to_json(device_id, parameter_key, datetime.fromtimestamp(t, tz=timezone.utc), float(v)) + "\n"
+            for t, v in zip(x.tolist(), y.tolist())
+        )
+
+    current = None
+    chunks: list[np.ndarray] = []
+    async with get_read_sessionmaker()() as session:
+        result = await session.stream(text(sql), params)
+        async for rows in result.partitions(STREAM_BATCH_SIZE):
+            for series, group in groupby(rows, key=lambda r: (r[0], r[1])):
+                if series != current:
+                    output = emit(current, chunks)
+                    if output:
+                        yield output
+                    current, chunks = series, []
+                chunks.append(np.array([(r[2], r[3]) for r in group], dtype=np.float64))
+
+    output = emit(current, chunks)
+    if output:
+        yield output
+
+
+@router.get("/history")
+async def get_history(
+    device_id: list[str] = Query(..., description="Device ID; repeat for several devices"),
+    start: datetime = Query(..., description="Inclusive range start (ISO 8601)"),
+    end: datetime = Query(..., description="Exclusive range end (ISO 8601)"),
+    parameter_key: Optional[list[str]] = Query(None, description="Parameter key; repeat for several"),
+    limit: int = Query(10000, ge=1, le=100000, description="Rows per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Downsample each series to at most this many points"),
+    downsample: Literal["minmax", "lttb"] = Query("minmax", description="Downsampling method when max_points is set"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Raw telemetry for one or more devices over a time range, as NDJSON.
+
+    Rows are ordered by (time, device_id, parameter_id) and paged with a keyset
+    cursor on those columns. Pages are read from ingest_events_compact and
+    ingest_events_late directly rather than through the ingest_events view, so
+    the cursor comparison reaches the tables' primary key indexes; parameter
+    keys are looked up for the rows of the page only. A late row replaces the
+    stored row with the same key, as in the view.
+
+    With max_points, each series is downsampled for charting instead and the
+    response is not paged (limit and cursor do not apply):
+    - minmax: min and max point per time_bucket, computed in SQL (2 points per bucket)
+    - lttb: Largest-Triangle-Three-Buckets over the raw points, computed in NumPy
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): any existing device.
+    - Customer (with X-Customer-ID): only devices of that customer (via sites → projects);
+      other devices return 404.
+    """
+    validate_time_range(start, end)
+    await verify_devices_belong_to_tenant(device_id, tenant_id, session)
+
+    conditions = [
+        "device_id = ANY(CAST(:device_ids AS uuid[]))",
+        "time >= :start",
+        "time < :end",
+    ]
+    params = {"device_ids": device_id, "start": start, "end": end, "limit": limit}
+
+    if parameter_key:
+        params["parameter_keys"] = parameter_key
+
+    if max_points is not None:
+        if cursor:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor cannot be combined with max_points")
+        if parameter_key:
+            conditions.append("parameter_key = ANY(CAST(:parameter_keys AS text[]))")
+        return downsampled_response(conditions, params, start, end, max_points, downsample)
+
+    if parameter_key:
+        conditions.append(
+            "parameter_id = ANY(ARRAY(SELECT param_id FROM parameter_templates"
+            " WHERE key = ANY(CAST(:parameter_keys AS text[]))))"
+        )
+    if cursor:
+        params["cursor_time"], params["cursor_device"], params["cursor_param"] = decode_cursor(cursor)
+        conditions.append(
+            "(time, device_id, parameter_id) > (:cursor_time, CAST(:cursor_device AS uuid), :cursor_param)"
+        )
+        # Plain bound on time for chunk exclusion
+        conditions.append("time >= :cursor_time")
+    where = " AND ".join(conditions)
+
+    sql = f"""
+        WITH page AS (
+            (
+                SELECT time, device_id, parameter_id, value, quality, source
+                FROM ingest_events_compact c
+                WHERE {where}
+                  AND NOT EXISTS (
+                      SELECT 1 FROM ingest_events_late l
+                      WHERE l.time = c.time AND l.device_id = c.device_id AND l.parameter_id = c.parameter_id
+                  )
+                ORDER BY time, device_id, parameter_id
+                LIMIT :limit
+            )
+            UNION ALL
+            (
+                SELECT time, device_id, parameter_id, value, quality, source
+                FROM ingest_events_late
+                WHERE {where}
+                ORDER BY time, device_id, parameter_id
+                LIMIT :limit
+            )
+            ORDER BY time, device_id, parameter_id
+            LIMIT :limit
+        )
+        SELECT p.time, p.device_id::text AS device_id, p.parameter_id, pt.key AS parameter_key,
+               p.value, p.quality, p.source
+        FROM page p
+        JOIN parameter_templates pt ON pt.param_id = p.parameter_id
+        ORDER BY p.time, p.device_id, p.parameter_id
+    """
+    return StreamingResponse(stream_history_page(sql, params, limit), media_type=NDJSON_MEDIA_TYPE)
+
+
+def downsampled_response(
+    conditions: list[str],
+    params: dict,
+    start: datetime,
+    end: datetime,
+    max_points: int,
+    method: str,
+) -> StreamingResponse:
+    conditions = conditions + ["value IS NOT NULL"]
+    where = " AND ".join(conditions)
+    params = {k: v for k, v in params.items() if k != "limit"}
+
+    if method == "minmax":
+        # Two points per bucket, so max_points // 2 buckets over the requested range
+        params["bucket_seconds"] = max((end - start).total_seconds() / (max_points // 2), 1.0)
+        sql = f"""
+            SELECT device_id::text AS device_id, parameter_key,
+                   time_bucket(make_interval(secs => :bucket_seconds), time, CAST(:start AS timestamptz)) AS bucket,
+                   first(time, value) AS min_time, min(value) AS min_value,
+                   last(time, value) AS max_time, max(value) AS max_value
+            FROM ingest_events
+            WHERE {where}
+            GROUP BY 1, 2, 3
+            ORDER BY 1, 2, 3
+        """
+        return StreamingResponse(stream_minmax(sql, params), media_type=NDJSON_MEDIA_TYPE)
+
+    sql = f"""
+        SELECT device_id::text AS device_id, parameter_key, extract(epoch FROM time)::float8 AS epoch, value
+        FROM ingest_events
+        WHERE {where}
+        ORDER BY device_id, parameter_key, time
+    """
+    return StreamingResponse(stream_lttb(sql, params, max_points), media_type=NDJSON_MEDIA_TYPE)
+
+
+AGGREGATE_BUCKETS = {
+    "1m": timedelta(minutes=1),
+    "5m": timedelta(minutes=5),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "1d": timedelta(days=1),
+}
+
+AGGREGATE_FUNCTIONS = ("avg", "min", "max", "count", "last")
+
+# group_by value -> (select expression, output column, joins needed)
+AGGREGATE_GROUPS = {
+    "device": ("e.device_id::text AS device_id", "device_id", ""),
+    "parameter": ("e.parameter_key", "parameter_key", ""),
+    "site": ("d.site_id::text AS site_id", "site_id", "JOIN devices d ON d.id = e.device_id"),
+    "project": (
+        "s.project_id::text AS project_id",
+        "project_id",
+        "JOIN devices d ON d.id = e.device_id JOIN sites s ON s.id = d.site_id",
+    ),
+}
+
+# time_bucket's default origin for sub-month widths; buckets are aligned to it explicitly
+BUCKET_ORIGIN = datetime(2000, 1, 3, tzinfo=timezone.utc)
+
+
+def as_utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def floor_bucket(ts: datetime, width: timedelta) -> datetime:
+    return BUCKET_ORIGIN + ((ts - BUCKET_ORIGIN) // width) * width
+
+
+def ceil_bucket(ts: datetime, width: timedelta) -> datetime:
+    floor = floor_bucket(ts, width)
+    return floor if floor == ts else floor + width
+
+
+async def load_aggregates(
+    session: AsyncSession,
+    group_by: list[str],
+    device_ids: list[str],
+    parameter_keys: Optional[list[str]],
+    width: timedelta,
+    start: datetime,
+    end: datetime,
+) -> list[dict]:
+    selects = [AGGREGATE_GROUPS[g][0] for g in group_by]
+    # "project" already includes the devices join needed by "site"
+    joins = AGGREGATE_GROUPS["project"][2] if "project" in group_by else (
+        AGGREGATE_GROUPS["site"][2] if "site" in group_by else ""
+    )
+    conditions = [
+        "e.device_id = ANY(CAST(:device_ids AS uuid[]))",
+        "e.time >= :start",
+        "e.time < :end",
+    ]
+    params = {"device_ids": device_ids, "start": start, "end": end, "width": width, "origin": BUCKET_ORIGIN}
+    if parameter_keys:
+        conditions.append("e.parameter_key = ANY(CAST(:parameter_keys AS text[]))")
+        params["parameter_keys"] = parameter_keys
+
+    positions = ", ".join(str(i) for i in range(1, len(group_by) + 2))
+    result = await session.execute(
+        text(f"""
+            SELECT time_bucket(CAST(:width AS interval), e.time, CAST(:origin AS timestamptz)) AS bucket,
+                   {"".join(sel + ", " for sel in selects)}
+                   avg(e.value) AS avg, min(e.value) AS min, max(e.value) AS max,
+                   count(e.value) AS count, last(e.value, e.time) AS last
+            FROM ingest_events e
+            {joins}
+            WHERE {" AND ".join(conditions)}
+            GROUP BY {positions}
+            ORDER BY {positions}
+        """),
+        params,
+    )
+    return [dict(row) for row in result.mappings().all()]
+
+
+@router.get("/aggregate", response_model=list[AggregateBucket], response_model_exclude_none=True)
+async def get_aggregate(
+    response: Response,
+    start: datetime = Query(..., description="Range start (ISO 8601); widened down to a bucket boundary"),
+    end: datetime = Query(..., description="Range end (ISO 8601); widened up to a bucket boundary"),
+    bucket: Literal["1m", "5m", "15m", "1h", "6h", "1d"] = Query("1h", description="Bucket width"),
+    agg: list[Literal["avg", "min", "max", "count", "last"]] = Query(["avg"], description="Aggregate; repeat for several"),
+    group_by: list[Literal["device", "parameter", "site", "project"]] = Query(
+        ["device", "parameter"], description="Grouping besides the bucket; repeat for several"
+    ),
+    device_id: Optional[list[str]] = Query(None, description="Device scope; repeatable"),
+    site_id: Optional[list[str]] = Query(None, description="Site scope (all its devices); repeatable"),
+    project_id: Optional[list[str]] = Query(None, description="Project scope (all its devices); repeatable"),
+    parameter_key: Optional[list[str]] = Query(None, description="Parameter key; repeatable"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    # Primary: a lagging replica read after a worker invalidation would be cached as current
+    session: AsyncSession = Depends(get_session),
+    cache: AggregateCache = Depends(get_aggregate_cache),
+):
+    """
+    avg/min/max/count/last of value per time_bucket, grouped by device, parameter, site or project.
+
+    Results are served from an in-memory cache keyed by the normalized query
+    (resolved devices, parameters, bucket, grouping, bucket-aligned range).
+    Closed buckets and the open bucket are cached as separate ranges: closed
+    ranges live long, the open range is dropped as soon as the worker commits
+    new rows for one of its devices. X-Cache reports hit, partial or miss.
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): any existing device, site or project.
+    - Customer (with X-Customer-ID): only that customer's resources; others return 404.
+    """
+    validate_time_range(start, end)
+    if not (device_id or site_id or project_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one of device_id, site_id or project_id is required",
+        )
+    devices = await resolve_scope_devices(device_id or [], site_id or [], project_id or [], tenant_id, session)
+    if not devices:
+        return []
+
+    width = AGGREGATE_BUCKETS[bucket]
+    start = floor_bucket(as_utc(start), width)
+    end = ceil_bucket(as_utc(end), width)
+    open_start = floor_bucket(datetime.now(timezone.utc), width)
+    groups = [g for g in AGGREGATE_GROUPS if g in group_by]
+    keys = sorted(set(parameter_key)) if parameter_key else None
+    base_key = (tuple(devices), tuple(keys or ()), bucket, tuple(groups))
+
+    ranges = []
+    if start < open_start:
+        ranges.append((start, min(end, open_start), False))
+    if end > open_start:
+        ranges.append((max(start, open_start), end, True))
+
+    rows, hits = [], []
+    for range_start, range_end, is_open in ranges:
+        loader = partial(load_aggregates, session, groups, devices, keys, width, range_start, range_end)
+        part, hit = await cache.get_or_load(base_key + (range_start, range_end), devices, range_start, range_end, is_open, loader)
+        rows.extend(part)
+        hits.append(hit)
+    response.headers["X-Cache"] = "hit" if all(hits) else ("partial" if any(hits) else "miss")
+
+    columns = ["bucket"] + [AGGREGATE_GROUPS[g][1] for g in groups] + [f for f in AGGREGATE_FUNCTIONS if f in agg]
+    return [{c: row[c] for c in columns} for row in rows]
+
+
+# Upper bound on devices per batch read (e.g. a site overview screen)
+LATEST_MAX_DEVICES = 2000
+
+# One row per series: explicit parameter keys, or the parameter templates of each device's project
+_LATEST_SERIES_SQL = """
+    SELECT d.id AS device_id, pt.param_id, pt.key AS parameter_key
+    FROM devices d
+    JOIN sites s ON s.id = d.site_id
+    JOIN parameter_templates pt ON {template_match}
+    WHERE d.id = ANY(CAST(:device_ids AS uuid[]))
+"""
+
+_PROJECT_TEMPLATES = (
+    "(pt.key LIKE 'project:' || s.project_id::text || ':%' "
+    "OR pt.metadata->>'project_id' = s.project_id::text)"
+)
+
+
+@router.get("/latest")
+async def get_latest(
+    device_id: Optional[list[str]] = Query(None, description="Device scope; repeatable"),
+    site_id: Optional[list[str]] = Query(None, description="Site scope (all its devices); repeatable"),
+    project_id: Optional[list[str]] = Query(None, description="Project scope (all its devices); repeatable"),
+    parameter_key: Optional[list[str]] = Query(None, description="Parameter key; repeatable (default: all of the project)"),
+    window_minutes: Optional[int] = Query(None, ge=1, le=1440, description="Also return each series' trailing window"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Latest value (and optionally a short trailing window) of every series of many devices.
+
+    One set-based query: the series are listed once, each resolved with a
+    LATERAL lookup on the (device_id, parameter_id, time DESC) index, and
+    PostgreSQL builds the columnar JSON document, so the response is
+    serialized in a single pass and passed through unchanged. Arrays are
+    parallel, one entry per series; time/value/quality are null for series
+    without data. window_time/window_value hold per-series arrays.
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): any existing device, site or project.
+    - Customer (with X-Customer-ID): only that customer's resources; others return 404.
+    """
+    if not (device_id or site_id or project_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one of device_id, site_id or project_id is required",
+        )
+    devices = await resolve_scope_devices(device_id or [], site_id or [], project_id or [], tenant_id, session)
+    if len(devices) > LATEST_MAX_DEVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Scope covers {len(devices)} devices; at most {LATEST_MAX_DEVICES} per request",
+        )
+
+    params = {"device_ids": devices}
+    if parameter_key:
+        series_sql = _LATEST_SERIES_SQL.format(template_match="pt.key = ANY(CAST(:parameter_keys AS text[]))")
+        params["parameter_keys"] = parameter_key
+    else:
+        series_sql = _LATEST_SERIES_SQL.format(template_match=_PROJECT_TEMPLATES)
+
+    window_join, window_fields = "", ""
+    if window_minutes:
+        params["window_start"] = datetime.now(timezone.utc) - timedelta(minutes=window_minutes)
+        window_join = """
+            LEFT JOIN LATERAL (
+                SELECT array_agg(w.time ORDER BY w.time) AS window_time,
+                       array_agg(w.value ORDER BY w.time) AS window_value
+                FROM (
+                    SELECT c.time, c.value FROM ingest_events_compact c
+                    WHERE c.device_id = se.device_id AND c.parameter_id = se.param_id
+                      AND c.time >= :window_start
+                      AND NOT EXISTS (
+                          SELECT 1 FROM ingest_events_late lt
+                          WHERE lt.time = c.time AND lt.device_id = c.device_id AND lt.parameter_id = c.parameter_id
+                      )
+                    UNION ALL
+                    -- Recent late rows not merged yet, as for the latest value
+                    SELECT lt.time, lt.value FROM ingest_events_late lt
+                    WHERE lt.device_id = se.device_id AND lt.parameter_id = se.param_id
+                      AND lt.time >= :window_start
+                ) w
+            ) win ON TRUE
+        """
+        window_fields = """,
+            'window_time', COALESCE(json_agg(r.window_time ORDER BY r.device_id, r.parameter_key), '[]'),
+            'window_value', COALESCE(json_agg(r.window_value ORDER BY r.device_id, r.parameter_key), '[]')
+        """
+
+    result = await session.execute(
+        text(f"""
+            WITH series AS ({series_sql}),
+            r AS (
+                SELECT se.device_id::text AS device_id, se.parameter_key,
+                       l.time, l.value, l.quality
+                       {", win.window_time, win.window_value" if window_minutes else ""}
+                FROM series se
+                LEFT JOIN LATERAL (
+                    SELECT x.time, x.value, x.quality
+                    FROM (
+                        (SELECT c.time, c.value, c.quality, FALSE AS late FROM ingest_events_compact c
+                         WHERE c.device_id = se.device_id AND c.parameter_id = se.param_id
+                         ORDER BY c.time DESC LIMIT 1)
+                        UNION ALL
+                        (SELECT lt.time, lt.value, lt.quality, TRUE AS late FROM ingest_events_late lt
+                         WHERE lt.device_id = se.device_id AND lt.parameter_id = se.param_id
+                         ORDER BY lt.time DESC LIMIT 1)
+                    ) x
+                    -- A late re-send of the same timestamp wins, as in the ingest_events view
+                    ORDER BY x.time DESC, x.late DESC
+                    LIMIT 1
+                ) l ON TRUE
+                {window_join}
+            )
+            SELECT json_build_object(
+                'device_id', COALESCE(json_agg(r.device_id ORDER BY r.device_id, r.parameter_key), '[]'),
+                'parameter_key', COALESCE(json_agg(r.parameter_key ORDER BY r.device_id, r.parameter_key), '[]'),
+                'time', COALESCE(json_agg(r.time ORDER BY r.device_id, r.parameter_key), '[]'),
+                'value', COALESCE(json_agg(r.value ORDER BY r.device_id, r.parameter_key), '[]'),
+                'quality', COALESCE(json_agg(r.quality ORDER BY r.device_id, r.parameter_key), '[]')
+                {window_fields}
+            )::text
+            FROM r
+        """),
+        params,
+    )
+    return Response(content=result.scalar_one(), media_type="application/json")
+
+
+RECENT_MAX_SERIES = 1000
+
+
+def series_to_json(device_id: str, parameter_key: str, times, values, qualities) -> dict:
+    return {
+        "device_id": device_id,
+        "parameter_key": parameter_key,
+        "time": [epoch_to_datetime(t).isoformat() for t in times],
+        # NaN stands for a NULL value in the store
+        "value": [None if v != v else v for v in values],
+        "quality": list(qualities),
+    }
+
+
+@router.get("/recent")
+async def get_recent(
+    response: Response,
+    device_id: list[str] = Query(..., description="Device ID; repeatable"),
+    parameter_key: list[str] = Query(..., description="Parameter key; repeatable"),
+    minutes: int = Query(60, ge=1, le=1440, description="Window length ending now"),
+    tenant_id: Optional[uuid.UUID] = Depends(get_tenant_customer_id),
+    session: AsyncSession = Depends(get_read_session),
+    hot_window: Optional[HotWindowStore] = Depends(get_hot_window),
+):
+    """
+    Samples of the last `minutes` for each device x parameter_key series.
+
+    Served from the in-memory hot window store filled by the ingest worker
+    when it covers the whole window (X-Hot-Window: hit); otherwise, e.g.
+    shortly after start-up or for windows longer than HOT_WINDOW_HOURS, from
+    ingest_events (X-Hot-Window: miss). One entry per series, each with
+    parallel time/value/quality arrays in time order.
+
+    Behaviour:
+    - Engineer/Admin (no X-Customer-ID): any existing device.
+    - Customer (with X-Customer-ID): only that customer's devices; others return 404.
+    """
+    if len(device_id) * len(parameter_key) > RECENT_MAX_SERIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {RECENT_MAX_SERIES} device/parameter series per request",
+        )
+    await verify_devices_belong_to_tenant(device_id, tenant_id, session)
+    devices = sorted({str(uuid.UUID(d)) for d in device_id})
+    keys = sorted(set(parameter_key))
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(minutes=minutes)
+
+    cached = None
+    if hot_window:
+        cached = hot_window.get([(d, k) for d in devices for k in keys], start, end)
+    if cached is not None:
+        response.headers["X-Hot-Window"] = "hit"
+        return [series_to_json(*series) for series in cached]
+
+    response.headers["X-Hot-Window"] = "miss"
+    result = await session.execute(
+        text("""
+            SELECT device_id::text AS device_id, parameter_key, time, value, quality
+            FROM ingest_events
+            WHERE device_id = ANY(CAST(:device_ids AS uuid[]))
+              AND parameter_key = ANY(CAST(:parameter_keys AS text[]))
+              AND time >= :start AND time < :end
+            ORDER BY device_id, parameter_key, time
+        """),
+        {"device_ids": devices, "parameter_keys": keys, "start": start, "end": end},
+    )
+    by_series = {
+        series: list(rows)
+        for series, rows in groupby(result.mappings().all(), key=lambda r: (r["device_id"], r["parameter_key"]))
+    }
+    return [
+        {
+            "device_id": d,
+            "parameter_key": k,
+            "time": [r["time"].isoformat() for r in by_series.get((d, k), [])],
+            "value": [r["value"] for r in by_series.get((d, k), [])],
+            "quality": [r["quality"] for r in by_series.get((d, k), [])],
+        }
+        for d in devices
+        for k in keys
+    ]
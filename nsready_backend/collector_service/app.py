@@ -1,12 +1,25 @@
+import os
 import contextlib
 import logging
 from fastapi import FastAPI
 from fastapi.responses import Response
-from core.db import create_engine, create_sessionmaker, healthcheck
+from core.db import create_engine, create_sessionmaker, set_sessionmaker, init_read_router, healthcheck
 from core.nats_client import init_nats_client, close_nats_client, get_nats_client
 from core.worker import IngestWorker
+from core.gap_detector import GapDetector
+from core.archiver import ChunkArchiver
+from core.late_merger import LateArrivalMerger
+from core.rollup_refresher import GroupRollupRefresher
+from core.aggregate_cache import init_aggregate_cache
+from core.hot_window import HotWindowStore, init_hot_window
+from core.parameter_cache import ParameterCacheListener
+from core.registry_events import RegistryEventSubscriber
 from core.metrics import get_metrics_response, queue_depth_gauge
 from api.ingest import router as ingest_router
+from api.telemetry import router as telemetry_router
+from api.export import router as export_router
+from api.changes import router as changes_router
+from api.rollups import router as rollups_router
 from api.models import HealthResponse
 
 # Configure logging
@@ -19,15 +32,23 @@ logger = logging.getLogger(__name__)
 # Initialize database
 engine = create_engine()
 SessionLocal = create_sessionmaker(engine)
+set_sessionmaker(SessionLocal)
 
 # Global worker instance
 worker: IngestWorker | None = None
+gap_detector: GapDetector | None = None
+archiver: ChunkArchiver | None = None
+late_merger: LateArrivalMerger | None = None
+rollup_refresher: GroupRollupRefresher | None = None
+hot_window: HotWindowStore | None = None
+param_cache_listener: ParameterCacheListener | None = None
+registry_events: RegistryEventSubscriber | None = None
 
 
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global worker
+    global worker, gap_detector, archiver, late_merger, rollup_refresher, hot_window, param_cache_listener, registry_events
     
     # Startup
     logger.info("Starting collector service...")
@@ -40,6 +61,10 @@ async def lifespan(app: FastAPI):
         logger.error(f"Database healthcheck failed: {e}")
         raise
     
+    # Telemetry read endpoints use replicas within the lag limit (DATABASE_REPLICA_URLS)
+    read_router = init_read_router()
+    await read_router.start()
+    
     # Connect to NATS
     try:
         nats_client = await init_nats_client()
@@ -48,24 +73,98 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to connect to NATS: {e}")
         raise
     
+    # Start gap detection (populates missing_intervals)
+    if os.getenv("GAP_DETECTION_ENABLED", "true").lower() == "true":
+        gap_detector = GapDetector(SessionLocal)
+        await gap_detector.start()
+    
+    # Start Parquet archiving of chunks ahead of the retention policy
+    if os.getenv("ARCHIVE_ENABLED", "false").lower() == "true":
+        archiver = ChunkArchiver(SessionLocal)
+        await archiver.start()
+    
+    # Start merging of late rows into their chunks
+    if os.getenv("LATE_MERGE_ENABLED", "true").lower() == "true":
+        late_merger = LateArrivalMerger(SessionLocal)
+        await late_merger.start()
+    
+    # Rebuild recent customer-group rollups from the device rollups (migration 290)
+    if os.getenv("ROLLUPS_ENABLED", "true").lower() == "true":
+        rollup_refresher = GroupRollupRefresher(SessionLocal)
+        await rollup_refresher.start()
+    
+    # Aggregate result cache shared by the telemetry API and the worker (invalidation)
+    aggregate_cache = init_aggregate_cache()
+    
+    # In-memory recent window per series, filled by the worker and read by the telemetry API
+    if os.getenv("HOT_WINDOW_ENABLED", "true").lower() == "true":
+        hot_window = init_hot_window()
+        await hot_window.start()
+    
     # Start worker
     try:
-        worker = IngestWorker(nats_client.nc, SessionLocal, subject=nats_client.subject)
+        worker = IngestWorker(
+            nats_client.nc,
+            SessionLocal,
+            subject=nats_client.subject,
+            gap_detector=gap_detector,
+            aggregate_cache=aggregate_cache,
+            hot_window=hot_window,
+        )
         await worker.start()
         logger.info("Ingest worker started")
     except Exception as e:
         logger.error(f"Failed to start worker: {e}")
         raise
     
+    # Reload the worker's parameter key cache when templates change (migration 250)
+    if os.getenv("PARAM_CACHE_LISTEN_ENABLED", "true").lower() == "true":
+        param_cache_listener = ParameterCacheListener(engine, worker.param_cache)
+        await param_cache_listener.start()
+    
+    # Apply the admin tool's registry.changes.<entity> events to in-memory state (migration 260)
+    if os.getenv("REGISTRY_EVENTS_ENABLED", "true").lower() == "true":
+        registry_events = RegistryEventSubscriber(
+            nats_client.nc,
+            SessionLocal,
+            worker.param_cache,
+            gap_detector=gap_detector,
+            aggregate_cache=aggregate_cache,
+            hot_window=hot_window,
+        )
+        await registry_events.start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down collector service...")
     
+    if registry_events:
+        await registry_events.stop()
+    
+    if param_cache_listener:
+        await param_cache_listener.stop()
+    
     if worker:
         await worker.stop()
     
+    if gap_detector:
+        await gap_detector.stop()
+    
+    if archiver:
+        await archiver.stop()
+    
+    if late_merger:
+        await late_merger.stop()
+    
+    if rollup_refresher:
+        await rollup_refresher.stop()
+    
+    if hot_window:
+        await hot_window.stop()
+    
     await close_nats_client()
+    await read_router.stop()
     await engine.dispose()
     
     logger.info("Collector service stopped")
@@ -80,6 +179,10 @@ app = FastAPI(
 
 # Include routers
 app.include_router(ingest_router)
+app.include_router(telemetry_router)
+app.include_router(export_router)
+app.include_router(changes_router)
+app.include_router(rollups_router)
 
 
 @app.get("/v1/health", response_model=HealthResponse)
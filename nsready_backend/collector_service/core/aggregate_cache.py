@@ -0,0 +1,191 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Hashable, Optional
+from core.metrics import aggregate_cache_counter, aggregate_cache_rows_gauge
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("rows", "device_ids", "start", "end", "expires_at")
+
+    def __init__(self, rows: list, device_ids: frozenset, start: datetime, end: datetime, expires_at: float):
+        self.rows = rows
+        self.device_ids = device_ids
+        self.start = start
+        self.end = end
+        self.expires_at = expires_at
+
+
+class AggregateCache:
+    """
+    In-memory LRU cache of bucketed aggregate results.
+
+    Entries are keyed by a normalized query and cover a [start, end) time
+    range for a set of devices. Ranges of closed buckets are kept for
+    AGG_CACHE_CLOSED_TTL_SECONDS; ranges that include the open bucket for
+    AGG_CACHE_OPEN_TTL_SECONDS. When the worker commits rows for a device,
+    every entry of that device whose range contains the row time is dropped,
+    which covers the open bucket on live data and closed buckets on backfill.
+
+    Size is capped by the total number of cached rows (AGG_CACHE_MAX_ROWS);
+    least recently used entries are evicted first. Concurrent misses for the
+    same key share one database query.
+    """
+
+    def __init__(self):
+        self.max_rows = int(os.getenv("AGG_CACHE_MAX_ROWS", "200000"))
+        self.closed_ttl = float(os.getenv("AGG_CACHE_CLOSED_TTL_SECONDS", "21600"))
+        self.open_ttl = float(os.getenv("AGG_CACHE_OPEN_TTL_SECONDS", "60"))
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._by_device: dict[str, set] = {}
+        self._rows = 0
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        # Per device with a load in flight: number of such loads, and a counter bumped on every
+        # invalidation; a load that overlapped one is returned but not stored. Entries go when
+        # the device's last load ends, so both maps only hold devices of in-flight loads.
+        self._loading: dict[str, int] = {}
+        self._generation: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: Hashable) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry.rows
+
+    def _put(self, key: Hashable, entry: _Entry) -> None:
+        if len(entry.rows) > self.max_rows:
+            return
+        self._remove(key)
+        self._entries[key] = entry
+        self._rows += len(entry.rows)
+        for device_id in entry.device_ids:
+            self._by_device.setdefault(device_id, set()).add(key)
+        while self._rows > self.max_rows:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+        aggregate_cache_rows_gauge.set(self._rows)
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._rows -= len(entry.rows)
+        for device_id in entry.device_ids:
+            keys = self._by_device.get(device_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_device[device_id]
+        aggregate_cache_rows_gauge.set(self._rows)
+
+    def invalidate(self, device_id: str, ts: datetime) -> None:
+        """Drop cached ranges of this device that contain ts (called after a commit)"""
+        self._bump_generation(device_id)
+        keys = self._by_device.get(device_id)
+        if not keys:
+            return
+        stale = [k for k in keys if self._entries[k].start <= ts < self._entries[k].end]
+        for key in stale:
+            self._remove(key)
+
+    def invalidate_device(self, device_id: str) -> None:
+        """Drop every cached range that includes this device (device deleted)"""
+        self._bump_generation(device_id)
+        for key in list(self._by_device.get(device_id, ())):
+            self._remove(key)
+
+    def _bump_generation(self, device_id: str) -> None:
+        if device_id in self._loading:
+            self._generation[device_id] = self._generation.get(device_id, 0) + 1
+
+    def _release(self, device_ids: set[str]) -> None:
+        for device_id in device_ids:
+            self._loading[device_id] -= 1
+            if not self._loading[device_id]:
+                del self._loading[device_id]
+                self._generation.pop(device_id, None)
+
+    def device_ids(self) -> list[str]:
+        return list(self._by_device)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_device.clear()
+        self._rows = 0
+        aggregate_cache_rows_gauge.set(0)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        device_ids: list[str],
+        start: datetime,
+        end: datetime,
+        is_open: bool,
+        loader: Callable[[], Awaitable[list]],
+    ) -> tuple[list, bool]:
+        """Return (rows, hit) for a range, loading and caching it on a miss"""
+        rows = self._get(key)
+        if rows is not None:
+            aggregate_cache_counter.labels(result="hit").inc()
+            return rows, True
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            aggregate_cache_counter.labels(result="shared").inc()
+            return await asyncio.shield(pending), True
+
+        aggregate_cache_counter.labels(result="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        loading = set(device_ids)
+        for device_id in loading:
+            self._loading[device_id] = self._loading.get(device_id, 0) + 1
+        generations = {d: self._generation.get(d, 0) for d in loading}
+        try:
+            rows = await loader()
+            fresh = all(self._generation.get(d, 0) == g for d, g in generations.items())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited future does not log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            self._release(loading)
+
+        future.set_result(rows)
+        if fresh:
+            ttl = self.open_ttl if is_open else self.closed_ttl
+            self._put(key, _Entry(rows, frozenset(device_ids), start, end, time.monotonic() + ttl))
+        return rows, False
+
+
+_aggregate_cache: Optional[AggregateCache] = None
+
+
+def init_aggregate_cache() -> AggregateCache:
+    """Create the process-wide aggregate cache shared by the API and the worker"""
+    global _aggregate_cache
+    _aggregate_cache = AggregateCache()
+    return _aggregate_cache
+
+
+def get_aggregate_cache() -> AggregateCache:
+    if _aggregate_cache is None:
+        raise RuntimeError("Aggregate cache not initialized")
+    return _aggregate_cache
@@ -0,0 +1,330 @@
+import os
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import Optional, Sequence
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.metrics import archived_rows_counter, error_counter
+
+logger = logging.getLogger(__name__)
+
+# Column layout of archived Parquet files
+ARCHIVE_SCHEMA = pa.schema([
+    ("time", pa.timestamp("us", tz="UTC")),
+    ("device_id", pa.dictionary(pa.int32(), pa.string())),
+    ("parameter_key", pa.dictionary(pa.int32(), pa.string())),
+    ("value", pa.float64()),
+    ("quality", pa.int16()),
+    ("source", pa.dictionary(pa.int32(), pa.string())),
+    ("event_id", pa.string()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    # JSON text of the source's attributes; NULL when it sent none
+    ("attributes", pa.string()),
+])
+
+_DICTIONARY_COLUMNS = ["device_id", "parameter_key", "source"]
+
+
+def _as_utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def partition_path(root: str, project_id: str, device_id: str, day: date, chunk_name: str) -> str:
+    """Hive-style partition path: project_id=/device_id=/day=/<chunk>.parquet"""
+    return os.path.join(
+        root,
+        f"project_id={project_id}",
+        f"device_id={device_id}",
+        f"day={day.isoformat()}",
+        f"{chunk_name}.parquet",
+    )
+
+
+def write_partition(path: str, rows: dict[str, list], row_group_size: int) -> int:
+    """Write one partition (rows already ordered by time) and return its size in bytes"""
+    table = pa.table(
+        {
+            "time": pa.array(rows["time"], type=pa.timestamp("us", tz="UTC")),
+            "device_id": pa.array(rows["device_id"], type=pa.string()).dictionary_encode(),
+            "parameter_key": pa.array(rows["parameter_key"], type=pa.string()).dictionary_encode(),
+            "value": pa.array(rows["value"], type=pa.float64()),
+            "quality": pa.array(rows["quality"], type=pa.int16()),
+            "source": pa.array(rows["source"], type=pa.string()).dictionary_encode(),
+            "event_id": pa.array(rows["event_id"], type=pa.string()),
+            "created_at": pa.array(rows["created_at"], type=pa.timestamp("us", tz="UTC")),
+            "attributes": pa.array(rows["attributes"], type=pa.string()),
+        },
+        schema=ARCHIVE_SCHEMA,
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(
+        table,
+        tmp_path,
+        compression="zstd",
+        use_dictionary=_DICTIONARY_COLUMNS,
+        row_group_size=row_group_size,
+        write_statistics=True,
+    )
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def read_row_groups(
+    paths: Sequence[str],
+    start: datetime,
+    end: datetime,
+    parameter_keys: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pa.Table:
+    """
+    Read archived rows in [start, end) from the given files.
+
+    Only row groups whose time statistics overlap the range are read; the
+    remaining rows are then filtered exactly. Columns missing from older
+    files (attributes) are returned as nulls.
+    """
+    start, end = _as_utc(start), _as_utc(end)
+    schema = ARCHIVE_SCHEMA if columns is None else pa.schema([ARCHIVE_SCHEMA.field(c) for c in columns])
+    time_index = ARCHIVE_SCHEMA.get_field_index("time")
+    tables = []
+    for path in paths:
+        parquet_file = pq.ParquetFile(path)
+        wanted = []
+        for i in range(parquet_file.metadata.num_row_groups):
+            stats = parquet_file.metadata.row_group(i).column(time_index).statistics
+            if stats is None or not stats.has_min_max or (_as_utc(stats.min) < end and _as_utc(stats.max) >= start):
+                wanted.append(i)
+        if not wanted:
+            continue
+        present = set(parquet_file.schema_arrow.names)
+        table = parquet_file.read_row_groups(wanted, columns=[n for n in schema.names if n in present])
+        for field in schema:
+            if field.name not in present:
+                table = table.append_column(field, pa.nulls(table.num_rows, type=field.type))
+        table = table.select(schema.names)
+        mask = pc.and_(pc.greater_equal(table["time"], pa.scalar(start, type=pa.timestamp("us", tz="UTC"))),
+                       pc.less(table["time"], pa.scalar(end, type=pa.timestamp("us", tz="UTC"))))
+        if parameter_keys:
+            mask = pc.and_(mask, pc.is_in(table["parameter_key"].cast(pa.string()), value_set=pa.array(list(parameter_keys))))
+        tables.append(table.filter(mask))
+    if not tables:
+        return schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+async def query_archive(
+    session: AsyncSession,
+    start: datetime,
+    end: datetime,
+    device_ids: Optional[Sequence[str]] = None,
+    project_id: Optional[str] = None,
+    parameter_keys: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pa.Table:
+    """
+    Query archived telemetry.
+
+    Files are located through the archived_partitions index (no storage
+    listing), then read_row_groups() reads only the row groups in range.
+    """
+    conditions = ["min_time < :end", "max_time >= :start"]
+    params: dict = {"start": start, "end": end}
+    if device_ids:
+        conditions.append("device_id = ANY(CAST(:device_ids AS uuid[]))")
+        params["device_ids"] = list(device_ids)
+    if project_id:
+        conditions.append("project_id = CAST(:project_id AS uuid)")
+        params["project_id"] = project_id
+    result = await session.execute(
+        text(f"SELECT path FROM archived_partitions WHERE {' AND '.join(conditions)} ORDER BY device_id, min_time"),
+        params,
+    )
+    paths = [row[0] for row in result]
+    return await asyncio.to_thread(read_row_groups, paths, start, end, parameter_keys, columns)
+
+
+class ChunkArchiver:
+    """
+    Exports ingest_events chunks to Parquet before the retention policy drops them.
+
+    Chunks of the ingest_events_compact hypertable whose range ends more than
+    ARCHIVE_AFTER_DAYS ago are read through the ingest_events view (so files
+    carry the text parameter_key) ordered by device and time, split into project/device/day
+    partitions and written as zstd-compressed Parquet with dictionary-encoded
+    device_id/parameter_key/source. Each file is recorded in
+    archived_partitions, and the chunk in archived_chunks once complete.
+
+    A chunk that the late merger merged rows into after it was archived
+    (archived_chunks.late_merges ahead of archived_merges, migration 310) is
+    archived again: its files are rewritten in place with the merged rows.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.root = os.getenv("ARCHIVE_ROOT", "/var/lib/nsready/archive")
+        self.after_days = int(os.getenv("ARCHIVE_AFTER_DAYS", "80"))
+        self.interval = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+        self.row_group_size = int(os.getenv("ARCHIVE_ROW_GROUP_SIZE", "10000"))
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+    async def start(self) -> None:
+        """Start the periodic archive loop"""
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Chunk archiver started (root={self.root}, after={self.after_days}d)")
+
+    async def stop(self) -> None:
+        """Stop the archive loop (an in-progress chunk is redone on next start)"""
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Chunk archiver stopped")
+
+    async def _run(self) -> None:
+        while self.running:
+            try:
+                await self.archive_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Archive run failed: {e}", exc_info=True)
+                error_counter.labels(error_type="archive").inc()
+            await asyncio.sleep(self.interval)
+
+    async def archive_pending(self) -> int:
+        """Archive every eligible chunk not archived yet or merged into since; returns chunks archived"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                text("""
+                    SELECT c.chunk_name, c.range_start, c.range_end
+                    FROM timescaledb_information.chunks c
+                    WHERE c.hypertable_name = 'ingest_events_compact'
+                      AND c.range_end < NOW() - make_interval(days => :days)
+                      AND NOT EXISTS (
+                          SELECT 1 FROM archived_chunks a
+                          WHERE a.chunk_name = c.chunk_name AND a.archived_merges >= a.late_merges
+                      )
+                    ORDER BY c.range_start
+                """),
+                {"days": self.after_days},
+            )
+            chunks = result.mappings().all()
+
+        for chunk in chunks:
+            if not self.running:
+                break
+            await self.archive_chunk(chunk["chunk_name"], chunk["range_start"], chunk["range_end"])
+        return len(chunks)
+
+    async def archive_chunk(self, chunk_name: str, range_start: datetime, range_end: datetime) -> None:
+        """Stream one chunk's rows into per project/device/day Parquet files"""
+        total_rows = 0
+        files = []
+        current_key = None
+        buffer: dict[str, list] = {}
+
+        async def flush_partition():
+            project_id, device_id, day = current_key
+            path = partition_path(self.root, project_id, device_id, day, chunk_name)
+            size = await asyncio.to_thread(write_partition, path, buffer, self.row_group_size)
+            files.append({
+                "chunk_name": chunk_name,
+                "project_id": project_id,
+                "device_id": device_id,
+                "day": day,
+                "path": path,
+                "min_time": buffer["time"][0],
+                "max_time": buffer["time"][-1],
+                "row_count": len(buffer["time"]),
+                "size_bytes": size,
+            })
+
+        async with self.session_factory() as session:
+            # Read before the rows: a merge committed after this read leaves the chunk stale
+            merges = await session.scalar(
+                text("SELECT late_merges FROM archived_chunks WHERE chunk_name = :chunk_name"),
+                {"chunk_name": chunk_name},
+            )
+            result = await session.stream(
+                text("""
+                    SELECT p.id::text AS project_id, e.device_id::text AS device_id,
+                           (e.time AT TIME ZONE 'UTC')::date AS day,
+                           e.time, e.parameter_key, e.value, e.quality, e.source, e.event_id, e.created_at,
+                           NULLIF(e.attributes, '{}'::jsonb)::text AS attributes
+                    FROM ingest_events e
+                    JOIN devices d ON d.id = e.device_id
+                    JOIN sites s ON s.id = d.site_id
+                    JOIN projects p ON p.id = s.project_id
+                    WHERE e.time >= :start AND e.time < :end
+                    ORDER BY e.device_id, e.time
+                """),
+                {"start": range_start, "end": range_end},
+            )
+            async for row in result.mappings():
+                key = (row["project_id"], row["device_id"], row["day"])
+                if key != current_key:
+                    if current_key is not None:
+                        await flush_partition()
+                    current_key = key
+                    buffer = {name: [] for name in ARCHIVE_SCHEMA.names}
+                for name in ARCHIVE_SCHEMA.names:
+                    buffer[name].append(row[name])
+                total_rows += 1
+            if current_key is not None:
+                await flush_partition()
+
+            # Record files and the chunk in one transaction so a crash mid-chunk is simply redone
+            if files:
+                await session.execute(
+                    text("""
+                        INSERT INTO archived_partitions
+                            (chunk_name, project_id, device_id, day, path, min_time, max_time, row_count, size_bytes)
+                        VALUES
+                            (:chunk_name, CAST(:project_id AS uuid), CAST(:device_id AS uuid), :day, :path,
+                             :min_time, :max_time, :row_count, :size_bytes)
+                        ON CONFLICT (chunk_name, device_id, day) DO UPDATE SET
+                            path = EXCLUDED.path,
+                            min_time = EXCLUDED.min_time,
+                            max_time = EXCLUDED.max_time,
+                            row_count = EXCLUDED.row_count,
+                            size_bytes = EXCLUDED.size_bytes,
+                            archived_at = NOW()
+                    """),
+                    files,
+                )
+            await session.execute(
+                text("""
+                    INSERT INTO archived_chunks (chunk_name, range_start, range_end, row_count, file_count, archived_merges)
+                    VALUES (:chunk_name, :range_start, :range_end, :row_count, :file_count, :archived_merges)
+                    ON CONFLICT (chunk_name) DO UPDATE SET
+                        row_count = EXCLUDED.row_count,
+                        file_count = EXCLUDED.file_count,
+                        archived_merges = EXCLUDED.archived_merges,
+                        archived_at = NOW()
+                """),
+                {
+                    "chunk_name": chunk_name,
+                    "range_start": range_start,
+                    "range_end": range_end,
+                    "row_count": total_rows,
+                    "file_count": len(files),
+                    "archived_merges": merges or 0,
+                },
+            )
+            await session.commit()
+
+        archived_rows_counter.inc(total_rows)
+        logger.info(f"Archived chunk {chunk_name}: {total_rows} rows in {len(files)} file(s)")
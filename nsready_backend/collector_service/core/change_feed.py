@@ -0,0 +1,84 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceHorizon:
+    """
+    Highest ingest_seq that is safe to hand out to change-feed consumers.
+
+    A sequence value is allocated when a row is written but only becomes
+    visible when its transaction commits, so values can appear out of order.
+    Each request samples ingest_events_seq and then the transactions in
+    progress (pg_current_snapshot). The worker takes its transaction id before
+    drawing a value, so every transaction that drew a value up to the sample
+    is in that list or already finished. A sample becomes the horizon once
+    all of its transactions have committed or aborted, however long that
+    takes; until then the previous horizon is returned. A request waits up to
+    FEED_SETTLE_WAIT_SECONDS for its own sample to settle. A long-running
+    transaction elsewhere in the database holds the horizon back until it ends.
+    """
+
+    def __init__(self):
+        self.max_wait = float(os.getenv("FEED_SETTLE_WAIT_SECONDS", "0.5"))
+        # Unsettled samples, oldest first: (wall-clock time, sequence value, in-progress xids)
+        self._pending: deque[tuple[float, int, list[str]]] = deque(maxlen=10000)
+        # Latest settled sample: (sequence value, wall-clock time)
+        self._settled: tuple[int, float] = (0, 0.0)
+
+    async def get(self, session: AsyncSession) -> tuple[int, float]:
+        """Return (horizon, wall-clock time at which it was sampled)"""
+        self._pending.append(await self._sample(session))
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            await self._settle(session)
+            if not self._pending or time.monotonic() >= deadline:
+                return self._settled
+            await asyncio.sleep(0.05)
+
+    async def _sample(self, session: AsyncSession) -> tuple[float, int, list[str]]:
+        wall_time = time.time()
+        result = await session.execute(text("SELECT last_value, is_called FROM ingest_events_seq"))
+        last_value, is_called = result.one()
+        # Separate statement: its snapshot is taken after the sequence was read
+        result = await session.execute(text("SELECT x::text FROM pg_snapshot_xip(pg_current_snapshot()) AS x"))
+        return wall_time, last_value if is_called else 0, list(result.scalars().all())
+
+    async def _settle(self, session: AsyncSession) -> None:
+        """Advance the horizon to the newest sample none of whose transactions is still running"""
+        xids = sorted({xid for _, _, sample_xids in self._pending for xid in sample_xids})
+        running = set()
+        if xids:
+            result = await session.execute(
+                text("""
+                    SELECT x::text FROM unnest(CAST(CAST(:xids AS text[]) AS xid8[])) AS x
+                    WHERE pg_xact_status(x) = 'in progress'
+                """),
+                {"xids": xids},
+            )
+            running = set(result.scalars().all())
+        # A transaction still running at a later sample is in that sample's list too,
+        # so a settled sample implies all earlier ones are settled
+        settled = None
+        for i, (_, _, sample_xids) in enumerate(self._pending):
+            if running.isdisjoint(sample_xids):
+                settled = i
+        if settled is None:
+            return
+        for _ in range(settled + 1):
+            wall_time, seq, _ = self._pending.popleft()
+        if seq >= self._settled[0]:
+            self._settled = (seq, wall_time)
+
+
+_horizon = SequenceHorizon()
+
+
+def get_sequence_horizon() -> SequenceHorizon:
+    return _horizon
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of the n_out points that best keep
+    the visual shape of (x, y). x must be sorted ascending.
+
+    First and last points are always kept. Interior points are split into
+    n_out - 2 buckets; from each bucket the point forming the largest triangle
+    with the previously selected point and the mean of the next bucket is kept.
+    The per-bucket area computation is vectorized; the loop runs once per output point.
+    """
+    size = len(x)
+    if n_out >= size or n_out < 3:
+        return np.arange(size)
+
+    # n_out - 1 edges over [1, size - 1) give n_out - 2 non-empty buckets (size > n_out)
+    edges = np.linspace(1, size - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo = edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+
+    return selected
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> tuple[np.ndarray, np.ndarray]:
+    """Downsample (x, y) to at most n_out points with LTTB"""
+    idx = lttb_indices(x, y, n_out)
+    return x[idx], y[idx]
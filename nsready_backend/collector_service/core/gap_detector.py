@@ -0,0 +1,270 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from core.metrics import gaps_detected_counter, gap_series_gauge, error_counter
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical(device_id: str) -> str:
+    """Series keep the device_id as sent by the device; compare in canonical UUID form"""
+    try:
+        return str(UUID(device_id))
+    except ValueError:
+        return device_id
+
+
+def _as_utc(ts: datetime) -> datetime:
+    """Treat naive timestamps as UTC so they compare with aware ones"""
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+_FLUSH_SQL = """
+    INSERT INTO missing_intervals (device_id, parameter_key, start_time, end_time, reason)
+    SELECT * FROM unnest(
+        CAST(:device_ids AS uuid[]), CAST(:keys AS text[]),
+        CAST(:starts AS timestamptz[]), CAST(:ends AS timestamptz[]), CAST(:reasons AS text[])
+    )
+    ON CONFLICT (device_id, parameter_key, start_time)
+    DO UPDATE SET end_time = {end_time}, reason = EXCLUDED.reason
+"""
+
+# An open gap only grows (its end is the sweep's wall-clock now)
+_FLUSH_OPEN_SQL = _FLUSH_SQL.format(end_time="GREATEST(missing_intervals.end_time, EXCLUDED.end_time)")
+
+# A closing row carries the real end, which is earlier for backfilled data
+_FLUSH_CLOSED_SQL = _FLUSH_SQL.format(end_time="EXCLUDED.end_time")
+
+
+class _SeriesState:
+    """Per-series tracking state (kept small: one instance per active series)"""
+
+    __slots__ = ("last_seen", "deltas", "open_gap_start", "open_gap_written")
+
+    def __init__(self, last_seen: datetime, samples: int):
+        self.last_seen = last_seen
+        self.deltas: deque[float] = deque(maxlen=samples)
+        self.open_gap_start: Optional[datetime] = None
+        self.open_gap_written: Optional[datetime] = None
+
+
+class GapDetector:
+    """
+    Streaming gap detection for (device_id, parameter_key) series.
+
+    Each committed sample is fed to observe(), which is O(1): it compares the
+    sample with the series' last-seen timestamp against the expected cadence
+    (parameter_templates.metadata.expected_interval_seconds, or the median of
+    the last few inter-arrival times). Detected gaps are buffered and written
+    to missing_intervals in batches. Series that go silent are swept
+    periodically and recorded as open gaps, which are extended every
+    GAP_OPEN_EXTEND_SECONDS and closed when data arrives again. A series silent
+    for longer than GAP_OPEN_MAX_SECONDS (e.g. a decommissioned device whose
+    deletion was never seen) has its gap closed at that point and is no
+    longer tracked; if it reports again it starts over as a new series.
+
+    Memory is bounded by GAP_MAX_SERIES; the least recently seen series are
+    evicted first.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.tolerance = float(os.getenv("GAP_TOLERANCE_FACTOR", "2.0"))
+        self.max_series = int(os.getenv("GAP_MAX_SERIES", "100000"))
+        self.samples = int(os.getenv("GAP_CADENCE_SAMPLES", "15"))
+        self.min_samples = int(os.getenv("GAP_MIN_SAMPLES", "3"))
+        self.flush_interval = float(os.getenv("GAP_FLUSH_INTERVAL_SECONDS", "10"))
+        self.flush_batch_size = int(os.getenv("GAP_FLUSH_BATCH_SIZE", "500"))
+        self.open_extend_interval = float(os.getenv("GAP_OPEN_EXTEND_SECONDS", "300"))
+        self.open_max_seconds = float(os.getenv("GAP_OPEN_MAX_SECONDS", str(7 * 86400)))
+        self.cadence_refresh_interval = float(os.getenv("GAP_CADENCE_REFRESH_SECONDS", "300"))
+
+        self._series: OrderedDict[tuple[str, str], _SeriesState] = OrderedDict()
+        self._declared_cadence: dict[str, float] = {}
+        # (device_id, parameter_key, start_time) -> (end_time, reason, is_open)
+        self._pending: dict[tuple[str, str, datetime], tuple[datetime, str, bool]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_event = asyncio.Event()
+        self.running = False
+
+    async def start(self) -> None:
+        """Load declared cadences and start the background flush loop"""
+        if self.running:
+            return
+        self.running = True
+        await self.refresh_cadences()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Gap detector started (tolerance={self.tolerance}x, max_series={self.max_series})")
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out whatever is still buffered"""
+        self.running = False
+        if self._task:
+            self._flush_event.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        logger.info("Gap detector stopped")
+
+    async def refresh_cadences(self) -> None:
+        """Reload expected_interval_seconds from parameter_templates metadata"""
+        try:
+            async with self.session_factory() as session:
+                result = await session.execute(text("""
+                    SELECT key, (metadata->>'expected_interval_seconds')::double precision AS seconds
+                    FROM parameter_templates
+                    WHERE metadata ? 'expected_interval_seconds'
+                """))
+                self._declared_cadence = {
+                    row["key"]: row["seconds"] for row in result.mappings() if row["seconds"] and row["seconds"] > 0
+                }
+        except Exception as e:
+            logger.warning(f"Could not load declared cadences, using learned cadence only: {e}")
+
+    def expected_cadence(self, parameter_key: str, state: _SeriesState) -> Optional[float]:
+        """Declared cadence if present, else the median of recent deltas (None until learned)"""
+        declared = self._declared_cadence.get(parameter_key)
+        if declared:
+            return declared
+        if len(state.deltas) < self.min_samples:
+            return None
+        # Bounded window (GAP_CADENCE_SAMPLES), so this sort is constant-time per row
+        ordered = sorted(state.deltas)
+        return ordered[len(ordered) // 2]
+
+    def observe(self, device_id: str, parameter_key: str, ts: datetime) -> None:
+        """Record one committed sample; O(1) per call"""
+        ts = _as_utc(ts)
+        key = (device_id, parameter_key)
+        state = self._series.get(key)
+
+        if state is None:
+            self._series[key] = _SeriesState(ts, self.samples)
+            if len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+            return
+
+        self._series.move_to_end(key)
+        if ts <= state.last_seen:
+            # Out-of-order or duplicate sample: does not advance the series
+            return
+
+        delta = (ts - state.last_seen).total_seconds()
+        cadence = self.expected_cadence(parameter_key, state)
+
+        if state.open_gap_start is not None:
+            # Data resumed after a gap already recorded by the silence sweep
+            self._queue(device_id, parameter_key, state.open_gap_start, ts, "no data")
+            state.open_gap_start = None
+        elif cadence is not None and delta > cadence * self.tolerance:
+            gaps_detected_counter.inc()
+            self._queue(device_id, parameter_key, state.last_seen, ts, f"no data (expected every {cadence:g}s)")
+        else:
+            # Gaps are not fed back into the learned cadence
+            state.deltas.append(delta)
+
+        state.last_seen = ts
+
+    def sweep(self, now: Optional[datetime] = None) -> None:
+        """Record, extend or give up on open gaps for series that have gone silent"""
+        now = now or datetime.now(timezone.utc)
+        abandoned = []
+        for (device_id, parameter_key), state in self._series.items():
+            cadence = self.expected_cadence(parameter_key, state)
+            if cadence is None:
+                continue
+            if state.open_gap_start is None and (now - state.last_seen).total_seconds() <= cadence * self.tolerance:
+                continue
+            if state.open_gap_start is None:
+                gaps_detected_counter.inc()
+                state.open_gap_start = state.last_seen
+            elif (now - state.open_gap_start).total_seconds() > self.open_max_seconds:
+                self._queue(device_id, parameter_key, state.open_gap_start, now, "no data (tracking stopped)")
+                abandoned.append((device_id, parameter_key))
+                continue
+            elif (now - state.open_gap_written).total_seconds() < self.open_extend_interval:
+                continue
+            state.open_gap_written = now
+            self._queue(device_id, parameter_key, state.open_gap_start, now, "no data (open)", is_open=True)
+        for key in abandoned:
+            del self._series[key]
+
+    def forget_device(self, device_id: str) -> None:
+        """Stop tracking a deleted device and drop its buffered gaps (their insert would fail)"""
+        device_id = _canonical(device_id)
+        for key in [k for k in self._series if _canonical(k[0]) == device_id]:
+            del self._series[key]
+        for key in [k for k in self._pending if _canonical(k[0]) == device_id]:
+            del self._pending[key]
+        gap_series_gauge.set(len(self._series))
+
+    def device_ids(self) -> set[str]:
+        return {_canonical(device_id) for device_id, _ in self._series}
+
+    def _queue(
+        self, device_id: str, parameter_key: str, start: datetime, end: datetime, reason: str, is_open: bool = False
+    ) -> None:
+        self._pending[(device_id, parameter_key, start)] = (end, reason, is_open)
+        if len(self._pending) >= self.flush_batch_size:
+            self._flush_event.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_sweep = loop.time() + self.flush_interval
+        next_refresh = loop.time() + self.cadence_refresh_interval
+        while self.running:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            if loop.time() >= next_sweep:
+                self.sweep()
+                next_sweep = loop.time() + self.flush_interval
+            await self.flush()
+            gap_series_gauge.set(len(self._series))
+            if loop.time() >= next_refresh:
+                await self.refresh_cadences()
+                next_refresh = loop.time() + self.cadence_refresh_interval
+
+    async def flush(self) -> None:
+        """Write buffered gaps to missing_intervals in one transaction (one statement for open gaps, one for closed)"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        # (device_ids, keys, starts, ends, reasons) for closed and for open gaps
+        batches = {False: ([], [], [], [], []), True: ([], [], [], [], [])}
+        for (device_id, parameter_key, start), (end, reason, is_open) in pending.items():
+            for column, value in zip(batches[is_open], (device_id, parameter_key, start, end, reason)):
+                column.append(value)
+
+        async with self.session_factory() as session:
+            try:
+                for is_open, (device_ids, keys, starts, ends, reasons) in batches.items():
+                    if not device_ids:
+                        continue
+                    await session.execute(
+                        text(_FLUSH_OPEN_SQL if is_open else _FLUSH_CLOSED_SQL),
+                        {"device_ids": device_ids, "keys": keys, "starts": starts, "ends": ends, "reasons": reasons},
+                    )
+                await session.commit()
+                logger.debug(f"Flushed {len(pending)} missing interval(s)")
+            except IntegrityError as e:
+                # Device or parameter deleted since the samples were committed
+                await session.rollback()
+                logger.warning(f"Dropped {len(pending)} missing interval(s): {e}")
+                error_counter.labels(error_type="gap_flush").inc()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error flushing missing intervals: {e}", exc_info=True)
+                error_counter.labels(error_type="gap_flush").inc()
+                # Keep the batch for the next flush; newer updates for the same gap win
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
@@ -0,0 +1,241 @@
+import os
+import time
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+from core.metrics import hot_window_counter, hot_window_bytes_gauge, hot_window_series_gauge, hot_window_evictions_counter
+
+logger = logging.getLogger(__name__)
+
+# Approximate fixed cost of a series (object, three arrays, dict/LRU entries) and of one sample
+_SERIES_OVERHEAD_BYTES = 400
+_SAMPLE_BYTES = 8 + 8 + 2
+
+
+class _Series:
+    """
+    Samples of one (device_id, parameter_key) series, ordered by time.
+
+    Timestamps (epoch seconds) and values are float64 arrays and quality an
+    int16 array, 18 bytes per sample. Expired samples are dropped by advancing
+    `head`; the arrays are compacted once more than half of them is dead, so
+    appends and trims are amortized O(1) as in a ring buffer.
+    """
+
+    __slots__ = ("times", "values", "qualities", "head", "complete_from")
+
+    def __init__(self, complete_from: float):
+        self.times = array("d")
+        self.values = array("d")
+        self.qualities = array("h")
+        self.head = 0
+        # Every sample with a time at or after this went through the store
+        self.complete_from = complete_from
+
+    def __len__(self) -> int:
+        return len(self.times) - self.head
+
+    def add(self, ts: float, value: float, quality: int) -> int:
+        """Insert or overwrite the sample at ts; return the number of samples added (0 or 1)"""
+        if len(self) == 0 or ts > self.times[-1]:
+            self.times.append(ts)
+            self.values.append(value)
+            self.qualities.append(quality)
+            return 1
+        # Out of order (buffered device) or re-sent sample
+        i = bisect_left(self.times, ts, self.head)
+        if i < len(self.times) and self.times[i] == ts:
+            self.values[i] = value
+            self.qualities[i] = quality
+            return 0
+        self.times.insert(i, ts)
+        self.values.insert(i, value)
+        self.qualities.insert(i, quality)
+        return 1
+
+    def trim(self, cutoff: float) -> int:
+        """Drop samples older than cutoff; return the number dropped"""
+        self.complete_from = max(self.complete_from, cutoff)
+        new_head = bisect_left(self.times, cutoff, self.head)
+        dropped = new_head - self.head
+        self.head = new_head
+        if self.head > len(self.times) // 2:
+            del self.times[:self.head]
+            del self.values[:self.head]
+            del self.qualities[:self.head]
+            self.head = 0
+        return dropped
+
+    def window(self, start: float, end: float) -> tuple[array, array, array]:
+        lo = bisect_left(self.times, start, self.head)
+        hi = bisect_left(self.times, end, lo)
+        return self.times[lo:hi], self.values[lo:hi], self.qualities[lo:hi]
+
+
+class HotWindowStore:
+    """
+    In-memory store of the last HOT_WINDOW_HOURS of telemetry per series.
+
+    The ingest worker adds every committed sample, so recent-window reads
+    (dashboards polling the last 1-6 hours) are answered without querying
+    ingest_events. Data is complete from process start, or for a series
+    re-created after an eviction from the time of that eviction; reads asking
+    for earlier data, or for series the store does not hold, are misses and go
+    to the database.
+
+    Memory is capped by HOT_WINDOW_MAX_BYTES (estimated from sample counts);
+    when exceeded, the series read least recently are evicted first. Every
+    collector instance receives all ingest messages (plain NATS subscription),
+    so each instance holds the complete window.
+    """
+
+    def __init__(self):
+        self.window = float(os.getenv("HOT_WINDOW_HOURS", "6")) * 3600
+        self.max_bytes = int(os.getenv("HOT_WINDOW_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.sweep_interval = float(os.getenv("HOT_WINDOW_SWEEP_SECONDS", "60"))
+        # LRU order by last read; new series enter at the most recent end
+        self._series: "OrderedDict[tuple[str, str], _Series]" = OrderedDict()
+        self._samples = 0
+        # New series are complete from here: store creation, moved up by every eviction
+        self._complete_from = time.time()
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+    @property
+    def bytes_used(self) -> int:
+        return len(self._series) * _SERIES_OVERHEAD_BYTES + self._samples * _SAMPLE_BYTES
+
+    async def start(self) -> None:
+        """Start the periodic sweep of expired samples"""
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Hot window store started (window={self.window / 3600:g}h, max_bytes={self.max_bytes})")
+
+    async def stop(self) -> None:
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Hot window store stopped")
+
+    async def _run(self) -> None:
+        while self.running:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Hot window sweep failed: {e}", exc_info=True)
+
+    def add(self, device_id: str, parameter_key: str, ts: datetime, value: Optional[float], quality: int) -> None:
+        """Record a committed sample; samples older than the window are ignored"""
+        epoch = ts.timestamp()
+        now = time.time()
+        if epoch < now - self.window:
+            return
+        key = (device_id, parameter_key)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(complete_from=self._complete_from)
+        self._samples += series.add(epoch, float("nan") if value is None else value, quality)
+        if self.bytes_used > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        # Free 10% below the cap so eviction does not run on every add
+        target = self.max_bytes * 0.9
+        while self._series and self.bytes_used > target:
+            _, series = self._series.popitem(last=False)
+            self._samples -= len(series)
+            hot_window_evictions_counter.inc()
+        # An evicted series may be re-created later without its older samples
+        self._complete_from = time.time()
+        self._update_gauges()
+
+    def sweep(self) -> None:
+        """Drop samples that left the window and series that became empty"""
+        cutoff = time.time() - self.window
+        for key in list(self._series):
+            series = self._series[key]
+            self._samples -= series.trim(cutoff)
+            if len(series) == 0:
+                # Nothing within the window; a later sample re-creates the series
+                del self._series[key]
+        self._update_gauges()
+
+    def drop_device(self, device_id: str) -> None:
+        """Remove all series of a device (device deleted)"""
+        for key in [k for k in self._series if k[0] == device_id]:
+            self._samples -= len(self._series.pop(key))
+        self._update_gauges()
+
+    def device_ids(self) -> set[str]:
+        return {device_id for device_id, _ in self._series}
+
+    def _update_gauges(self) -> None:
+        hot_window_bytes_gauge.set(self.bytes_used)
+        hot_window_series_gauge.set(len(self._series))
+
+    def get(
+        self,
+        series_keys: list[tuple[str, str]],
+        start: datetime,
+        end: datetime,
+    ) -> Optional[list[tuple[str, str, array, array, array]]]:
+        """
+        Samples of each series in [start, end), or None if any series may be
+        incomplete for that range (start before its coverage or the window).
+        """
+        start_epoch, end_epoch = start.timestamp(), end.timestamp()
+        if start_epoch < time.time() - self.window:
+            hot_window_counter.labels(result="miss").inc()
+            return None
+
+        found = []
+        for key in series_keys:
+            series = self._series.get(key)
+            # A series the store does not hold had no samples since the store became complete
+            complete_from = series.complete_from if series is not None else self._complete_from
+            if start_epoch < complete_from:
+                hot_window_counter.labels(result="miss").inc()
+                return None
+            found.append((key, series))
+
+        empty = array("d")
+        results = []
+        for key, series in found:
+            if series is None:
+                results.append((*key, empty, empty, array("h")))
+                continue
+            self._series.move_to_end(key)
+            results.append((*key, *series.window(start_epoch, end_epoch)))
+        hot_window_counter.labels(result="hit").inc()
+        return results
+
+
+def epoch_to_datetime(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+_hot_window: Optional[HotWindowStore] = None
+
+
+def init_hot_window() -> HotWindowStore:
+    """Create the process-wide hot window store filled by the worker"""
+    global _hot_window
+    _hot_window = HotWindowStore()
+    return _hot_window
+
+
+def get_hot_window() -> Optional[HotWindowStore]:
+    """None when HOT_WINDOW_ENABLED is off; readers then go to the database"""
+    return _hot_window
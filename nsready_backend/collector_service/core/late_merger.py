@@ -0,0 +1,211 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import text
+from core.metrics import late_rows_merged_counter, late_chunks_merged_counter, error_counter
+
+logger = logging.getLogger(__name__)
+
+_MERGE_COLUMNS = "time, device_id, value, parameter_id, quality, source, event_id, attributes, created_at, ingest_seq"
+
+# Move the late rows matching `where` into ingest_events_compact; later values win, as on the live path.
+# Rows keep the ingest_seq they got in the late table, where the change feed already reported them.
+_MOVE_SQL = """
+    WITH moved AS (
+        DELETE FROM ingest_events_late l
+        WHERE {where}
+        RETURNING {columns}
+    )
+    INSERT INTO ingest_events_compact ({columns})
+    SELECT {columns} FROM moved
+    ON CONFLICT (time, device_id, parameter_id)
+    DO UPDATE SET
+        value = EXCLUDED.value,
+        quality = EXCLUDED.quality,
+        source = EXCLUDED.source,
+        event_id = EXCLUDED.event_id,
+        attributes = EXCLUDED.attributes,
+        ingest_seq = EXCLUDED.ingest_seq
+"""
+
+_CHUNK_WHERE = "l.time >= :start AND l.time < :end AND l.created_at < :cutoff"
+
+_UNCHUNKED_WHERE = """l.created_at < :cutoff AND NOT EXISTS (
+            SELECT 1 FROM timescaledb_information.chunks c
+            WHERE c.hypertable_name = 'ingest_events_compact'
+              AND l.time >= c.range_start AND l.time < c.range_end
+        )"""
+
+# Late rows are not rolled up on ingest (core/worker.py): the (device, hour) pairs a move touches
+# are noted before it and their hourly rollups rebuilt from the merged rows afterwards
+_TOUCHED_SQL = """
+    CREATE TEMP TABLE late_touched ON COMMIT DROP AS
+    SELECT DISTINCT l.device_id, time_bucket(INTERVAL '1 hour', l.time) AS hour
+    FROM ingest_events_late l
+    WHERE {where}
+"""
+
+_CLEAR_DEVICE_ROLLUPS_SQL = """
+    DELETE FROM measurements m
+    USING late_touched t
+    WHERE m.agg_interval = '1h' AND m.device_id = t.device_id AND m.time = t.hour
+"""
+
+_BUILD_DEVICE_ROLLUPS_SQL = """
+    INSERT INTO measurements (time, device_id, parameter_key, agg_interval,
+                              value_sum, value_avg, value_min, value_max, value_count)
+    SELECT t.hour, t.device_id, pt.key, '1h',
+           sum(e.value), avg(e.value), min(e.value), max(e.value), count(e.value)
+    FROM late_touched t
+    JOIN ingest_events_compact e
+      ON e.device_id = t.device_id AND e.time >= t.hour AND e.time < t.hour + INTERVAL '1 hour'
+    JOIN parameter_templates pt ON pt.param_id = e.parameter_id
+    WHERE e.value IS NOT NULL
+    GROUP BY 1, 2, 3
+"""
+
+_BUILD_GROUP_ROLLUPS_SQL = """
+    SELECT refresh_group_rollups(min(hour), max(hour) + INTERVAL '1 hour')
+    FROM late_touched
+    HAVING count(*) > 0
+"""
+
+
+# No-op for chunks that are not archived yet
+_MARK_ARCHIVE_STALE_SQL = """
+    UPDATE archived_chunks SET late_merges = late_merges + 1 WHERE chunk_name = :chunk_name
+"""
+
+
+class LateArrivalMerger:
+    """
+    Scheduled job that folds ingest_events_late into ingest_events_compact.
+
+    Late rows are grouped by the chunk they belong to. Each affected chunk is
+    handled in one transaction: decompressed if needed, all of its late rows
+    moved with a single INSERT ... SELECT, then recompressed. Rows that fall
+    outside every existing chunk are moved last in one statement (the
+    compression policy picks up the chunks this creates).
+
+    Rows stay in the side table for at least LATE_MERGE_MIN_AGE_HOURS, the
+    window in which change-feed consumers (api/changes.py) are guaranteed to
+    see them before they move into compressed chunks.
+
+    With ROLLUPS_ENABLED, the hourly device and group rollups of the hours a
+    move touches are rebuilt in the same transaction; late rows reach the
+    rollups only then. A merge into a chunk that is already archived bumps its
+    archived_chunks.late_merges (migration 310), so the archiver rewrites the
+    chunk's Parquet files.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.interval = float(os.getenv("LATE_MERGE_INTERVAL_SECONDS", "900"))
+        self.min_age = timedelta(hours=float(os.getenv("LATE_MERGE_MIN_AGE_HOURS", "6")))
+        self.rollups_enabled = os.getenv("ROLLUPS_ENABLED", "true").lower() == "true"
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+    async def start(self) -> None:
+        """Start the periodic merge loop"""
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Late arrival merger started (interval={self.interval}s)")
+
+    async def stop(self) -> None:
+        """Stop the merge loop; a merge in progress rolls back and is redone next time"""
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Late arrival merger stopped")
+
+    async def _run(self) -> None:
+        while self.running:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.merge()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Late arrival merge failed: {e}", exc_info=True)
+                error_counter.labels(error_type="late_merge").inc()
+
+    async def merge(self) -> int:
+        """Merge late rows older than min_age; returns the number of rows moved"""
+        cutoff = datetime.now(timezone.utc) - self.min_age
+        async with self.session_factory() as session:
+            result = await session.execute(text("""
+                SELECT format('%I.%I', c.chunk_schema, c.chunk_name) AS chunk, c.chunk_name,
+                       c.range_start, c.range_end, c.is_compressed
+                FROM timescaledb_information.chunks c
+                WHERE c.hypertable_name = 'ingest_events_compact'
+                  AND EXISTS (
+                      SELECT 1 FROM ingest_events_late l
+                      WHERE l.time >= c.range_start AND l.time < c.range_end
+                        AND l.created_at < :cutoff
+                  )
+                ORDER BY c.range_start
+            """), {"cutoff": cutoff})
+            chunks = result.mappings().all()
+
+        moved_total = 0
+        for chunk in chunks:
+            if not self.running:
+                break
+            moved_total += await self._merge_chunk(
+                chunk["chunk"], chunk["chunk_name"], chunk["range_start"], chunk["range_end"],
+                chunk["is_compressed"], cutoff,
+            )
+
+        # Rows with no existing chunk (range dropped or never created): one bulk move
+        if self.running:
+            async with self.session_factory() as session:
+                moved_total += await self._move(session, _UNCHUNKED_WHERE, {"cutoff": cutoff})
+                await session.commit()
+
+        if moved_total:
+            late_rows_merged_counter.inc(moved_total)
+            logger.info(f"Merged {moved_total} late row(s) across {len(chunks)} chunk(s)")
+        return moved_total
+
+    async def _merge_chunk(
+        self, chunk: str, chunk_name: str, range_start, range_end, is_compressed: bool, cutoff: datetime
+    ) -> int:
+        async with self.session_factory() as session:
+            try:
+                if is_compressed:
+                    await session.execute(text("SELECT decompress_chunk(CAST(:chunk AS regclass), if_compressed => TRUE)"), {"chunk": chunk})
+                moved = await self._move(
+                    session, _CHUNK_WHERE, {"start": range_start, "end": range_end, "cutoff": cutoff}
+                )
+                if moved:
+                    await session.execute(text(_MARK_ARCHIVE_STALE_SQL), {"chunk_name": chunk_name})
+                if is_compressed:
+                    await session.execute(text("SELECT compress_chunk(CAST(:chunk AS regclass), if_not_compressed => TRUE)"), {"chunk": chunk})
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        late_chunks_merged_counter.inc()
+        logger.debug(f"Merged {moved} late row(s) into {chunk}")
+        return moved
+
+    async def _move(self, session, where: str, params: dict) -> int:
+        """Move the late rows matching where, and rebuild their rollups, in the session's transaction"""
+        if self.rollups_enabled:
+            await session.execute(text(_TOUCHED_SQL.format(where=where)), params)
+        result = await session.execute(text(_MOVE_SQL.format(where=where, columns=_MERGE_COLUMNS)), params)
+        if self.rollups_enabled:
+            await session.execute(text(_CLEAR_DEVICE_ROLLUPS_SQL))
+            await session.execute(text(_BUILD_DEVICE_ROLLUPS_SQL))
+            await session.execute(text(_BUILD_GROUP_ROLLUPS_SQL))
+        return result.rowcount or 0
@@ -24,6 +24,97 @@ ingest_rate_gauge = Gauge(
     'Current ingestion rate (events per second)'
 )
 
+gaps_detected_counter = Counter(
+    'ingest_gaps_detected_total',
+    'Total number of data gaps detected per device/parameter series'
+)
+
+gap_series_gauge = Gauge(
+    'ingest_gap_series_tracked',
+    'Number of device/parameter series tracked by the gap detector'
+)
+
+archived_rows_counter = Counter(
+    'ingest_archived_rows_total',
+    'Total number of ingest_events rows exported to the Parquet archive'
+)
+
+late_rows_counter = Counter(
+    'ingest_late_rows_total',
+    'Total number of rows older than the compression horizon routed to ingest_events_late'
+)
+
+late_rows_merged_counter = Counter(
+    'ingest_late_rows_merged_total',
+    'Total number of late rows merged into ingest_events_compact'
+)
+
+late_chunks_merged_counter = Counter(
+    'ingest_late_chunks_merged_total',
+    'Total number of chunk merges performed for late rows'
+)
+
+aggregate_cache_counter = Counter(
+    'telemetry_aggregate_cache_requests_total',
+    'Aggregate cache lookups per time range (hit, shared in-flight load, miss)',
+    ['result']
+)
+
+aggregate_cache_rows_gauge = Gauge(
+    'telemetry_aggregate_cache_rows',
+    'Number of aggregate rows held in the in-memory cache'
+)
+
+export_bytes_counter = Counter(
+    'telemetry_export_bytes_total',
+    'Total bytes sent by the telemetry export endpoint',
+    ['format']
+)
+
+hot_window_counter = Counter(
+    'telemetry_hot_window_requests_total',
+    'Recent-window reads answered from the in-memory hot window store (hit) or the database (miss)',
+    ['result']
+)
+
+hot_window_bytes_gauge = Gauge(
+    'telemetry_hot_window_bytes',
+    'Estimated memory held by the hot window store'
+)
+
+hot_window_series_gauge = Gauge(
+    'telemetry_hot_window_series',
+    'Number of device/parameter series held by the hot window store'
+)
+
+hot_window_evictions_counter = Counter(
+    'telemetry_hot_window_evictions_total',
+    'Total number of series evicted from the hot window store to stay under the memory cap'
+)
+
+registry_events_counter = Counter(
+    'registry_change_events_total',
+    'Registry change events received from the admin tool, by entity and operation',
+    ['entity', 'op']
+)
+
+registry_events_missed_counter = Counter(
+    'registry_change_events_missed_total',
+    'Registry change versions skipped (missed events), each followed by a full reload'
+)
+
+db_routing_counter = Counter(
+    'db_session_routes_total',
+    'Database sessions handed out, by kind (read: get_read_session, primary: get_session) and target (primary, replica, primary_fallback)',
+    ['kind', 'target']
+)
+
+replica_lag_gauge = Gauge(
+    'db_replica_lag_seconds',
+    'Replay lag of each read replica at the last check (-1 when the check failed)',
+    ['replica']
+)
+
 
 def get_metrics_response() -> Response:
     """Generate Prometheus metrics response"""
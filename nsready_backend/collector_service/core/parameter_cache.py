@@ -0,0 +1,138 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Iterable, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# pg_notify channel of migration 250; sent once per statement changing parameter_templates
+NOTIFY_CHANNEL = "parameter_templates_changed"
+
+
+class ParameterCache:
+    """
+    In-memory map of parameter_templates.key -> param_id for the ingest path.
+
+    Lookups are served from memory. Keys not in the cache are loaded in one
+    query per call (not per row); keys that still do not exist are remembered
+    for PARAM_CACHE_NEGATIVE_TTL_SECONDS so bad payloads do not hit the
+    database repeatedly. The whole map is reloaded every
+    PARAM_CACHE_TTL_SECONDS to pick up renamed or deleted templates, and after
+    every change notification (ParameterCacheListener).
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("PARAM_CACHE_TTL_SECONDS", "300"))
+        self.negative_ttl = float(os.getenv("PARAM_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+        self._ids: dict[str, int] = {}
+        self._unknown: dict[str, float] = {}
+        self._loaded_at = 0.0
+
+    def invalidate(self) -> None:
+        """Force a full reload on the next lookup"""
+        self._loaded_at = 0.0
+        self._unknown.clear()
+
+    def forget_unknown(self, key: str) -> None:
+        """A template was created for key: look it up again instead of waiting for the negative TTL"""
+        self._unknown.pop(key, None)
+
+    async def _reload(self, session: AsyncSession) -> None:
+        result = await session.execute(text("SELECT key, param_id FROM parameter_templates"))
+        self._ids = {row[0]: row[1] for row in result}
+        self._unknown.clear()
+        self._loaded_at = time.monotonic()
+        logger.debug(f"Parameter cache loaded: {len(self._ids)} keys")
+
+    async def resolve(self, keys: Iterable[str], session: AsyncSession) -> dict[str, int]:
+        """
+        Map parameter keys to param_ids.
+
+        Unknown keys are omitted from the result; the caller decides how to
+        report them.
+        """
+        now = time.monotonic()
+        if now - self._loaded_at > self.ttl:
+            await self._reload(session)
+
+        keys = set(keys)
+        missing = [
+            k for k in keys
+            if k not in self._ids and now - self._unknown.get(k, float("-inf")) > self.negative_ttl
+        ]
+        if missing:
+            result = await session.execute(
+                text("SELECT key, param_id FROM parameter_templates WHERE key = ANY(CAST(:keys AS text[]))"),
+                {"keys": missing},
+            )
+            for key, param_id in result:
+                self._ids[key] = param_id
+            for key in missing:
+                if key not in self._ids:
+                    self._unknown[key] = now
+
+        return {k: self._ids[k] for k in keys if k in self._ids}
+
+
+class ParameterCacheListener:
+    """
+    Reloads the parameter cache when templates change (LISTEN parameter_templates_changed).
+
+    The notification is sent once per statement, so a batch upsert from the admin
+    tool costs one reload on the next lookup instead of one per template. The
+    cache is also invalidated on every (re)connect, as notifications sent while
+    disconnected are lost.
+    """
+
+    def __init__(self, engine: AsyncEngine, cache: ParameterCache):
+        self.engine = engine
+        self.cache = cache
+        self.retry_interval = 5.0
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Parameter cache listener stopped")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.cache.invalidate()
+
+    async def _run(self) -> None:
+        while self.running:
+            try:
+                async with self.engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    await driver.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                    self.cache.invalidate()
+                    logger.info(f"Listening on {NOTIFY_CHANNEL} for parameter template changes")
+                    try:
+                        while self.running and not driver.is_closed():
+                            await asyncio.sleep(self.retry_interval)
+                    finally:
+                        if not driver.is_closed():
+                            await driver.remove_listener(NOTIFY_CHANNEL, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Parameter cache listener failed: {e}")
+            if self.running:
+                self.cache.invalidate()
+                await asyncio.sleep(self.retry_interval)
@@ -0,0 +1,163 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Optional
+from sqlalchemy import text
+from nats.aio.client import Client as NATS
+from core.parameter_cache import ParameterCache
+from core.gap_detector import GapDetector
+from core.aggregate_cache import AggregateCache
+from core.hot_window import HotWindowStore
+from core.metrics import registry_events_counter, registry_events_missed_counter
+
+logger = logging.getLogger(__name__)
+
+# Entities whose deletion cascades to devices the event does not name
+_DEVICE_PARENTS = ("site", "project", "customer")
+
+
+class RegistryEventSubscriber:
+    """
+    Applies the admin tool's registry change events (registry.changes.<entity>) to
+    the collector's in-memory state as they arrive.
+
+    - parameter_template create: the key is dropped from the parameter cache's
+      negative entries, so the next lookup finds it; update, delete and bulk
+      force a full reload. Declared cadences of the gap detector are reloaded.
+    - device delete: the device's cached aggregates, hot window series and gap
+      detector series (including buffered gaps) are dropped.
+    - site, project or customer delete: devices removed by the cascade are not
+      named in the event; tracked devices are checked in one query and the
+      missing ones dropped as above.
+
+    Each event carries the registry change version. If it jumps, events were
+    missed (NATS reconnect, admin instance without NATS) and everything is
+    reloaded as after a bulk change. While subscribed, the TTL reloads of the
+    parameter cache and the declared cadences only serve as a safety net for
+    changes made outside the admin API and run every
+    REGISTRY_EVENTS_RELOAD_SECONDS.
+    """
+
+    def __init__(
+        self,
+        nc: NATS,
+        session_factory,
+        param_cache: ParameterCache,
+        gap_detector: Optional[GapDetector] = None,
+        aggregate_cache: Optional[AggregateCache] = None,
+        hot_window: Optional[HotWindowStore] = None,
+    ):
+        self.nc = nc
+        self.session_factory = session_factory
+        self.param_cache = param_cache
+        self.gap_detector = gap_detector
+        self.aggregate_cache = aggregate_cache
+        self.hot_window = hot_window
+        self.subject = os.getenv("REGISTRY_EVENTS_SUBJECT_PREFIX", "registry.changes") + ".>"
+        self.reload_interval = float(os.getenv("REGISTRY_EVENTS_RELOAD_SECONDS", "3600"))
+        self._version: Optional[int] = None
+        self._sub = None
+        self._cadence_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._sub is not None:
+            return
+        self._sub = await self.nc.subscribe(self.subject, cb=self._on_message)
+        self.param_cache.ttl = max(self.param_cache.ttl, self.reload_interval)
+        if self.gap_detector:
+            self.gap_detector.cadence_refresh_interval = max(
+                self.gap_detector.cadence_refresh_interval, self.reload_interval
+            )
+        logger.info(f"Subscribed to registry changes on {self.subject}")
+
+    async def stop(self) -> None:
+        if self._sub is not None:
+            try:
+                await self._sub.unsubscribe()
+            except Exception as e:
+                logger.debug(f"Registry change unsubscribe failed: {e}")
+            self._sub = None
+        if self._cadence_task:
+            self._cadence_task.cancel()
+            try:
+                await self._cadence_task
+            except asyncio.CancelledError:
+                pass
+            self._cadence_task = None
+        logger.info("Registry event subscriber stopped")
+
+    async def _on_message(self, msg) -> None:
+        try:
+            event = json.loads(msg.data)
+            entity, op, version = event["entity"], event["op"], int(event["version"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed registry change on {msg.subject}: {e}")
+            return
+        registry_events_counter.labels(entity=entity, op=op).inc()
+        try:
+            # Events of one transaction share a version; a gap means events were missed
+            if self._version is not None and version > self._version + 1:
+                registry_events_missed_counter.inc(version - self._version - 1)
+                logger.info(f"Registry changes {self._version + 1}..{version - 1} missed, reloading")
+                await self._reload_all()
+            else:
+                await self._apply(entity, op, event.get("id"), event)
+            if self._version is None or version > self._version:
+                self._version = version
+        except Exception as e:
+            logger.error(f"Failed to apply registry change {entity}/{op}: {e}", exc_info=True)
+
+    async def _apply(self, entity: str, op: str, entity_id: Optional[str], event: dict) -> None:
+        if entity == "parameter_template":
+            if op == "create" and event.get("key"):
+                self.param_cache.forget_unknown(event["key"])
+            else:
+                self.param_cache.invalidate()
+            self._refresh_cadences()
+        elif entity == "device" and op == "delete" and entity_id:
+            self._drop_device(entity_id)
+        elif entity in _DEVICE_PARENTS and op == "delete":
+            await self._prune_devices()
+
+    async def _reload_all(self) -> None:
+        self.param_cache.invalidate()
+        self._refresh_cadences()
+        await self._prune_devices()
+
+    def _refresh_cadences(self) -> None:
+        """Reload declared cadences in the background; a burst of events shares one reload"""
+        if self.gap_detector is None:
+            return
+        if self._cadence_task is None or self._cadence_task.done():
+            self._cadence_task = asyncio.create_task(self.gap_detector.refresh_cadences())
+
+    def _drop_device(self, device_id: str) -> None:
+        if self.aggregate_cache:
+            self.aggregate_cache.invalidate_device(device_id)
+        if self.hot_window:
+            self.hot_window.drop_device(device_id)
+        if self.gap_detector:
+            self.gap_detector.forget_device(device_id)
+
+    async def _prune_devices(self) -> None:
+        """Drop state of tracked devices that no longer exist (one query)"""
+        tracked = set()
+        if self.aggregate_cache:
+            tracked.update(self.aggregate_cache.device_ids())
+        if self.hot_window:
+            tracked.update(self.hot_window.device_ids())
+        if self.gap_detector:
+            tracked.update(self.gap_detector.device_ids())
+        if not tracked:
+            return
+        async with self.session_factory() as session:
+            result = await session.execute(
+                text("SELECT id::text FROM devices WHERE id = ANY(CAST(:ids AS uuid[]))"),
+                {"ids": list(tracked)},
+            )
+            existing = {row[0] for row in result}
+        for device_id in tracked - existing:
+            self._drop_device(device_id)
+        if tracked - existing:
+            logger.info(f"Dropped in-memory state of {len(tracked - existing)} deleted device(s)")
@@ -0,0 +1,70 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import text
+from core.metrics import error_counter
+
+logger = logging.getLogger(__name__)
+
+
+class GroupRollupRefresher:
+    """
+    Scheduled job that rebuilds recent hours of customer_group_rollups.
+
+    Every ROLLUP_GROUP_REFRESH_SECONDS the last ROLLUP_GROUP_LOOKBACK_HOURS
+    hours (including the open one) are recomputed from the per-device rollups
+    in measurements with refresh_group_rollups() (migration 290). Group
+    rollups therefore lag ingest by up to the refresh interval, but concurrent
+    ingest for a customer no longer contends on the group rows. Older hours
+    are rebuilt by the late merger when late rows are merged into them.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.interval = float(os.getenv("ROLLUP_GROUP_REFRESH_SECONDS", "60"))
+        self.lookback = timedelta(hours=float(os.getenv("ROLLUP_GROUP_LOOKBACK_HOURS", "2")))
+        self._task: Optional[asyncio.Task] = None
+        self.running = False
+
+    async def start(self) -> None:
+        """Start the periodic refresh loop"""
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Group rollup refresher started (interval={self.interval}s)")
+
+    async def stop(self) -> None:
+        """Stop the refresh loop; a refresh in progress rolls back"""
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Group rollup refresher stopped")
+
+    async def _run(self) -> None:
+        while self.running:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Group rollup refresh failed: {e}", exc_info=True)
+                error_counter.labels(error_type="rollup_refresh").inc()
+            await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> None:
+        """Recompute the group rollups of the lookback window"""
+        end = datetime.now(timezone.utc)
+        async with self.session_factory() as session:
+            await session.execute(
+                text("SELECT refresh_group_rollups(:start, :end)"),
+                {"start": end - self.lookback, "end": end},
+            )
+            await session.commit()
@@ -1,5 +1,7 @@
+import os
 import json
 import logging
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from uuid import UUID
 from sqlalchemy import text, bindparam
@@ -7,19 +9,71 @@ from sqlalchemy.exc import IntegrityError
 from nats.aio.client import Client as NATS
 from nats.aio.subscription import Subscription
 from core.db import create_sessionmaker
-from core.metrics import ingest_counter, error_counter, queue_depth_gauge
+from core.metrics import ingest_counter, error_counter, queue_depth_gauge, late_rows_counter
+from core.gap_detector import GapDetector
+from core.aggregate_cache import AggregateCache
+from core.hot_window import HotWindowStore
+from core.parameter_cache import ParameterCache
 from api.models import NormalizedEvent
 
 logger = logging.getLogger(__name__)
 
+# Hourly device rollups (migration 220), appended to the ingest upsert as data-modifying CTEs so
+# they commit with the samples. Only rows actually inserted (xmax = 0) are added; an upsert that
+# overwrites a stored value leaves the rollups as they are (refresh_rollups() recomputes a range).
+# Late rows are not added here: the late merger rebuilds the hours it merges into, so a late
+# re-send of a stored sample is not counted twice. Customer-group rollups are rebuilt from these
+# rows by GroupRollupRefresher (migration 290), off the ingest path.
+_ROLLUP_STATEMENT = """
+    WITH written AS (
+        {upsert}
+        RETURNING parameter_id, value, (xmax = 0) AS inserted
+    )
+    INSERT INTO measurements (
+        time, device_id, parameter_key, agg_interval,
+        value_sum, value_avg, value_min, value_max, value_count
+    )
+    SELECT time_bucket(INTERVAL '1 hour', CAST(:time AS timestamptz)), CAST(:device_id AS uuid),
+           pt.key, '1h', w.value, w.value, w.value, w.value, 1
+    FROM written w
+    JOIN parameter_templates pt ON pt.param_id = w.parameter_id
+    WHERE w.inserted AND w.value IS NOT NULL
+    ON CONFLICT (device_id, parameter_key, agg_interval, time)
+    DO UPDATE SET
+        value_sum = measurements.value_sum + EXCLUDED.value_sum,
+        value_count = measurements.value_count + EXCLUDED.value_count,
+        value_avg = (measurements.value_sum + EXCLUDED.value_sum)
+                    / (measurements.value_count + EXCLUDED.value_count),
+        value_min = LEAST(measurements.value_min, EXCLUDED.value_min),
+        value_max = GREATEST(measurements.value_max, EXCLUDED.value_max),
+        updated_at = NOW()
+"""
+
 
 class IngestWorker:
     """Async worker to consume events from NATS and write to database"""
     
-    def __init__(self, nc: NATS, session_factory, subject: str = "ingress.events"):
+    def __init__(
+        self,
+        nc: NATS,
+        session_factory,
+        subject: str = "ingress.events",
+        gap_detector: Optional[GapDetector] = None,
+        aggregate_cache: Optional[AggregateCache] = None,
+        hot_window: Optional[HotWindowStore] = None,
+    ):
         self.nc = nc
         self.session_factory = session_factory
         self.subject = subject
+        self.gap_detector = gap_detector
+        self.aggregate_cache = aggregate_cache
+        self.hot_window = hot_window
+        self.param_cache = ParameterCache()
+        # Rows older than this go to ingest_events_late instead of (possibly compressed) chunks;
+        # keep in line with the add_compression_policy interval (7 days)
+        self.late_horizon = timedelta(hours=float(os.getenv("LATE_ARRIVAL_HORIZON_HOURS", "168")))
+        # Maintain hourly device rollups in the ingest transaction
+        self.rollups_enabled = os.getenv("ROLLUPS_ENABLED", "true").lower() == "true"
         self.subscription: Optional[Subscription] = None
         self.running = False
     
@@ -66,49 +120,101 @@ class IngestWorker:
     
     async def _process_event(self, event: NormalizedEvent, trace_id: str) -> None:
         """Process a single event and insert into database"""
+        # One row per parameter; a repeated parameter_key within an event keeps the last value
+        metrics = {metric.parameter_key: metric for metric in event.metrics}
+        
+        # Late data is written to the uncompressed side table and merged per chunk later
+        source_ts = event.source_timestamp
+        if source_ts.tzinfo is None:
+            source_ts = source_ts.replace(tzinfo=timezone.utc)
+        is_late = source_ts < datetime.now(timezone.utc) - self.late_horizon
+        table = "ingest_events_late" if is_late else "ingest_events_compact"
+        
         async with self.session_factory() as session:
             try:
-                # Insert each metric as a separate row in ingest_events
-                for metric in event.metrics:
+                param_ids = await self.param_cache.resolve(metrics.keys(), session)
+                unknown = [key for key in metrics if key not in param_ids]
+                if unknown:
+                    # Same outcome as the former FK violation: reject the whole event
+                    logger.warning(f"Unknown parameter_key(s) for trace_id={trace_id}: {unknown}")
+                    error_counter.labels(error_type="integrity").inc()
+                    return
+                
+                ids, values, qualities, event_ids, attributes = [], [], [], [], []
+                for key, metric in metrics.items():
                     # Generate unique event_id per metric for idempotency
                     # If event.event_id is provided, append parameter_key to make it unique per metric
                     if event.event_id:
-                        event_id = f"{event.event_id}:{metric.parameter_key}"
+                        event_id = f"{event.event_id}:{key}"
                     else:
-                        event_id = f"{event.device_id}:{event.source_timestamp.isoformat()}:{metric.parameter_key}"
-                    
-                    # Use ON CONFLICT to handle idempotency
-                    # PostgreSQL will use the unique constraint on (time, device_id, parameter_key)
-                    insert_stmt = text("""
-                        INSERT INTO ingest_events (
-                            time, device_id, parameter_key, value, quality, 
+                        event_id = f"{event.device_id}:{event.source_timestamp.isoformat()}:{key}"
+                    ids.append(param_ids[key])
+                    values.append(metric.value)
+                    qualities.append(metric.quality)
+                    event_ids.append(event_id)
+                    # Empty attributes are stored as NULL (see migration 180)
+                    attributes.append(json.dumps(metric.attributes) if metric.attributes else None)
+                
+                # All metrics of the event in one statement
+                # ON CONFLICT uses the primary key (time, device_id, parameter_id) for idempotency;
+                # an updated value takes a new ingest_seq so the change feed reports it again
+                upsert = f"""
+                        INSERT INTO {table} (
+                            time, device_id, parameter_id, value, quality,
                             source, event_id, attributes, created_at
-                        ) VALUES (
-                            :time, CAST(:device_id AS uuid), :parameter_key, :value, :quality,
-                            :source, :event_id, CAST(:attributes AS jsonb), NOW()
                         )
-                        ON CONFLICT (time, device_id, parameter_key) 
+                        SELECT :time, CAST(:device_id AS uuid), m.parameter_id, m.value, m.quality,
+                               :source, m.event_id, m.attributes, NOW()
+                        FROM unnest(
+                            CAST(:parameter_ids AS integer[]), CAST(:values AS double precision[]),
+                            CAST(:qualities AS smallint[]), CAST(:event_ids AS text[]), CAST(:attributes AS jsonb[])
+                        ) AS m(parameter_id, value, quality, event_id, attributes)
+                        -- Takes the transaction id before any ingest_seq is drawn (change feed horizon)
+                        WHERE pg_current_xact_id() IS NOT NULL
+                        ON CONFLICT (time, device_id, parameter_id)
                         DO UPDATE SET
                             value = EXCLUDED.value,
                             quality = EXCLUDED.quality,
                             source = EXCLUDED.source,
                             event_id = EXCLUDED.event_id,
-                            attributes = EXCLUDED.attributes
-                    """)
-                    
-                    await session.execute(insert_stmt, {
+                            attributes = EXCLUDED.attributes,
+                            ingest_seq = nextval('ingest_events_seq')
+                """
+                if self.rollups_enabled and not is_late:
+                    upsert = _ROLLUP_STATEMENT.format(upsert=upsert)
+                await session.execute(
+                    text(upsert),
+                    {
                         "time": event.source_timestamp,
                         "device_id": event.device_id,
-                        "parameter_key": metric.parameter_key,
-                        "value": metric.value,
-                        "quality": metric.quality,
                         "source": event.protocol,
-                        "event_id": event_id,
-                        "attributes": json.dumps(metric.attributes or {})
-                    })
+                        "parameter_ids": ids,
+                        "values": values,
+                        "qualities": qualities,
+                        "event_ids": event_ids,
+                        "attributes": attributes,
+                    },
+                )
                 
                 await session.commit()
                 ingest_counter.labels(status="success").inc()
+                if is_late:
+                    late_rows_counter.inc(len(ids))
+                
+                # Cached aggregates covering this time are now stale (usually the open bucket)
+                if self.aggregate_cache:
+                    self.aggregate_cache.invalidate(str(UUID(event.device_id)), source_ts)
+                
+                # Recent samples are also kept in memory for recent-window reads
+                if self.hot_window and not is_late:
+                    device_key = str(UUID(event.device_id))
+                    for key, metric in metrics.items():
+                        self.hot_window.add(device_key, key, source_ts, metric.value, metric.quality)
+                
+                # Feed committed samples to gap detection (in-memory, O(1) per metric)
+                if self.gap_detector:
+                    for key in metrics:
+                        self.gap_detector.observe(event.device_id, key, event.source_timestamp)
                 logger.debug(f"Event processed: trace_id={trace_id}, device_id={event.device_id}")
                 
             except IntegrityError as e:
@@ -121,4 +227,3 @@ class IngestWorker:
                 logger.error(f"Error processing event trace_id={trace_id}: {e}", exc_info=True)
                 error_counter.labels(error_type="database").inc()
                 raise
-
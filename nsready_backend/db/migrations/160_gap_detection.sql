@@ -0,0 +1,11 @@
+-- Gap detection: the collector's GapDetector writes and extends missing_intervals rows.
+-- An interval is identified by its series and start_time (the last timestamp seen before
+-- the gap), so an open gap can be extended in place with ON CONFLICT ... DO UPDATE.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_missing_intervals_series_start
+  ON missing_intervals (device_id, parameter_key, start_time);
+
+-- Expected reporting cadence can be declared per parameter template:
+--   metadata->>'expected_interval_seconds'  (e.g. '60' for a once-a-minute meter)
+-- Parameters without it fall back to a cadence learned from recent arrivals.
+COMMENT ON TABLE missing_intervals IS
+  'Data gaps per device/parameter, populated by the collector gap detector. start_time = last sample before the gap, end_time = first sample after it (or now() while the gap is open).';
@@ -0,0 +1,35 @@
+-- Parquet archive tier: index of ingest_events data exported before the 90-day retention drop.
+-- The collector's ChunkArchiver writes one Parquet file per project/device/day for each chunk
+-- and records it here; archive queries use this index to find files without listing storage.
+
+-- One row per archived hypertable chunk (a chunk is archived once, then left to retention)
+CREATE TABLE IF NOT EXISTS archived_chunks (
+    chunk_name TEXT PRIMARY KEY,
+    range_start TIMESTAMPTZ NOT NULL,
+    range_end TIMESTAMPTZ NOT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- One row per Parquet file (partition = project/device/day within a chunk)
+CREATE TABLE IF NOT EXISTS archived_partitions (
+    id BIGSERIAL PRIMARY KEY,
+    chunk_name TEXT NOT NULL,
+    project_id UUID NOT NULL,
+    device_id UUID NOT NULL,
+    day DATE NOT NULL,
+    path TEXT NOT NULL,
+    min_time TIMESTAMPTZ NOT NULL,
+    max_time TIMESTAMPTZ NOT NULL,
+    row_count BIGINT NOT NULL,
+    size_bytes BIGINT,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (chunk_name, device_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_archived_partitions_device_time
+  ON archived_partitions (device_id, min_time, max_time);
+
+CREATE INDEX IF NOT EXISTS idx_archived_partitions_project_day
+  ON archived_partitions (project_id, day);
@@ -0,0 +1,123 @@
+-- Compact telemetry rows: integer parameter ids and NULL (instead of '{}') attributes.
+--
+-- Physical storage moves to the ingest_events_compact hypertable:
+--   - parameter_key TEXT (~50 bytes, 'project:<uuid>:<name>') becomes parameter_id INTEGER
+--     referencing parameter_templates(param_id), shrinking rows, indexes and FK checks
+--   - attributes is NULL when empty instead of a '{}' JSONB value on every row
+--   - fixed-width columns are ordered to avoid alignment padding
+-- ingest_events becomes a view with the original columns, so the contract in
+-- shared/contracts/nsready/ingest_events.yaml and all readers keep working unchanged.
+-- Writers (collector worker) insert into ingest_events_compact.
+
+-- 1. Surrogate key on parameter_templates
+ALTER TABLE parameter_templates
+ADD COLUMN IF NOT EXISTS param_id INTEGER GENERATED BY DEFAULT AS IDENTITY;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_parameter_templates_param_id
+  ON parameter_templates(param_id);
+
+-- 2. Compact hypertable
+CREATE TABLE IF NOT EXISTS ingest_events_compact (
+    time TIMESTAMPTZ NOT NULL,
+    device_id UUID NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    value DOUBLE PRECISION,
+    parameter_id INTEGER NOT NULL REFERENCES parameter_templates(param_id) ON DELETE RESTRICT,
+    quality SMALLINT NOT NULL DEFAULT 0,
+    source TEXT,
+    event_id TEXT, -- optional idempotency key from source
+    attributes JSONB, -- NULL when the source sent no attributes
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (time, device_id, parameter_id)
+);
+
+SELECT create_hypertable('ingest_events_compact', by_range('time'), if_not_exists => TRUE);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_events_compact_device_param_time_desc
+  ON ingest_events_compact (device_id, parameter_id, time DESC);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ingest_events_compact_event_id
+  ON ingest_events_compact (time, event_id)
+  WHERE event_id IS NOT NULL;
+
+-- 3. Move existing rows and retire the wide table. The block always runs, since migration 110
+-- creates ingest_events; on a fresh database the table is empty, so it only drops it.
+-- Rows are copied one day at a time, each in its own transaction, so an upgrade never holds one
+-- huge transaction (WAL, locks, bloat) over the whole history. This needs the file to run outside
+-- an explicit transaction block, as docker-entrypoint-initdb.d and psql -f do. If the copy is
+-- interrupted, rerunning the migration resumes it: copied rows are skipped by ON CONFLICT.
+DO $$
+DECLARE
+  batch_start TIMESTAMPTZ;
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_class WHERE relname = 'ingest_events' AND relkind = 'r') THEN
+    RETURN;
+  END IF;
+
+  FOR batch_start IN
+    SELECT generate_series(
+      date_trunc('day', min(time)), max(time), INTERVAL '1 day'
+    ) FROM ingest_events
+  LOOP
+    INSERT INTO ingest_events_compact (time, device_id, value, parameter_id, quality, source, event_id, attributes, created_at)
+    SELECT e.time, e.device_id, e.value, pt.param_id, e.quality, e.source, e.event_id,
+           NULLIF(e.attributes, '{}'::jsonb), e.created_at
+    FROM ingest_events e
+    JOIN parameter_templates pt ON pt.key = e.parameter_key
+    WHERE e.time >= batch_start AND e.time < batch_start + INTERVAL '1 day'
+    ON CONFLICT DO NOTHING;
+    COMMIT;
+  END LOOP;
+
+  DROP VIEW IF EXISTS v_scada_latest;
+  DROP VIEW IF EXISTS v_scada_history;
+  -- Dropping the hypertable also removes its chunks and compression/retention jobs
+  DROP TABLE ingest_events;
+END $$;
+
+-- 4. Compression and retention (same policies as migration 120)
+ALTER TABLE ingest_events_compact SET (
+  timescaledb.compress = true,
+  timescaledb.compress_segmentby = 'device_id,parameter_id'
+);
+
+SELECT add_compression_policy('ingest_events_compact', INTERVAL '7 days', if_not_exists => TRUE);
+SELECT add_retention_policy('ingest_events_compact', INTERVAL '90 days', if_not_exists => TRUE);
+
+-- 5. Compatibility view with the contract's columns
+CREATE OR REPLACE VIEW ingest_events AS
+SELECT
+  e.time,
+  e.device_id,
+  pt.key AS parameter_key,
+  e.value,
+  e.quality,
+  e.source,
+  e.event_id,
+  COALESCE(e.attributes, '{}'::jsonb) AS attributes,
+  e.created_at
+FROM ingest_events_compact e
+JOIN parameter_templates pt ON pt.param_id = e.parameter_id;
+
+COMMENT ON VIEW ingest_events IS
+  'Compatibility view over ingest_events_compact with the contract columns (parameter_key TEXT, attributes JSONB). Write to ingest_events_compact.';
+
+-- 6. SCADA views (definitions unchanged from migration 130)
+CREATE OR REPLACE VIEW v_scada_latest AS
+WITH ranked AS (
+  SELECT
+    device_id,
+    parameter_key,
+    time,
+    value,
+    quality,
+    ROW_NUMBER() OVER (PARTITION BY device_id, parameter_key ORDER BY time DESC) AS rn
+  FROM ingest_events
+)
+SELECT device_id, parameter_key, time, value, quality
+FROM ranked
+WHERE rn = 1;
+
+CREATE OR REPLACE VIEW v_scada_history AS
+SELECT
+  time, device_id, parameter_key, value, quality, source
+FROM ingest_events;
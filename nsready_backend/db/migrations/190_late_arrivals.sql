@@ -0,0 +1,41 @@
+-- Late / out-of-order telemetry: side table for rows older than the compression horizon.
+--
+-- Chunks older than 7 days are compressed (migration 180). Inserting into them row by row is slow
+-- and triggers decompress/recompress work on the live ingest path, e.g. when SMS loggers come back
+-- online after a week. The collector worker therefore writes rows older than the horizon into this
+-- uncompressed table, and its LateArrivalMerger moves them into ingest_events_compact in bulk,
+-- once per affected chunk.
+CREATE TABLE IF NOT EXISTS ingest_events_late (
+    time TIMESTAMPTZ NOT NULL,
+    device_id UUID NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    value DOUBLE PRECISION,
+    parameter_id INTEGER NOT NULL REFERENCES parameter_templates(param_id) ON DELETE RESTRICT,
+    quality SMALLINT NOT NULL DEFAULT 0,
+    source TEXT,
+    event_id TEXT,
+    attributes JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (time, device_id, parameter_id)
+);
+
+-- Readers see late rows immediately. A late row that re-sends an already stored
+-- (time, device_id, parameter_key) appears twice until the next merge replaces the stored value.
+CREATE OR REPLACE VIEW ingest_events AS
+SELECT
+  e.time,
+  e.device_id,
+  pt.key AS parameter_key,
+  e.value,
+  e.quality,
+  e.source,
+  e.event_id,
+  COALESCE(e.attributes, '{}'::jsonb) AS attributes,
+  e.created_at
+FROM (
+  SELECT time, device_id, value, parameter_id, quality, source, event_id, attributes, created_at
+  FROM ingest_events_compact
+  UNION ALL
+  SELECT time, device_id, value, parameter_id, quality, source, event_id, attributes, created_at
+  FROM ingest_events_late
+) e
+JOIN parameter_templates pt ON pt.param_id = e.parameter_id;
@@ -0,0 +1,44 @@
+-- Hypertable layout for ingest_events_compact: chunk interval, optional space partitioning,
+-- and explicit compression ordering.
+--
+-- Settings are read from custom GUCs so they can be chosen per deployment without editing SQL,
+-- e.g. for the docker-entrypoint run:  PGOPTIONS="-c nsready.chunk_time_interval=12h -c nsready.space_partitions=4"
+--   nsready.chunk_time_interval  chunk width (default '1 day'; TimescaleDB's default is 7 days)
+--   nsready.space_partitions     hash partitions on device_id (default 0 = time partitioning only)
+-- Use nsready_backend/tests/benchmarks/bench_hypertable_layouts.py to compare layouts before changing them.
+
+DO $$
+DECLARE
+  chunk_interval INTERVAL := COALESCE(NULLIF(current_setting('nsready.chunk_time_interval', true), ''), '1 day')::interval;
+  space_partitions INTEGER := COALESCE(NULLIF(current_setting('nsready.space_partitions', true), ''), '0')::integer;
+BEGIN
+  -- Applies to chunks created from now on; existing chunks keep their width
+  PERFORM set_chunk_time_interval('ingest_events_compact', chunk_interval);
+
+  IF space_partitions > 1 AND NOT EXISTS (
+    SELECT 1 FROM timescaledb_information.dimensions
+    WHERE hypertable_name = 'ingest_events_compact' AND column_name = 'device_id'
+  ) THEN
+    -- add_dimension() only works on an empty hypertable
+    IF EXISTS (SELECT 1 FROM ingest_events_compact LIMIT 1) THEN
+      RAISE NOTICE 'ingest_events_compact has data; skipping hash partitioning on device_id';
+    ELSE
+      PERFORM add_dimension('ingest_events_compact', by_hash('device_id', space_partitions));
+    END IF;
+  END IF;
+
+  -- Rows of a segment (device_id, parameter_id) are stored newest first, which is the order of
+  -- latest-value and recent-history queries. Compression settings cannot change while compressed
+  -- chunks exist.
+  IF EXISTS (
+    SELECT 1 FROM timescaledb_information.chunks
+    WHERE hypertable_name = 'ingest_events_compact' AND is_compressed
+  ) THEN
+    RAISE NOTICE 'ingest_events_compact has compressed chunks; leaving compress_orderby unchanged';
+  ELSE
+    ALTER TABLE ingest_events_compact SET (
+      timescaledb.compress_segmentby = 'device_id,parameter_id',
+      timescaledb.compress_orderby = 'time DESC'
+    );
+  END IF;
+END $$;
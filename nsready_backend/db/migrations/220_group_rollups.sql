@@ -0,0 +1,72 @@
+-- Hourly rollups maintained incrementally by the collector worker:
+--   measurements            per device and parameter (table from migration 110, now populated)
+--   customer_group_rollups  per customer group (customers.parent_customer_id, migration 150)
+--
+-- A group is COALESCE(parent_customer_id, id): child companies roll up into their parent
+-- (e.g. Allidhra Textool and Texpin into Allidhra Group), top-level customers into themselves.
+-- Rows keep the contributing customer_id so a group report can be split by company.
+-- value_sum / value_count make averages additive across increments and across children.
+--
+-- The worker adds each newly inserted sample once. Re-sent samples that overwrite a stored
+-- value are not re-aggregated; run refresh_rollups(start, end) to recompute a range from raw data.
+
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS value_sum DOUBLE PRECISION;
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_measurements_series_interval_time
+  ON measurements (device_id, parameter_key, agg_interval, time);
+
+CREATE TABLE IF NOT EXISTS customer_group_rollups (
+    group_customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    parameter_name TEXT NOT NULL, -- parameter_templates.name; keys are project-specific
+    agg_interval TEXT NOT NULL,   -- '1h'
+    time TIMESTAMPTZ NOT NULL,
+    value_sum DOUBLE PRECISION NOT NULL,
+    value_count BIGINT NOT NULL,
+    value_min DOUBLE PRECISION,
+    value_max DOUBLE PRECISION,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (group_customer_id, agg_interval, parameter_name, time, customer_id)
+);
+
+COMMENT ON TABLE customer_group_rollups IS
+  'Hourly telemetry rollups per customer group (COALESCE(parent_customer_id, id)), maintained by the collector worker';
+
+-- Recompute both rollup tables for [p_start, p_end) from raw telemetry (whole hours)
+CREATE OR REPLACE FUNCTION refresh_rollups(p_start TIMESTAMPTZ, p_end TIMESTAMPTZ)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  range_start TIMESTAMPTZ := time_bucket(INTERVAL '1 hour', p_start);
+  range_end TIMESTAMPTZ := time_bucket(INTERVAL '1 hour', p_end - INTERVAL '1 microsecond') + INTERVAL '1 hour';
+BEGIN
+  DELETE FROM measurements
+  WHERE agg_interval = '1h' AND time >= range_start AND time < range_end;
+
+  INSERT INTO measurements (time, device_id, parameter_key, agg_interval,
+                            value_sum, value_avg, value_min, value_max, value_count)
+  SELECT time_bucket(INTERVAL '1 hour', e.time), e.device_id, e.parameter_key, '1h',
+         sum(e.value), avg(e.value), min(e.value), max(e.value), count(e.value)
+  FROM ingest_events e
+  WHERE e.time >= range_start AND e.time < range_end AND e.value IS NOT NULL
+  GROUP BY 1, 2, 3;
+
+  DELETE FROM customer_group_rollups
+  WHERE agg_interval = '1h' AND time >= range_start AND time < range_end;
+
+  INSERT INTO customer_group_rollups (group_customer_id, customer_id, parameter_name, agg_interval, time,
+                                      value_sum, value_count, value_min, value_max)
+  SELECT COALESCE(c.parent_customer_id, c.id), c.id, pt.name, '1h', m.time,
+         sum(m.value_sum), sum(m.value_count), min(m.value_min), max(m.value_max)
+  FROM measurements m
+  JOIN parameter_templates pt ON pt.key = m.parameter_key
+  JOIN devices d ON d.id = m.device_id
+  JOIN sites s ON s.id = d.site_id
+  JOIN projects p ON p.id = s.project_id
+  JOIN customers c ON c.id = p.customer_id
+  WHERE m.agg_interval = '1h' AND m.time >= range_start AND m.time < range_end
+  GROUP BY 1, 2, 3, 4, 5;
+END;
+$$;
@@ -0,0 +1,42 @@
+-- Registry change notifications for in-process caches.
+--
+-- Moving or deleting a device, site, project or customer sends
+--   NOTIFY registry_changes, '<kind>:<id>'
+-- The admin tool listens and drops the resource from its tenant ownership index
+-- (device → site → project → customer). Inserts are not sent: absence is never cached.
+-- Cascaded deletes fire the row triggers of each deleted child as well.
+
+CREATE OR REPLACE FUNCTION notify_registry_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  -- TG_ARGV[0] is the resource kind
+  PERFORM pg_notify('registry_changes', TG_ARGV[0] || ':' || OLD.id::text);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_devices_registry_change ON devices;
+CREATE TRIGGER trg_devices_registry_change
+  AFTER UPDATE OF site_id OR DELETE ON devices
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_registry_change('device');
+
+DROP TRIGGER IF EXISTS trg_sites_registry_change ON sites;
+CREATE TRIGGER trg_sites_registry_change
+  AFTER UPDATE OF project_id OR DELETE ON sites
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_registry_change('site');
+
+DROP TRIGGER IF EXISTS trg_projects_registry_change ON projects;
+CREATE TRIGGER trg_projects_registry_change
+  AFTER UPDATE OF customer_id OR DELETE ON projects
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_registry_change('project');
+
+DROP TRIGGER IF EXISTS trg_customers_registry_change ON customers;
+CREATE TRIGGER trg_customers_registry_change
+  AFTER DELETE ON customers
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_registry_change('customer');
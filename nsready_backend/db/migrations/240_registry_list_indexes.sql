@@ -0,0 +1,29 @@
+-- Keyset pagination and filters of the admin list endpoints.
+--
+-- Lists are ordered by (created_at DESC, id DESC) and continue after the cursor row with
+--   WHERE (created_at, id) < (:cursor_created_at, :cursor_id)
+-- so each page is an index range scan whatever its position. Filtered lists use an index
+-- led by the filter column; it also serves the foreign-key lookups of the single-column
+-- indexes from 100_core_registry.sql, which are dropped.
+-- text_pattern_ops indexes serve the name/key prefix filters (LIKE 'prefix%') under any collation.
+
+CREATE INDEX IF NOT EXISTS idx_customers_created_id ON customers (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_customers_name_pattern ON customers (name text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_projects_created_id ON projects (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_projects_customer_created_id ON projects (customer_id, created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_projects_customer;
+
+CREATE INDEX IF NOT EXISTS idx_sites_created_id ON sites (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_sites_project_created_id ON sites (project_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_sites_name_pattern ON sites (name text_pattern_ops);
+DROP INDEX IF EXISTS idx_sites_project;
+
+CREATE INDEX IF NOT EXISTS idx_devices_created_id ON devices (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_devices_site_created_id ON devices (site_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_devices_status_type_created_id ON devices (status, device_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_devices_name_pattern ON devices (name text_pattern_ops);
+DROP INDEX IF EXISTS idx_devices_site;
+
+CREATE INDEX IF NOT EXISTS idx_parameter_templates_created_id ON parameter_templates (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_parameter_templates_key_pattern ON parameter_templates (key text_pattern_ops);
@@ -0,0 +1,24 @@
+-- Parameter template change notifications for the collector's key cache.
+--
+-- Any statement that inserts, updates or deletes parameter_templates sends
+--   NOTIFY parameter_templates_changed
+-- once (statement-level trigger, and identical notifications within a transaction are
+-- delivered once), so a batch upsert of thousands of templates causes one cache reload
+-- in each collector instead of one per row. New keys are usable at once instead of after
+-- PARAM_CACHE_NEGATIVE_TTL_SECONDS.
+
+CREATE OR REPLACE FUNCTION notify_parameter_templates_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  PERFORM pg_notify('parameter_templates_changed', '');
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_parameter_templates_changed ON parameter_templates;
+CREATE TRIGGER trg_parameter_templates_changed
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON parameter_templates
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION notify_parameter_templates_changed();
@@ -0,0 +1,16 @@
+-- Registry change version for the change events the admin tool publishes on NATS
+-- (subjects registry.changes.<entity>).
+--
+-- Every admin transaction that changes customers, projects, sites, devices or
+-- parameter templates increments the single row of registry_change_version and puts
+-- the new value in its events. Versions therefore increase by one per committed
+-- change, and a subscriber that sees a jump knows it missed events and reloads.
+-- The row lock also orders events by commit: the next writer waits for the commit.
+
+CREATE TABLE IF NOT EXISTS registry_change_version (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO registry_change_version (id, version) VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,16 @@
+-- Device search (GET /admin/devices/search).
+--
+-- Substring and case-insensitive prefix matches on name or external_id
+--   WHERE d.name ILIKE '%abc%' OR d.external_id ILIKE '%abc%'
+-- are served by trigram GIN indexes (a BitmapOr of the two), so a lookup reads only
+-- candidate rows instead of scanning the fleet. Patterns need 3 characters for a
+-- selective trigram; the endpoint enforces that for substring search.
+-- status filters use idx_devices_status_type_created_id (migration 240); device_type
+-- on its own gets a btree led by that column. external_id equality keeps using its
+-- unique index.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_devices_name_trgm ON devices USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_devices_external_id_trgm ON devices USING gin (external_id gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_devices_type_created_id ON devices (device_type, created_at DESC, id DESC);
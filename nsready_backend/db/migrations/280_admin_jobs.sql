@@ -0,0 +1,40 @@
+-- Background jobs of the admin tool (/admin/jobs): registry imports, template imports and
+-- exports, and version publishes that would outlive a proxy timeout when run inline.
+--
+-- A submitted job is a 'queued' row holding its parameters and uploaded body (input).
+-- Workers of any admin instance claim queued rows, one tenant (customer_id; NULL for
+-- engineer/admin jobs) at most JOB_TENANT_CONCURRENCY at a time, and report progress,
+-- a heartbeat, and finally the result (or error) here. Rows survive restarts: a running
+-- job whose heartbeat stops is queued again, up to JOB_MAX_ATTEMPTS.
+
+CREATE TABLE IF NOT EXISTS admin_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    kind TEXT NOT NULL,
+    customer_id UUID REFERENCES customers(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+    params JSONB NOT NULL DEFAULT '{}'::jsonb,
+    input BYTEA,
+    progress JSONB NOT NULL DEFAULT '{}'::jsonb,
+    result JSONB,
+    output BYTEA,
+    output_type TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    worker TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+-- Claiming (oldest queued first) and stale-heartbeat recovery touch only unfinished jobs
+CREATE INDEX IF NOT EXISTS idx_admin_jobs_unfinished ON admin_jobs (status, created_at)
+    WHERE status IN ('queued', 'running');
+-- Job listing per tenant, newest first (keyset as the registry lists)
+CREATE INDEX IF NOT EXISTS idx_admin_jobs_customer_created_id ON admin_jobs (customer_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_admin_jobs_created_id ON admin_jobs (created_at DESC, id DESC);
+-- Retention cleanup of finished jobs
+CREATE INDEX IF NOT EXISTS idx_admin_jobs_finished ON admin_jobs (finished_at) WHERE finished_at IS NOT NULL;
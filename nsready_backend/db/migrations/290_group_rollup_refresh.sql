@@ -0,0 +1,60 @@
+-- Customer-group rollups are no longer upserted by the ingest statement: every device of a
+-- customer wrote the same (group, customer, parameter_name, hour) row, serializing concurrent
+-- ingest on its lock. The collector now rebuilds recent hours of customer_group_rollups from
+-- the per-device rollups in measurements (ROLLUP_GROUP_REFRESH_SECONDS), and the late merger
+-- rebuilds the hours it merged into.
+
+-- Recompute customer_group_rollups for [p_start, p_end) from measurements (whole hours).
+-- Refreshes are serialized: concurrent callers (collector instances, late merger) would
+-- otherwise insert the same keys.
+CREATE OR REPLACE FUNCTION refresh_group_rollups(p_start TIMESTAMPTZ, p_end TIMESTAMPTZ)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  range_start TIMESTAMPTZ := time_bucket(INTERVAL '1 hour', p_start);
+  range_end TIMESTAMPTZ := time_bucket(INTERVAL '1 hour', p_end - INTERVAL '1 microsecond') + INTERVAL '1 hour';
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('refresh_group_rollups'));
+
+  DELETE FROM customer_group_rollups
+  WHERE agg_interval = '1h' AND time >= range_start AND time < range_end;
+
+  INSERT INTO customer_group_rollups (group_customer_id, customer_id, parameter_name, agg_interval, time,
+                                      value_sum, value_count, value_min, value_max)
+  SELECT COALESCE(c.parent_customer_id, c.id), c.id, pt.name, '1h', m.time,
+         sum(m.value_sum), sum(m.value_count), min(m.value_min), max(m.value_max)
+  FROM measurements m
+  JOIN parameter_templates pt ON pt.key = m.parameter_key
+  JOIN devices d ON d.id = m.device_id
+  JOIN sites s ON s.id = d.site_id
+  JOIN projects p ON p.id = s.project_id
+  JOIN customers c ON c.id = p.customer_id
+  WHERE m.agg_interval = '1h' AND m.time >= range_start AND m.time < range_end
+  GROUP BY 1, 2, 3, 4, 5;
+END;
+$$;
+
+-- Recompute both rollup tables for [p_start, p_end) from raw telemetry (whole hours)
+CREATE OR REPLACE FUNCTION refresh_rollups(p_start TIMESTAMPTZ, p_end TIMESTAMPTZ)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  range_start TIMESTAMPTZ := time_bucket(INTERVAL '1 hour', p_start);
+  range_end TIMESTAMPTZ := time_bucket(INTERVAL '1 hour', p_end - INTERVAL '1 microsecond') + INTERVAL '1 hour';
+BEGIN
+  DELETE FROM measurements
+  WHERE agg_interval = '1h' AND time >= range_start AND time < range_end;
+
+  INSERT INTO measurements (time, device_id, parameter_key, agg_interval,
+                            value_sum, value_avg, value_min, value_max, value_count)
+  SELECT time_bucket(INTERVAL '1 hour', e.time), e.device_id, e.parameter_key, '1h',
+         sum(e.value), avg(e.value), min(e.value), max(e.value), count(e.value)
+  FROM ingest_events e
+  WHERE e.time >= range_start AND e.time < range_end AND e.value IS NOT NULL
+  GROUP BY 1, 2, 3;
+
+  PERFORM refresh_group_rollups(range_start, range_end);
+END;
+$$;
@@ -0,0 +1,9 @@
+-- Late rows merged into a chunk after it was archived were missing from its Parquet files.
+-- The late merger now counts its merges into archived chunks (late_merges); the archiver
+-- re-archives a chunk while late_merges is ahead of the count its files include
+-- (archived_merges), rewriting the chunk's files in place before retention drops it.
+ALTER TABLE archived_chunks ADD COLUMN IF NOT EXISTS late_merges INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE archived_chunks ADD COLUMN IF NOT EXISTS archived_merges INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_archived_chunks_stale
+  ON archived_chunks (chunk_name) WHERE late_merges > archived_merges;
@@ -0,0 +1,5 @@
+-- Parameter templates belong to a project by key prefix (project:<id>:...) or by
+-- metadata.project_id; registry snapshots and the template export test both. The key branch
+-- uses idx_parameter_templates_key_pattern (migration 240); this index serves the other one.
+CREATE INDEX IF NOT EXISTS idx_parameter_templates_metadata_project
+  ON parameter_templates ((metadata->>'project_id'));
@@ -0,0 +1,10 @@
+-- File results of admin jobs (e.g. the parameter template export CSV) were built in memory and
+-- stored whole in admin_jobs.output. Jobs now append them here in chunks of at most
+-- JOB_OUTPUT_CHUNK_BYTES as they are produced, and GET /admin/jobs/{id}/output streams the chunks
+-- back in seq order. admin_jobs.output is only read for jobs finished before this migration.
+CREATE TABLE IF NOT EXISTS admin_job_output_chunks (
+    job_id UUID NOT NULL REFERENCES admin_jobs(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
@@ -0,0 +1,134 @@
+"""Benchmark: JSON serialization of a 10k-row GET /admin/devices response.
+
+Fetches the list_devices SELECT from a scratch devices table and serializes the
+rows the three ways the admin tool has done it:
+- one DeviceOut per row, then FastAPI's response_model pass (dump, validate,
+  serialize to JSON-able objects, json.dumps)
+- plain dict rows through the response_model pass
+- orjson straight from the rows (admin_tool/core/serialization.py, current)
+All three outputs are checked to decode to the same JSON. The query time is
+shown for scale.
+
+Usage (from repo root, database from docker compose running; needs the admin
+tool requirements):
+    python nsready_backend/tests/benchmarks/bench_admin_serialization.py --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "admin_tool"))
+
+from pydantic import TypeAdapter
+
+from common import connect, print_table, reset_schema
+from api.models import DeviceOut
+from core.serialization import dumps_rows
+
+SCHEMA = "bench_admin_serialization"
+
+DDL = f"""
+    CREATE TABLE {SCHEMA}.devices (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        site_id UUID NOT NULL,
+        name TEXT NOT NULL,
+        device_type TEXT NOT NULL,
+        external_id TEXT UNIQUE,
+        status TEXT NOT NULL DEFAULT 'active',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE INDEX ON {SCHEMA}.devices (created_at DESC, id DESC);
+"""
+
+FILL = f"""
+    INSERT INTO {SCHEMA}.devices (site_id, name, device_type, external_id, status, created_at)
+    SELECT gen_random_uuid(), 'Device ' || n, 'sensor', 'DEV-' || n,
+           CASE WHEN n % 10 = 0 THEN 'inactive' ELSE 'active' END,
+           NOW() - n * INTERVAL '1 second'
+    FROM generate_series(1, $1) AS n
+"""
+
+# Same columns and order as list_devices
+SELECT = f"""
+    SELECT d.id::text, d.site_id::text AS site_id, d.name, d.device_type, d.external_id, d.status, d.created_at
+    FROM {SCHEMA}.devices d
+    ORDER BY d.created_at DESC, d.id DESC
+"""
+
+ADAPTER = TypeAdapter(list[DeviceOut])
+
+
+def response_model_pass(content: list) -> bytes:
+    """What FastAPI does with a list[DeviceOut] response_model and the default JSONResponse"""
+    value = ADAPTER.validate_python(content)
+    data = ADAPTER.dump_python(value, mode="json")
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def models_per_row(rows: list) -> bytes:
+    models = [DeviceOut(**row) for row in rows]
+    return response_model_pass([m.model_dump() for m in models])
+
+
+def dict_rows(rows: list) -> bytes:
+    return response_model_pass(rows)
+
+
+def measure(fn, rows: list, repeat: int) -> tuple[float, bytes]:
+    body = fn(rows)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), body
+
+
+async def main(args) -> None:
+    conn = await connect()
+    await reset_schema(conn, SCHEMA)
+    try:
+        await conn.execute(DDL)
+        await conn.execute(FILL, args.rows)
+        await conn.execute(f"ANALYZE {SCHEMA}.devices")
+
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            records = await conn.fetch(SELECT)
+            samples.append((time.perf_counter() - start) * 1000)
+        rows = [dict(r) for r in records]
+        query_ms = statistics.median(samples)
+
+        results, bodies = [], []
+        for label, fn in (
+            ("DeviceOut per row + response_model", models_per_row),
+            ("dict rows + response_model", dict_rows),
+            ("orjson from rows", dumps_rows),
+        ):
+            ms, body = measure(fn, rows, args.repeat)
+            bodies.append(body)
+            results.append([label, ms, len(rows) / ms * 1000, len(body)])
+
+        decoded = [json.loads(b) for b in bodies]
+        if any(d != decoded[0] for d in decoded[1:]):
+            print("WARNING: serialized bodies differ")
+
+        print(f"\n{len(rows):,} devices, median of {args.repeat} runs; query {query_ms:,.2f} ms\n")
+        print_table(["Serialization", "ms", "Rows/s", "Bytes"], results)
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="devices in the listing")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per variant (median reported)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema for inspection")
+    asyncio.run(main(parser.parse_args()))
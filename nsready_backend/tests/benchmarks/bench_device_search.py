@@ -0,0 +1,102 @@
+"""Benchmark: device search latency by fleet size, with and without trigram indexes.
+
+Grows a scratch devices table to each --sizes step and runs the query of
+GET /admin/devices/search (admin_tool/api/devices.py): a rare and a common
+substring and a prefix of name or external_id, newest first, one page. The
+same queries are timed once with the indexes of migrations 240 and 270, and once
+with only the btree indexes, i.e. what filtering the full device list costs.
+
+Usage (from repo root, database from docker compose running):
+    python nsready_backend/tests/benchmarks/bench_device_search.py --sizes 10000,100000,1000000
+"""
+import argparse
+import asyncio
+
+from common import connect, print_table, reset_schema, time_query
+
+SCHEMA = "bench_device_search"
+
+DDL = f"""
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE TABLE {SCHEMA}.devices (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        site_id UUID NOT NULL,
+        name TEXT NOT NULL,
+        device_type TEXT NOT NULL,
+        external_id TEXT UNIQUE,
+        status TEXT NOT NULL DEFAULT 'active',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE INDEX ON {SCHEMA}.devices (created_at DESC, id DESC);
+    CREATE INDEX ON {SCHEMA}.devices (status, device_type, created_at DESC, id DESC);
+"""
+
+TRGM_INDEXES = (
+    f"CREATE INDEX devices_name_trgm ON {SCHEMA}.devices USING gin (name gin_trgm_ops)",
+    f"CREATE INDEX devices_external_id_trgm ON {SCHEMA}.devices USING gin (external_id gin_trgm_ops)",
+)
+
+# Names like "Pump Station 0012345 North", codes like "PMP-0012345"
+FILL = f"""
+    INSERT INTO {SCHEMA}.devices (site_id, name, device_type, external_id, created_at)
+    SELECT gen_random_uuid(),
+           (ARRAY['Pump', 'Meter', 'Valve', 'Sensor'])[1 + n % 4] || ' Station ' || lpad(n::text, 7, '0')
+               || ' ' || (ARRAY['North', 'South', 'East', 'West'])[1 + n % 4],
+           (ARRAY['pump', 'meter', 'valve', 'sensor'])[1 + n % 4],
+           (ARRAY['PMP', 'MTR', 'VLV', 'SNS'])[1 + n % 4] || '-' || lpad(n::text, 7, '0'),
+           NOW() - n * INTERVAL '1 second'
+    FROM generate_series($1 + 1, $2) AS n
+"""
+
+SEARCH = f"""
+    SELECT d.id::text, d.site_id::text AS site_id, d.name, d.device_type, d.external_id, d.status, d.created_at
+    FROM {SCHEMA}.devices d
+    WHERE (d.name ILIKE $1 OR d.external_id ILIKE $1)
+    ORDER BY d.created_at DESC, d.id DESC
+    LIMIT $2
+"""
+
+QUERIES = (
+    ("substring, 1 match", "%0004321%"),
+    ("substring, 100 matches", "%station 00042%"),
+    ("prefix", "vlv-00099%"),
+)
+
+
+async def main(args) -> None:
+    conn = await connect()
+    await reset_schema(conn, SCHEMA)
+    try:
+        await conn.execute(DDL)
+        sizes = sorted(int(s) for s in args.sizes.split(","))
+        rows, filled = [], 0
+        for size in sizes:
+            await conn.execute(FILL, filled, size)
+            filled = size
+            await conn.execute(f"ANALYZE {SCHEMA}.devices")
+            for indexed in (False, True):
+                if indexed:
+                    for sql in TRGM_INDEXES:
+                        await conn.execute(sql)
+                    await conn.execute(f"ANALYZE {SCHEMA}.devices")
+                for label, pattern in QUERIES:
+                    stats = await time_query(conn, SEARCH, pattern, args.limit, repeat=args.repeat)
+                    rows.append([size, "trigram" if indexed else "btree only", label, stats["p50_ms"], stats["max_ms"]])
+            for sql in ("DROP INDEX IF EXISTS {}.devices_name_trgm", "DROP INDEX IF EXISTS {}.devices_external_id_trgm"):
+                await conn.execute(sql.format(SCHEMA))
+
+        print(f"\nGET /admin/devices/search, limit {args.limit}\n")
+        print_table(["Devices", "Indexes", "Query", "p50 ms", "max ms"], rows)
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated fleet sizes")
+    parser.add_argument("--limit", type=int, default=100, help="page size")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per query")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema for inspection")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,184 @@
+"""Benchmark: insert rate, compression ratio and query latency per hypertable layout.
+
+Each layout is a copy of the ingest_events_compact table (migration 180) with a
+different chunk_time_interval, optional hash partitioning on device_id and
+compress_orderby. The same synthetic series (devices x parameters at a fixed
+cadence, ending now) is bulk loaded into each, chunks older than the 7-day
+compression horizon are compressed as the policy would, and three typical reads
+are timed:
+
+    latest   last value of one series
+    24h      one series' raw history for the last day (uncompressed chunks)
+    30d      hourly min/avg/max of one device's parameters over 30 days (mostly compressed)
+
+Usage (from repo root, database from docker compose running):
+    python nsready_backend/tests/benchmarks/bench_hypertable_layouts.py --devices 50 --days 35
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from common import connect, print_table, reset_schema, time_query, timer
+
+SCHEMA = "bench_hypertable_layouts"
+COMPRESS_AFTER = timedelta(days=7)
+
+LAYOUTS = {
+    "7d chunks (TimescaleDB default)": {"chunk": "7 days", "partitions": 0, "orderby": "time DESC"},
+    "1d chunks": {"chunk": "1 day", "partitions": 0, "orderby": "time DESC"},
+    "1d chunks + 4 device hash partitions": {"chunk": "1 day", "partitions": 4, "orderby": "time DESC"},
+    "1d chunks, orderby time ASC": {"chunk": "1 day", "partitions": 0, "orderby": "time ASC"},
+    "6h chunks": {"chunk": "6 hours", "partitions": 0, "orderby": "time DESC"},
+}
+
+DDL = """
+    CREATE TABLE {table} (
+        time TIMESTAMPTZ NOT NULL,
+        device_id UUID NOT NULL,
+        value DOUBLE PRECISION,
+        parameter_id INTEGER NOT NULL,
+        quality SMALLINT NOT NULL DEFAULT 0,
+        source TEXT,
+        event_id TEXT,
+        attributes JSONB,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (time, device_id, parameter_id)
+    );
+    CREATE INDEX ON {table} (device_id, parameter_id, time DESC);
+"""
+
+COLUMNS = ["time", "device_id", "value", "parameter_id", "quality", "source", "event_id"]
+
+
+def series_rows(devices, params, start, end, cadence, batch_size):
+    """Yield batches of rows in time order, as the collector would receive them"""
+    batch = []
+    step = timedelta(seconds=cadence)
+    ts = start
+    while ts < end:
+        for device in devices:
+            for param in params:
+                batch.append((ts, device, random.gauss(230.0, 5.0), param, 192, "GPRS", None))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        ts += step
+    if batch:
+        yield batch
+
+
+async def load_layout(conn, name, layout, args, devices, params, start, end) -> list:
+    table = f"{SCHEMA}.l{list(LAYOUTS).index(name)}"
+    await conn.execute(DDL.format(table=table))
+    await conn.execute(
+        f"SELECT create_hypertable('{table}', by_range('time', $1::interval))", layout["chunk"]
+    )
+    if layout["partitions"] > 1:
+        await conn.execute(
+            f"SELECT add_dimension('{table}', by_hash('device_id', $1::int))", layout["partitions"]
+        )
+    await conn.execute(f"""
+        ALTER TABLE {table} SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'device_id,parameter_id',
+            timescaledb.compress_orderby = '{layout["orderby"]}'
+        )
+    """)
+
+    random.seed(args.seed)
+    with timer() as insert_time:
+        for batch in series_rows(devices, params, start, end, args.cadence, args.batch_size):
+            await conn.copy_records_to_table(
+                table.split(".")[1], schema_name=SCHEMA, records=batch, columns=COLUMNS
+            )
+    total_rows = await conn.fetchval(f"SELECT count(*) FROM {table}")
+    chunks = await conn.fetchval(f"SELECT count(*) FROM show_chunks('{table}')")
+
+    with timer() as compress_time:
+        await conn.execute(
+            f"SELECT compress_chunk(c) FROM show_chunks('{table}', older_than => $1::timestamptz) c",
+            end - COMPRESS_AFTER,
+        )
+    stats = await conn.fetchrow(f"""
+        SELECT sum(before_compression_total_bytes) AS before_bytes,
+               sum(after_compression_total_bytes) AS after_bytes
+        FROM hypertable_compression_stats('{table}')
+    """)
+    await conn.execute(f"ANALYZE {table}")
+
+    device, param = devices[0], params[0]
+    latest = await time_query(conn, f"""
+        SELECT time, value FROM {table}
+        WHERE device_id = $1 AND parameter_id = $2
+        ORDER BY time DESC LIMIT 1
+    """, device, param, repeat=args.repeat)
+    history = await time_query(conn, f"""
+        SELECT time, value FROM {table}
+        WHERE device_id = $1 AND parameter_id = $2 AND time >= $3 AND time < $4
+        ORDER BY time
+    """, device, param, end - timedelta(hours=24), end, repeat=args.repeat)
+    rollup = await time_query(conn, f"""
+        SELECT time_bucket('1 hour', time) AS bucket, parameter_id,
+               min(value), avg(value), max(value)
+        FROM {table}
+        WHERE device_id = $1 AND time >= $2 AND time < $3
+        GROUP BY bucket, parameter_id
+    """, device, end - timedelta(days=30), end, repeat=args.repeat)
+
+    ratio = (stats["before_bytes"] / stats["after_bytes"]) if stats["after_bytes"] else 0.0
+    return [
+        name,
+        chunks,
+        total_rows / insert_time["seconds"],
+        compress_time["seconds"],
+        float(ratio),
+        await conn.fetchval(f"SELECT hypertable_size('{table}')") / total_rows,
+        latest["p50_ms"],
+        history["p50_ms"],
+        rollup["p50_ms"],
+    ]
+
+
+async def main(args) -> None:
+    conn = await connect()
+    await reset_schema(conn, SCHEMA)
+    try:
+        devices = [uuid.uuid4() for _ in range(args.devices)]
+        params = list(range(1, args.params + 1))
+        end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        start = end - timedelta(days=args.days)
+
+        selected = {name: layout for name, layout in LAYOUTS.items() if not args.only or args.only in name}
+        rows = []
+        for name, layout in selected.items():
+            print(f"loading {name} ...", flush=True)
+            rows.append(await load_layout(conn, name, layout, args, devices, params, start, end))
+
+        total = args.devices * args.params * int(args.days * 86400 / args.cadence)
+        print(f"\n{total:,} rows: {args.devices} devices x {args.params} parameters, "
+              f"{args.days} days at {args.cadence}s cadence\n")
+        print_table(
+            ["Layout", "Chunks", "Insert rows/s", "Compress s", "Compression ratio",
+             "Bytes/row", "Latest p50 ms", "24h p50 ms", "30d rollup p50 ms"],
+            rows,
+        )
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=50, help="distinct devices")
+    parser.add_argument("--params", type=int, default=5, help="parameters per device")
+    parser.add_argument("--days", type=int, default=35, help="days of history ending now")
+    parser.add_argument("--cadence", type=int, default=300, help="seconds between samples")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per COPY batch")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per query")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for values")
+    parser.add_argument("--only", help="run only layouts whose name contains this text")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema for inspection")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,152 @@
+"""Benchmark: bulk registry import (COPY + set-based upserts) vs one row at a time.
+
+Generates a registry CSV (customers → projects → sites → one device per row) and
+imports it with the same code as POST /admin/registry/import
+(admin_tool/core/registry_import.py). It does so twice: into empty tables, then
+again over the existing rows, where everything is matched and nothing is created.
+For comparison, the first --baseline-rows rows are imported one row at a time
+with a lookup/insert round trip per level, the way import_registry.sh does it.
+
+Usage (from repo root, database from docker compose running):
+    python nsready_backend/tests/benchmarks/bench_registry_import.py --rows 100000
+"""
+import argparse
+import asyncio
+import io
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "admin_tool"))
+
+from common import connect, print_table, reset_schema, timer
+from core.registry_import import IMPORT_COLUMNS, import_registry, parse_csv
+
+SCHEMA = "bench_registry_import"
+
+# Registry tables with the constraints and indexes of migrations 100 and 240 that the import relies on
+DDL = f"""
+    CREATE TABLE {SCHEMA}.customers (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        name TEXT NOT NULL UNIQUE,
+        metadata JSONB NOT NULL DEFAULT '{{}}'::jsonb,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE {SCHEMA}.projects (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        customer_id UUID NOT NULL REFERENCES {SCHEMA}.customers(id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        description TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        UNIQUE (customer_id, name)
+    );
+    CREATE TABLE {SCHEMA}.sites (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        project_id UUID NOT NULL REFERENCES {SCHEMA}.projects(id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        location JSONB NOT NULL DEFAULT '{{}}'::jsonb,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        UNIQUE (project_id, name)
+    );
+    CREATE TABLE {SCHEMA}.devices (
+        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+        site_id UUID NOT NULL REFERENCES {SCHEMA}.sites(id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        device_type TEXT NOT NULL,
+        external_id TEXT UNIQUE,
+        status TEXT NOT NULL DEFAULT 'active',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        UNIQUE (site_id, name)
+    );
+    CREATE INDEX ON {SCHEMA}.projects (customer_id, created_at DESC, id DESC);
+    CREATE INDEX ON {SCHEMA}.sites (project_id, created_at DESC, id DESC);
+    CREATE INDEX ON {SCHEMA}.devices (site_id, created_at DESC, id DESC);
+"""
+
+
+def make_csv(rows: int, customers: int, projects: int, sites: int) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(IMPORT_COLUMNS)
+    for n in range(rows):
+        c = n % customers
+        p = (n // customers) % projects
+        s = (n // (customers * projects)) % sites
+        writer.writerow([
+            f"Customer {c:03d}", f"Project {p:02d}", "Benchmark project", f"Site {s:03d}",
+            '{"city": "Mumbai"}', f"Device {n:06d}", "sensor", f"DEV-{n:06d}", "active",
+        ])
+    return out.getvalue()
+
+
+async def import_row_by_row(conn, records) -> None:
+    """One lookup and, if missing, one insert per level and row (import_registry.sh)"""
+    for r in records:
+        _, customer, project, description, site, location, device, device_type, code, device_status, _ = r
+        customer_id = await conn.fetchval("SELECT id FROM customers WHERE name = $1", customer)
+        if customer_id is None:
+            customer_id = await conn.fetchval(
+                "INSERT INTO customers (name, metadata) VALUES ($1, '{}') RETURNING id", customer)
+        project_id = await conn.fetchval(
+            "SELECT id FROM projects WHERE customer_id = $1 AND name = $2", customer_id, project)
+        if project_id is None:
+            project_id = await conn.fetchval(
+                "INSERT INTO projects (customer_id, name, description) VALUES ($1, $2, $3) RETURNING id",
+                customer_id, project, description)
+        site_id = await conn.fetchval("SELECT id FROM sites WHERE project_id = $1 AND name = $2", project_id, site)
+        if site_id is None:
+            site_id = await conn.fetchval(
+                "INSERT INTO sites (project_id, name, location) VALUES ($1, $2, $3::jsonb) RETURNING id",
+                project_id, site, location or "{}")
+        device_id = await conn.fetchval("SELECT id FROM devices WHERE external_id = $1", code)
+        if device_id is None:
+            device_id = await conn.fetchval("SELECT id FROM devices WHERE site_id = $1 AND name = $2", site_id, device)
+        if device_id is None:
+            await conn.execute(
+                "INSERT INTO devices (site_id, name, device_type, external_id, status) VALUES ($1, $2, $3, $4, $5)",
+                site_id, device, device_type or "sensor", code, device_status or "active")
+
+
+async def main(args) -> None:
+    conn = await connect()
+    await reset_schema(conn, SCHEMA)
+    try:
+        await conn.execute(DDL)
+        await conn.execute(f"SET search_path TO {SCHEMA}, public")
+        data = make_csv(args.rows, args.customers, args.projects, args.sites)
+        rows = []
+
+        for label in ("bulk, empty tables", "bulk, all rows existing"):
+            with timer() as elapsed:
+                async with conn.transaction():
+                    report = await import_registry(conn, parse_csv(data))
+            created = report["projects_created"] + report["sites_created"] + report["devices_created"]
+            rows.append([label, report["rows"], created, report["rows_failed"], elapsed["seconds"],
+                         report["rows"] / elapsed["seconds"]])
+
+        await conn.execute("TRUNCATE customers CASCADE")
+        baseline = list(parse_csv(data))[:args.baseline_rows]
+        with timer() as elapsed:
+            async with conn.transaction():
+                await import_row_by_row(conn, baseline)
+        devices = await conn.fetchval("SELECT count(*) FROM devices")
+        rows.append(["row by row, empty tables", len(baseline), devices, 0, elapsed["seconds"],
+                     len(baseline) / elapsed["seconds"]])
+
+        print(f"\n{args.rows:,} rows: {args.customers} customers x {args.projects} projects x {args.sites} sites\n")
+        print_table(["Import", "Rows", "Created", "Failed", "Seconds", "Rows/s"], rows)
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="CSV rows (one device each)")
+    parser.add_argument("--customers", type=int, default=20, help="distinct customers")
+    parser.add_argument("--projects", type=int, default=5, help="projects per customer")
+    parser.add_argument("--sites", type=int, default=50, help="sites per project")
+    parser.add_argument("--baseline-rows", type=int, default=5000, help="rows imported one at a time for comparison")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema for inspection")
+    asyncio.run(main(parser.parse_args()))
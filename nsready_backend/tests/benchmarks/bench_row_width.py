@@ -0,0 +1,138 @@
+"""Benchmark: bytes per row and insert rate, wide vs compact ingest_events layout.
+
+Compares the original layout (parameter_key TEXT with FK to parameter_templates.key,
+attributes JSONB DEFAULT '{}') with the compact layout from migration 180
+(parameter_id INTEGER with FK to param_id, attributes NULL when empty).
+Rows are inserted one event at a time with the same unnest() statement the
+collector worker uses, so insert rates include index maintenance and FK checks.
+
+Usage (from repo root, database from docker compose running):
+    python nsready_backend/tests/benchmarks/bench_row_width.py --events 20000 --metrics 5
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from common import connect, print_table, reset_schema, timer
+
+SCHEMA = "bench_row_width"
+
+LAYOUTS = {
+    "wide (text key, '{}' attributes)": {
+        "table": "events_wide",
+        "ddl": f"""
+            CREATE TABLE {SCHEMA}.events_wide (
+                time TIMESTAMPTZ NOT NULL,
+                device_id UUID NOT NULL REFERENCES {SCHEMA}.devices(id),
+                parameter_key TEXT NOT NULL REFERENCES {SCHEMA}.params(key),
+                value DOUBLE PRECISION,
+                quality SMALLINT NOT NULL DEFAULT 0,
+                source TEXT,
+                event_id TEXT,
+                attributes JSONB DEFAULT '{{}}'::jsonb,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (time, device_id, parameter_key)
+            );
+            CREATE INDEX ON {SCHEMA}.events_wide (device_id, parameter_key, time DESC);
+        """,
+        "insert": f"""
+            INSERT INTO {SCHEMA}.events_wide (time, device_id, parameter_key, value, quality, source, event_id, attributes)
+            SELECT $1, $2, m.k, m.v, m.q, $3, m.e, '{{}}'::jsonb
+            FROM unnest($4::text[], $5::float8[], $6::int2[], $7::text[]) AS m(k, v, q, e)
+            ON CONFLICT (time, device_id, parameter_key) DO UPDATE SET value = EXCLUDED.value
+        """,
+        "key_column": "keys",
+    },
+    "compact (int id, NULL attributes)": {
+        "table": "events_compact",
+        "ddl": f"""
+            CREATE TABLE {SCHEMA}.events_compact (
+                time TIMESTAMPTZ NOT NULL,
+                device_id UUID NOT NULL REFERENCES {SCHEMA}.devices(id),
+                value DOUBLE PRECISION,
+                parameter_id INTEGER NOT NULL REFERENCES {SCHEMA}.params(param_id),
+                quality SMALLINT NOT NULL DEFAULT 0,
+                source TEXT,
+                event_id TEXT,
+                attributes JSONB,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (time, device_id, parameter_id)
+            );
+            CREATE INDEX ON {SCHEMA}.events_compact (device_id, parameter_id, time DESC);
+        """,
+        "insert": f"""
+            INSERT INTO {SCHEMA}.events_compact (time, device_id, parameter_id, value, quality, source, event_id, attributes)
+            SELECT $1, $2, m.k, m.v, m.q, $3, m.e, NULL
+            FROM unnest($4::int[], $5::float8[], $6::int2[], $7::text[]) AS m(k, v, q, e)
+            ON CONFLICT (time, device_id, parameter_id) DO UPDATE SET value = EXCLUDED.value
+        """,
+        "key_column": "ids",
+    },
+}
+
+
+async def main(args) -> None:
+    conn = await connect()
+    await reset_schema(conn, SCHEMA)
+    try:
+        project = uuid.uuid4()
+        keys = [f"project:{project}:parameter_{i:03d}" for i in range(args.metrics)]
+        devices = [uuid.uuid4() for _ in range(args.devices)]
+
+        await conn.execute(f"CREATE TABLE {SCHEMA}.devices (id UUID PRIMARY KEY)")
+        await conn.execute(f"CREATE TABLE {SCHEMA}.params (key TEXT UNIQUE, param_id INTEGER UNIQUE)")
+        await conn.executemany(f"INSERT INTO {SCHEMA}.devices VALUES ($1)", [(d,) for d in devices])
+        await conn.executemany(f"INSERT INTO {SCHEMA}.params VALUES ($1, $2)", [(k, i + 1) for i, k in enumerate(keys)])
+
+        lookup = {"keys": keys, "ids": list(range(1, args.metrics + 1))}
+        start = datetime.now(timezone.utc) - timedelta(seconds=args.events * 10)
+        rows = []
+
+        for name, layout in LAYOUTS.items():
+            table = f"{SCHEMA}.{layout['table']}"
+            await conn.execute(layout["ddl"])
+            await conn.execute(f"SELECT create_hypertable('{table}', by_range('time'))")
+            stmt = await conn.prepare(layout["insert"])
+
+            with timer() as elapsed:
+                for n in range(args.events):
+                    device = devices[n % len(devices)]
+                    ts = start + timedelta(seconds=10 * (n // len(devices)))
+                    await stmt.fetch(
+                        ts, device, "GPRS", lookup[layout["key_column"]],
+                        [float(n % 1000) for _ in keys], [192] * len(keys),
+                        [f"{device}:{ts.isoformat()}:{k}" for k in keys],
+                    )
+
+            total_rows = await conn.fetchval(f"SELECT count(*) FROM {table}")
+            tuple_bytes = await conn.fetchval(f"SELECT avg(pg_column_size(t.*)) FROM {table} t")
+            total_bytes = await conn.fetchval(f"SELECT hypertable_size('{table}')")
+            index_bytes = await conn.fetchval(f"SELECT hypertable_index_size('{table}')")
+            rows.append([
+                name,
+                total_rows,
+                float(tuple_bytes),
+                total_bytes / total_rows,
+                index_bytes / total_rows,
+                total_rows / elapsed["seconds"],
+            ])
+
+        print(f"\n{args.events:,} events x {args.metrics} metrics, {args.devices} devices\n")
+        print_table(
+            ["Layout", "Rows", "Tuple bytes/row", "Total bytes/row", "Index bytes/row", "Insert rows/s"],
+            rows,
+        )
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="events to insert per layout")
+    parser.add_argument("--metrics", type=int, default=5, help="metrics per event")
+    parser.add_argument("--devices", type=int, default=100, help="distinct devices")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema for inspection")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""Shared helpers for the database benchmarks in this folder.
+
+Benchmarks connect straight to PostgreSQL/TimescaleDB with asyncpg and work in
+their own scratch schema, which is dropped afterwards (unless --keep).
+Connection settings use the same environment variables as the services.
+"""
+import os
+import time
+import statistics
+from contextlib import contextmanager
+
+import asyncpg
+
+
+def dsn_from_env() -> str:
+    user = os.getenv("POSTGRES_USER", "postgres")
+    password = os.getenv("POSTGRES_PASSWORD", "postgres")
+    host = os.getenv("DB_HOST", os.getenv("POSTGRES_HOST", "localhost"))
+    port = int(os.getenv("DB_PORT", os.getenv("POSTGRES_PORT", "5432")))
+    db = os.getenv("POSTGRES_DB", "nsready")
+    return f"postgresql://{user}:{password}@{host}:{port}/{db}"
+
+
+async def connect() -> asyncpg.Connection:
+    return await asyncpg.connect(os.getenv("BENCH_DSN", dsn_from_env()))
+
+
+async def reset_schema(conn: asyncpg.Connection, schema: str) -> None:
+    await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {schema}")
+
+
+@contextmanager
+def timer():
+    """Yields a dict whose 'seconds' key is filled in on exit"""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+async def time_query(conn: asyncpg.Connection, sql: str, *args, repeat: int = 5) -> dict:
+    """Run a query `repeat` times (after one warm-up) and return latency stats in ms"""
+    await conn.fetch(sql, *args)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await conn.fetch(sql, *args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": statistics.median(samples), "max_ms": max(samples)}
+
+
+def print_table(headers: list[str], rows: list[list]) -> None:
+    """Print a Markdown table (paste-able into tests/reports)"""
+    def fmt(value):
+        if isinstance(value, float):
+            return f"{value:,.2f}"
+        if isinstance(value, int):
+            return f"{value:,}"
+        return str(value)
+
+    print("| " + " | ".join(headers) + " |")
+    print("|" + "|".join("---" for _ in headers) + "|")
+    for row in rows:
+        print("| " + " | ".join(fmt(v) for v in row) + " |")